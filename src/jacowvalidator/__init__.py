@@ -1,18 +1,56 @@
 import os
-from flask import Flask
+from multiprocessing import current_process
+from tempfile import SpooledTemporaryFile
+from flask import Flask, Request
 from flask_uploads import UploadSet, configure_uploads
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 
 documents = UploadSet("document", ("docx"))
 
+
+
+class UploadRequest(Request):
+    """Keeps uploaded files in memory, only spilling them to an unnamed
+    temporary file when they are larger than UPLOAD_SPOOL_SIZE bytes"""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return SpooledTemporaryFile(max_size=app.config['UPLOAD_SPOOL_SIZE'], mode='w+b')
+
+
 app = Flask(__name__)
+app.request_class = UploadRequest
 basedir = os.path.abspath(os.path.dirname(__file__))
 app.config.update(
     dict(
         UPLOADS_DEFAULT_DEST=os.environ.get("UPLOADS_DEFAULT_DEST", "/var/tmp"),
         SQLALCHEMY_DATABASE_URI=os.environ.get('DATABASE_URL') or 'sqlite:///' + os.path.join(basedir, 'app.db'),
         SQLALCHEMY_TRACK_MODIFICATIONS = False,
+        UPLOAD_SPOOL_SIZE=int(os.environ.get("UPLOAD_SPOOL_SIZE", 16 * 1024 * 1024)),
+        # reports are shared between workers through this directory, empty to keep them in memory only
+        REPORT_CACHE_DIR=os.environ.get(
+            "REPORT_CACHE_DIR", os.path.join(os.environ.get("UPLOADS_DEFAULT_DEST", "/var/tmp"), "reports")),
+        REPORT_CACHE_SIZE=int(os.environ.get("REPORT_CACHE_SIZE", 64)),
+        REPORT_CACHE_DISK_SIZE=int(os.environ.get("REPORT_CACHE_DISK_SIZE", 1000)),
+        # uploads are validated by background threads in each worker, 0 to validate within the request
+        JOB_WORKERS=int(os.environ.get("JOB_WORKERS", 1)),
+        JOB_QUEUE=os.environ.get("JOB_QUEUE", "sqlite"),
+        JOB_QUEUE_PATH=os.environ.get(
+            "JOB_QUEUE_PATH", os.path.join(os.environ.get("UPLOADS_DEFAULT_DEST", "/var/tmp"), "jobs.db")),
+        JOB_TIMEOUT=int(os.environ.get("JOB_TIMEOUT", 600)),
+        # each document is checked in a child process with these limits, 0 processes to check in the worker
+        VALIDATION_PROCESSES=int(os.environ.get("VALIDATION_PROCESSES", 2)),
+        VALIDATION_TIME_LIMIT=int(os.environ.get("VALIDATION_TIME_LIMIT", 120)),
+        VALIDATION_MEMORY_LIMIT=int(os.environ.get("VALIDATION_MEMORY_LIMIT", 1024)),
+        # zip archives of papers are kept here until their batch job has run
+        BATCH_DIR=os.environ.get(
+            "BATCH_DIR", os.path.join(os.environ.get("UPLOADS_DEFAULT_DEST", "/var/tmp"), "batches")),
+        BATCH_WORKERS=int(os.environ.get("BATCH_WORKERS", 2)),
+        BATCH_MAX_PAPERS=int(os.environ.get("BATCH_MAX_PAPERS", 1000)),
+        BATCH_MAX_PAPER_SIZE=int(os.environ.get("BATCH_MAX_PAPER_SIZE", 100)),
+        BATCH_MAX_ENTRIES=int(os.environ.get("BATCH_MAX_ENTRIES", 2000)),
+        # no upload, the zip archives of batches included, may be larger than this
+        MAX_CONTENT_LENGTH=int(os.environ.get("BATCH_MAX_ARCHIVE_SIZE", 500)) * 1024 * 1024,
     )
 )
 db = SQLAlchemy(app)
@@ -23,5 +61,9 @@ app.jinja_env.lstrip_blocks = True
 
 configure_uploads(app, (documents,))
 
-from jacowvalidator import routes
+from jacowvalidator.executor import WORKER_NAME
 
+# validation worker processes only check documents, they are left without the
+# routes and the commit lookup, report cache, pool and job queue they set up
+if current_process().name != WORKER_NAME:
+    from jacowvalidator import routes
@@ -0,0 +1,84 @@
+"""Auditing all the papers of a conference against the SPMS references csv.
+
+   The title and authors of every paper are read in parallel worker
+   processes, then joined with the whole references catalog in one pass in
+   the main process. The audit gives a row for each paper, saying whether its
+   title and authors match, and a row for each paper in the csv that has no
+   document."""
+
+import multiprocessing
+import os
+
+from jacowvalidator.docutils.doc import create_upload_variables, get_spms_text
+from jacowvalidator.docutils.reader import DocxReader, read_index
+from jacowvalidator.spms import compare_reference, get_reference_catalog
+
+OK = 'ok'
+MISMATCH = 'mismatch'
+# a document for a paper that isn't in the csv
+MISSING = 'missing'
+# a paper in the csv without a document
+ORPHAN = 'orphan'
+ERROR = 'error'
+
+AUDIT_FIELDS = [
+    'paper_name', 'path', 'status', 'title_match', 'authors_match',
+    'docx_title', 'spms_title', 'docx_authors', 'spms_authors', 'error']
+
+
+def read_front_matter(path):
+    """(paper name, title text, author text) of the document at *path*"""
+    paper_name = os.path.splitext(os.path.basename(path))[0]
+    with DocxReader(path) as reader:
+        index = read_index(reader, body=True)
+    summary = create_upload_variables(index, paper_name, checks=['Title', 'Authors'])
+    return (paper_name, *get_spms_text(summary))
+
+
+def _read_front_matter(path):
+    # in a worker process, errors are returned with the path rather than raised
+    try:
+        return path, read_front_matter(path), None
+    except Exception as err:
+        return path, None, f"{type(err).__name__}: {err}" if str(err) else type(err).__name__
+
+
+def audit_papers(paths, references_path, processes=None):
+    """yields a row (a dict of AUDIT_FIELDS) for each of the documents at
+    *paths* as soon as it is read, then for each paper in the references csv
+    at *references_path* that none of them are for"""
+    catalog = get_reference_catalog(references_path)
+    seen = set()
+    with multiprocessing.Pool(processes or os.cpu_count()) as pool:
+        for path, front_matter, error in pool.imap_unordered(_read_front_matter, paths, chunksize=4):
+            row = dict.fromkeys(AUDIT_FIELDS)
+            row['path'] = path
+            if error:
+                paper_name = os.path.splitext(os.path.basename(path))[0]
+                row.update(paper_name=paper_name, status=ERROR, error=error)
+                # it has a document, even if the document can't be read
+                seen.add(paper_name)
+                yield row
+                continue
+
+            paper_name, title, authors = front_matter
+            row.update(paper_name=paper_name, docx_title=title, docx_authors=authors)
+            reference = catalog.get(paper_name)
+            if reference is None:
+                row['status'] = MISSING
+                yield row
+                continue
+
+            seen.add(paper_name)
+            details = compare_reference(reference, title, authors)
+            row.update(
+                status=OK if details['title']['match'] and details['author']['match'] else MISMATCH,
+                title_match=details['title']['match'], authors_match=details['author']['match'],
+                spms_title=reference.title, spms_authors=reference.authors)
+            yield row
+
+    for paper_name, reference in catalog.references.items():
+        if paper_name not in seen:
+            row = dict.fromkeys(AUDIT_FIELDS)
+            row.update(paper_name=paper_name, status=ORPHAN, spms_title=reference.title, spms_authors=reference.authors)
+            yield row
@@ -0,0 +1,123 @@
+"""Validating a zip archive of papers in one go.
+
+   The archive is never extracted. Each paper is read straight out of it when
+   its turn comes, at most *workers* papers are being checked at once and
+   only a small row for each paper is kept, so memory stays the same however
+   many papers the archive holds."""
+
+import os
+import zipfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from tempfile import SpooledTemporaryFile
+
+from jacowvalidator.executor import MB, DocumentTooComplexError
+from jacowvalidator.reports import CHUNK_SIZE, build_report, hash_upload
+
+# papers are read into memory up to this size, larger ones spill to disk
+SPOOL_SIZE = 16 * 1024 * 1024
+
+
+class NoPapersError(Exception):
+    """Raised when a zip archive has no .docx files in it"""
+    pass
+
+
+class TooManyEntriesError(Exception):
+    """Raised when a zip archive has more files in it than a batch may have"""
+    pass
+
+
+class PaperTooLargeError(DocumentTooComplexError):
+    """Raised when a paper in a zip archive is larger than the batch limit"""
+    pass
+
+
+def check_archive(archive_path, max_entries):
+    """raises TooManyEntriesError if the zip archive has more than
+    *max_entries* files and folders in it, zipfile.BadZipFile if it isn't a
+    zip archive"""
+    with zipfile.ZipFile(archive_path) as archive:
+        count = len(archive.infolist())
+    if count > max_entries:
+        raise TooManyEntriesError(
+            f"The zip archive has {count} files in it, at most {max_entries} can be checked in one batch")
+
+
+def get_entries(archive_path, max_papers=None):
+    """(entry name, paper name) for each .docx file in the zip archive,
+    leaving out folders and the files macOS adds"""
+    with zipfile.ZipFile(archive_path) as archive:
+        names = [info.filename for info in archive.infolist() if not info.is_dir()]
+    entries = []
+    for name in names:
+        basename = os.path.basename(name)
+        if name.startswith('__MACOSX/') or basename.startswith(('.', '~$')):
+            continue
+        paper_name, ext = os.path.splitext(basename)
+        if ext.lower() == '.docx':
+            entries.append((name, paper_name))
+    if not entries:
+        raise NoPapersError("No .docx files were found in the zip archive")
+    return entries[:max_papers] if max_papers else entries
+
+
+def open_entry(archive, name, max_size=None):
+    """opens an entry in the zip archive, unless the size it says it has
+    once uncompressed is more than *max_size* bytes, zipfile never reads
+    more out of it than that"""
+    size = archive.getinfo(name).file_size
+    if max_size and size > max_size:
+        raise PaperTooLargeError(
+            f"The document {os.path.basename(name)} is too large to check, "
+            f"it is {size // MB} MB once unzipped and at most {max_size // MB} MB is allowed.")
+    return archive.open(name)
+
+
+def hash_entry(archive_path, name, max_size=None):
+    """sha256 of an entry in the zip archive, read a chunk at a time"""
+    with zipfile.ZipFile(archive_path) as archive, open_entry(archive, name, max_size) as f:
+        return hash_upload(f)
+
+
+def validate_entry(archive_path, name, paper_name, previous=None, checks=None, max_size=None):
+    """build_report for an entry in the zip archive"""
+    with SpooledTemporaryFile(max_size=SPOOL_SIZE) as source:
+        with zipfile.ZipFile(archive_path) as archive, open_entry(archive, name, max_size) as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+                source.write(chunk)
+        source.seek(0)
+        return build_report(source, paper_name, previous, checks)
+
+
+def iter_batch(entries, check, workers):
+    """runs check(entry name, paper name) for each of the *entries*, up to
+    *workers* at a time, and yields (entry name, paper name, result, error)
+    in the order of the entries. Only the papers being checked are held, one
+    that raises an exception gives it as its error."""
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        running = deque()
+        for name, paper_name in entries:
+            running.append((name, paper_name, executor.submit(check, name, paper_name)))
+            if len(running) >= workers:
+                yield _result(*running.popleft())
+        while running:
+            yield _result(*running.popleft())
+
+
+def _result(name, paper_name, future):
+    try:
+        return name, paper_name, future.result(), None
+    except Exception as err:
+        return name, paper_name, None, err
+
+
+def summarise(encoded):
+    """the row for a paper in the batch table from its encoded report"""
+    spms = encoded['spms']
+    return {
+        'ok': encoded['ok'],
+        'sections': {name: section['ok'] for name, section in encoded['sections'].items()},
+        'title_match': spms['title']['match'] if spms else None,
+        'authors_match': spms['author']['match'] if spms else None,
+    }
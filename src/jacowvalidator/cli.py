@@ -1,3 +1,9 @@
+import csv
+import json
+import multiprocessing
+import os
+import sys
+
 import click
 from flask import Flask
 from flask.cli import FlaskGroup
@@ -10,4 +16,137 @@ def create_app():
 
 @click.group(cls=FlaskGroup, create_app=create_app)
 def cli():
-    """Management script for the JACoW application."""
\ No newline at end of file
+    """Management script for the JACoW application."""
+
+
+def find_papers(paths):
+    """the .docx files given in *paths*, and in the directories given, in order"""
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.lower().endswith('.docx') and not name.startswith(('.', '~$')):
+                        yield os.path.join(root, name)
+        else:
+            yield path
+
+
+def _init_worker():
+    # each worker reads the references csv once for all the papers it checks
+    from jacowvalidator.spms import get_reference_catalog
+    path = os.environ.get('PATH_TO_JACOW_REFERENCES_CSV')
+    if 'URL_TO_JACOW_REFERENCES_CSV' in os.environ and path and os.path.isfile(path):
+        get_reference_catalog(path)
+
+
+def _validate(args):
+    from jacowvalidator.batch import summarise
+    from jacowvalidator.reports import build_report, encode_report
+
+    path, checks, details = args
+    paper_name = os.path.splitext(os.path.basename(path))[0]
+    result = {'path': path, 'paper_name': paper_name, 'error': None}
+    try:
+        encoded = encode_report(build_report(path, paper_name, checks=checks), paper_name)
+    except Exception as err:
+        result['error'] = f"{type(err).__name__}: {err}" if str(err) else type(err).__name__
+        return result
+    result.update(summarise(encoded))
+    if details:
+        result['report'] = encoded
+    return result
+
+
+@cli.command('validate', with_appcontext=False)
+@click.argument('paths', nargs=-1, required=True, type=click.Path(exists=True))
+@click.option('--format', 'output_format', type=click.Choice(['jsonl', 'csv']), default='jsonl',
+              help='jsonl (default) or csv, one line for each paper.')
+@click.option('--output', '-o', type=click.File('w'), default='-', help='File to write to, standard output by default.')
+@click.option('--checks', help='Only run these checks, eg margins,spms.')
+@click.option('--jobs', '-j', type=int, default=None, help='Papers checked at once, the number of cpus by default.')
+@click.option('--details', is_flag=True, help='Include each section of the report in jsonl output.')
+def validate(paths, output_format, output, checks, jobs, details):
+    """Checks the .docx papers in PATHS, which can be files or directories.
+
+    A line is written for each paper as soon as it has been checked. Exits
+    with 1 if any paper fails a check and 2 if any paper couldn't be checked.
+    """
+    from jacowvalidator.docutils.doc import UnknownCheckError, get_checks, parse_checks
+
+    try:
+        checks = parse_checks(checks)
+    except UnknownCheckError as err:
+        raise click.BadParameter(str(err), param_hint='--checks')
+
+    papers = list(find_papers(paths))
+    if not papers:
+        raise click.UsageError('No .docx files found')
+
+    sections = [check.name for check in get_checks(checks)]
+    write = row_writer(output, output_format, [
+        'path', 'paper_name', 'ok', 'error', 'title_match', 'authors_match', *sections])
+
+    status = 0
+    with multiprocessing.Pool(jobs or os.cpu_count(), initializer=_init_worker) as pool:
+        for result in pool.imap_unordered(_validate, [(path, checks, details) for path in papers]):
+            if result['error']:
+                status = 2
+            elif not result['ok'] and status == 0:
+                status = 1
+            write(result, dict(result, **result.get('sections', {})))
+
+    sys.exit(status)
+
+
+@cli.command('audit', with_appcontext=False)
+@click.argument('paths', nargs=-1, required=True, type=click.Path(exists=True))
+@click.option('--references', type=click.Path(exists=True, dir_okay=False),
+              default=lambda: os.environ.get('PATH_TO_JACOW_REFERENCES_CSV'),
+              help='The spms references csv, PATH_TO_JACOW_REFERENCES_CSV by default.')
+@click.option('--format', 'output_format', type=click.Choice(['jsonl', 'csv']), default='jsonl',
+              help='jsonl (default) or csv, one line for each paper.')
+@click.option('--output', '-o', type=click.File('w'), default='-', help='File to write to, standard output by default.')
+@click.option('--jobs', '-j', type=int, default=None, help='Papers read at once, the number of cpus by default.')
+def audit(paths, references, output_format, output, jobs):
+    """Checks the titles and authors of all the .docx papers in PATHS against
+    the spms references csv.
+
+    A line is written for each paper as soon as it has been read, with its
+    status: ok, mismatch (the title or authors differ), missing (the paper
+    isn't in the csv) or error, then a line for each paper in the csv without
+    a document (orphan). Exits with 1 if any paper isn't ok and 2 if any
+    couldn't be read.
+    """
+    from jacowvalidator.audit import AUDIT_FIELDS, ERROR, OK, audit_papers
+
+    if not references:
+        raise click.UsageError('No references csv, use --references or set PATH_TO_JACOW_REFERENCES_CSV')
+    papers = list(find_papers(paths))
+    if not papers:
+        raise click.UsageError('No .docx files found')
+
+    write = row_writer(output, output_format, AUDIT_FIELDS)
+    counts = {}
+    for row in audit_papers(papers, references, jobs):
+        counts[row['status']] = counts.get(row['status'], 0) + 1
+        write(row)
+
+    click.echo(', '.join(f"{count} {status}" for status, count in sorted(counts.items())), err=True)
+    sys.exit(2 if ERROR in counts else 0 if set(counts) <= {OK} else 1)
+
+
+def row_writer(output, output_format, columns):
+    """a function that writes a row to *output* as a json line, or with the
+    values of its *columns* as a csv line (taken from *values* if given)"""
+    if output_format == 'csv':
+        writer = csv.writer(output)
+        writer.writerow(columns)
+
+    def write(row, values=None):
+        if output_format == 'csv':
+            writer.writerow([(values or row).get(column) for column in columns])
+        else:
+            output.write(json.dumps(row) + '\n')
+        output.flush()
+    return write
@@ -1,5 +1,8 @@
 import os
-from jacowvalidator.docutils.styles import check_style_detail, VALID_STYLES, VALID_NON_JACOW_STYLES
+from collections import namedtuple, OrderedDict
+from collections.abc import Mapping
+from jacowvalidator.docutils.index import get_index
+from jacowvalidator.docutils.styles import check_style, compile_rules, VALID_STYLES, VALID_NON_JACOW_STYLES
 from jacowvalidator.docutils.page import get_text, check_title_case
 from jacowvalidator.docutils.margins import check_sections
 from jacowvalidator.docutils.styles import check_jacow_styles
@@ -9,7 +12,7 @@ from jacowvalidator.docutils.paragraph import get_paragraphs
 from jacowvalidator.docutils.figures import extract_figures
 from jacowvalidator.docutils.languages import (get_language_tags, get_language_tags_location, VALID_LANGUAGES)
 from jacowvalidator.docutils.tables import check_table_titles
-from jacowvalidator.spms import reference_csv_check
+from jacowvalidator.spms import reference_csv_check, resolve_paper_name
 
 
 class AbstractNotFoundError(Exception):
@@ -208,6 +211,10 @@ DETAILS = {
 }
 
 
+# DETAILS compiled for checking paragraphs, in the same shape
+RULES = compile_rules(DETAILS)
+
+
 def get_title_details(p):
     title = get_text(p)
     title_detail = {
@@ -221,7 +228,7 @@ def get_title_details(p):
 def get_author_details(p):
     superscript_removed_text = ''  # remove superscript footnotes
     for r in p.runs:
-        superscript_removed_text += r.text if not r.font.superscript else ''
+        superscript_removed_text += r.text if not r.superscript else ''
     author_detail = {
         'text': superscript_removed_text,
         'original_text': p.text,
@@ -238,54 +245,45 @@ def get_abstract_detail(p):
 
 
 def parse_all_paragraphs(doc):
+    index = get_index(doc)
     all_paragraphs = []
-    for i, p in enumerate(doc.paragraphs):
+    for p in index.paragraphs:
         if p.text.strip():
-            style_ok = p.style.name in VALID_STYLES or p.style.name in VALID_NON_JACOW_STYLES
+            style_ok = p.style in VALID_STYLES or p.style in VALID_NON_JACOW_STYLES
             if not style_ok:
                 style_ok = 2
             all_paragraphs.append({
-                'index': i,
-                'style': p.style.name,
+                'index': p.index,
+                'style': p.style,
                 'text': get_text(p),
                 'style_ok': style_ok,
                 'in_table': 'No',
             })
 
     # search for paragraphs in tables
-    count = 1
-    show_all = True
-    for t in doc.tables:
-        if len(t.rows) > 2 and not show_all:
-            continue
-        for r in t.rows:
-            if len(r.cells) > 2 and not show_all:
-                continue
-            cell_count = 1
-            for c in r.cells:
-                for p in c.paragraphs:
-                    if p.text.strip():
-                        style_ok = p.style.name in VALID_STYLES or p.style.name in VALID_NON_JACOW_STYLES
-                        if not style_ok:
-                            style_ok = 2
-                        all_paragraphs.append({
-                            'index': 0,
-                            'style': p.style.name,
-                            'text': get_text(p),
-                            'style_ok': style_ok,
-                            'in_table': f"Table {count}:<br/>row {r._index + 1}, col {cell_count}"
-                        })
-                cell_count = cell_count + 1
-        count = count + 1
+    for p in index.table_paragraphs:
+        if p.text.strip():
+            style_ok = p.style in VALID_STYLES or p.style in VALID_NON_JACOW_STYLES
+            if not style_ok:
+                style_ok = 2
+            table, row, col = p.location
+            all_paragraphs.append({
+                'index': 0,
+                'style': p.style,
+                'text': get_text(p),
+                'style_ok': style_ok,
+                'in_table': f"Table {table}:<br/>row {row}, col {col}"
+            })
     return all_paragraphs
 
 
 def parse_paragraphs(doc):
+    index = get_index(doc)
     title_index = abstract_index = reference_index = -1
     title_style_ok = False
 
     summary = {}
-    for i, p in enumerate(doc.paragraphs):
+    for i, p in enumerate(index.paragraphs):
         # first paragraph is the title
         text = p.text.strip()
         if not text:
@@ -296,9 +294,10 @@ def parse_paragraphs(doc):
         if title_index == -1:
             title_index = i
             details = get_title_details(p)
-            details.update(check_style_detail(p, DETAILS['Title']))
-            title_style_ok = p.style.name == DETAILS['Title']['styles']['jacow']
-            details.update({'title_style_ok': title_style_ok, 'style': p.style.name})
+            style_ok, detail = check_style(p, RULES['Title'])
+            details.update(detail, style_ok=style_ok)
+            title_style_ok = p.style == DETAILS['Title']['styles']['jacow']
+            details.update({'title_style_ok': title_style_ok, 'style': p.style})
             summary['Title'] = {
                 'details': [details],
                 'rules': DETAILS['Title'],
@@ -313,9 +312,10 @@ def parse_paragraphs(doc):
         if text.lower() == 'abstract':
             abstract_index = i
             details = get_abstract_detail(p)
-            details.update(check_style_detail(p, DETAILS['Abstract']))
-            title_style_ok = p.style.name == DETAILS['Abstract']['styles']['jacow']
-            details.update({'title_style_ok': title_style_ok, 'style': p.style.name})
+            style_ok, detail = check_style(p, RULES['Abstract'])
+            details.update(detail, style_ok=style_ok)
+            title_style_ok = p.style == DETAILS['Abstract']['styles']['jacow']
+            details.update({'title_style_ok': title_style_ok, 'style': p.style})
             summary['Abstract'] = {
                 'details': [details],
                 'rules': DETAILS['Abstract'],
@@ -371,12 +371,13 @@ def parse_paragraphs(doc):
 
     # authors is all the text between title and abstract heading
     author_details = []
-    for p in doc.paragraphs[title_index+1: abstract_index]:
+    for p in index.paragraphs[title_index+1: abstract_index]:
         if p.text.strip():
             detail = get_author_details(p)
-            detail.update(check_style_detail(p, DETAILS['Authors']))
-            title_style_ok = p.style.name == DETAILS['Authors']['styles']['jacow']
-            detail.update({'title_style_ok': title_style_ok, 'style': p.style.name})
+            style_ok, style_detail = check_style(p, RULES['Authors'])
+            detail.update(style_detail, style_ok=style_ok)
+            title_style_ok = p.style == DETAILS['Authors']['styles']['jacow']
+            detail.update({'title_style_ok': title_style_ok, 'style': p.style})
             author_details.append(detail)
 
     summary['Authors'] = {
@@ -391,13 +392,14 @@ def parse_paragraphs(doc):
     return summary
 
 
-def create_upload_variables(doc, paper_name):
-    summary = {}
-    doc_summary = parse_paragraphs(doc)
+class UnknownCheckError(Exception):
+    """Raised when a check is asked for by a name that is not in CHECKS"""
+    pass
+
 
-    # get style details
+def build_styles(doc, context):
     jacow_styles = check_jacow_styles(doc)
-    summary['Styles'] = {
+    return {
         'title': 'JACoW Styles',
         'ok': all([tick['style_ok'] for tick in jacow_styles]),
         'message': 'Styles issues',
@@ -405,10 +407,11 @@ def create_upload_variables(doc, paper_name):
         'anchor': 'styles'
     }
 
-    # get page size and margin details
+
+def build_margins(doc, context):
     sections = check_sections(doc)
     ok = all([tick['margins_ok'] for tick in sections]) and all([tick['col_ok'] for tick in sections])
-    summary['Margins'] = {
+    return {
         'title': 'Page Size and Margins',
         'ok': ok,
         'message': 'Margins',
@@ -416,9 +419,11 @@ def create_upload_variables(doc, paper_name):
         'anchor': 'pagesize'
     }
 
+
+def build_languages(doc, context):
     language_summary = get_language_tags(doc)
     languages = get_language_tags_location(doc)
-    summary['Languages'] = {
+    return {
         'title': 'Languages',
         'ok': len([languages[lang] for lang in languages if languages[lang] not in VALID_LANGUAGES]) == 0,
         'message': 'Language issues',
@@ -427,12 +432,14 @@ def create_upload_variables(doc, paper_name):
         'anchor': 'language'
     }
 
+
+def build_list(doc, context):
     # get parsed document summary of styles
     all_summary = parse_all_paragraphs(doc)
     ok = all([tick['style_ok'] is True for tick in all_summary])
     if not ok:
         ok = 2
-    summary['List'] = {
+    return {
         'title': 'Parsed Document',
         'ok': ok,
         'message': 'Not using only JACoW Styles',
@@ -441,17 +448,29 @@ def create_upload_variables(doc, paper_name):
         'showTotal': True,
     }
 
-    summary['Title'] = doc_summary['Title']
-    title = doc_summary['Title']['details'][0]
 
-    summary['Authors'] = doc_summary['Authors']
-    authors = doc_summary['Authors']['details']
+def build_front_matter(doc, context):
+    # title, authors and abstract come from the one walk of the front matter
+    if 'front_matter' not in context:
+        context['front_matter'] = parse_paragraphs(doc)
+    return context['front_matter']
+
+
+def build_title(doc, context):
+    return build_front_matter(doc, context)['Title']
+
 
-    summary['Abstract'] = doc_summary['Abstract']
-    # summary['Headings'] = doc_summary['Headings']
+def build_authors(doc, context):
+    return build_front_matter(doc, context)['Authors']
 
+
+def build_abstract(doc, context):
+    return build_front_matter(doc, context)['Abstract']
+
+
+def build_headings(doc, context):
     headings = get_headings(doc)
-    summary['Headings'] = {
+    return {
         'title': 'Headings',
         'ok': all([tick['style_ok'] is True for tick in headings]),
         'message': 'Heading issues',
@@ -460,8 +479,10 @@ def create_upload_variables(doc, paper_name):
         'showTotal': True,
     }
 
+
+def build_paragraphs(doc, context):
     paragraphs = get_paragraphs(doc)
-    summary['Paragraphs'] = {
+    return {
         'title': 'Paragraphs',
         'ok': all([tick['style_ok'] for tick in paragraphs]),
         'message': 'Paragraph issues',
@@ -470,8 +491,10 @@ def create_upload_variables(doc, paper_name):
         'showTotal': True,
     }
 
+
+def build_references(doc, context):
     references_in_text, references_list = extract_references(doc)
-    summary['References'] = {
+    return {
         'title': 'References',
         'ok': references_list
               and all([tick['style_ok'] and tick['used_ok'] and tick['order_ok'] for tick in references_list]),
@@ -481,12 +504,14 @@ def create_upload_variables(doc, paper_name):
         'showTotal': True,
     }
 
+
+def build_figures(doc, context):
     figures = extract_figures(doc)
     ok = True
     for _, sub in figures.items():
         ok = ok and all([item['caption_ok'] and item['used_ok'] and item['style_ok'] for item in sub])
 
-    summary['Figures'] = {
+    return {
         'title': 'Figures',
         'ok': ok,
         'message': 'Figure issues',
@@ -495,8 +520,10 @@ def create_upload_variables(doc, paper_name):
         'showTotal': True,
     }
 
+
+def build_tables(doc, context):
     table_titles = check_table_titles(doc)
-    summary['Tables'] = {
+    return {
         'title': 'Tables',
         'ok': all([
             all([tick['text_format_ok'], tick['order_ok'], tick['style_ok'], tick['used'] > 0])
@@ -507,24 +534,192 @@ def create_upload_variables(doc, paper_name):
         'showTotal': True,
     }
 
-    if "URL_TO_JACOW_REFERENCES_CSV" in os.environ:
-        reference_csv_url = os.environ["URL_TO_JACOW_REFERENCES_CSV"]
-        author_text = ''.join([a['text'] + ", " for a in authors])
-        reference_csv_details = reference_csv_check(paper_name, title['text'], author_text)
-        summary['SPMS'] = {
-            'title': 'SPMS Abstract Title Author Check',
-            'ok': reference_csv_details['title']['match'] and reference_csv_details['author']['match'],
-            'message': 'SPMS Abstract Title Author Check issues',
-            'details': reference_csv_details['summary'],
-            'anchor': 'spms'
-        }
 
-    return summary, reference_csv_details, title
+def spms_enabled():
+    return "URL_TO_JACOW_REFERENCES_CSV" in os.environ or "PATH_TO_JACOW_CONFERENCES" in os.environ
 
 
+def get_spms_text(summary):
+    """the title and author text of a document that are compared with its
+    entry in the references csv"""
+    title = summary['Title']['details'][0]
+    authors = summary['Authors']['details']
+    return title['text'], ''.join([a['text'] + ", " for a in authors])
 
 
+def build_spms(doc, context):
+    conference_path, _ = resolve_paper_name(context['paper_name'])
+    if conference_path is None and 'URL_TO_JACOW_REFERENCES_CSV' not in os.environ:
+        # there are only the conferences' references csvs and the paper
+        # doesn't say which it is for
+        return {
+            'title': 'SPMS Abstract Title Author Check',
+            'ok': 2,
+            'message': 'Choose the conference the paper is for to check its title and authors against SPMS',
+            'details': [],
+            'anchor': 'spms'
+        }
+    title_text, author_text = get_spms_text(context['summary'])
+    previous = context.get('previous_csv_details')
+    if (
+        'SPMS' in context['reuse'] and previous
+        and previous['title']['docx'] == title_text
+        and previous['author']['docx'] == author_text
+    ):
+        # same paper, references csv, title and authors as last time
+        context['reference_csv_details'] = previous
+        return context['reuse']['SPMS']
+
+    reference_csv_details = reference_csv_check(context['paper_name'], title_text, author_text)
+    context['reference_csv_details'] = reference_csv_details
+    return {
+        'title': 'SPMS Abstract Title Author Check',
+        'ok': reference_csv_details['title']['match'] and reference_csv_details['author']['match'],
+        'message': 'SPMS Abstract Title Author Check issues',
+        'details': reference_csv_details['summary'],
+        'anchor': 'spms'
+    }
 
 
+# A check builds one section of the summary. parts are the parts of the
+# package it reads (see DocxReader.fingerprints), depends the checks whose
+# sections it uses and build the function that works out the section.
+# enabled, if given, says whether the check can be run at all.
+Check = namedtuple('Check', ['name', 'parts', 'depends', 'build', 'enabled'], defaults=[None])
+
+# in the order the sections are shown
+CHECKS = OrderedDict((check.name, check) for check in [
+    Check('Styles', ['styles'], [], build_styles),
+    Check('Margins', ['sections'], [], build_margins),
+    Check('Languages', ['language', 'body'], [], build_languages),
+    Check('List', ['body', 'styles'], [], build_list),
+    Check('Title', ['body', 'styles'], [], build_title),
+    Check('Authors', ['body', 'styles'], [], build_authors),
+    Check('Abstract', ['body', 'styles'], [], build_abstract),
+    Check('Headings', ['body', 'styles'], [], build_headings),
+    Check('Paragraphs', ['body', 'styles'], [], build_paragraphs),
+    Check('References', ['body', 'styles'], [], build_references),
+    Check('Figures', ['body', 'styles'], [], build_figures),
+    Check('Tables', ['body', 'styles'], [], build_tables),
+    # also compares the title and author text it was last built from
+    Check('SPMS', ['spms'], ['Title', 'Authors'], build_spms, spms_enabled),
+])
+
+
+def parse_checks(text):
+    """the check names in a comma separated list such as 'margins,spms',
+    None for all checks"""
+    if not text or not text.strip():
+        return None
+    names = {name.lower(): name for name in CHECKS}
+    checks = []
+    for name in text.split(','):
+        name = name.strip()
+        if not name:
+            continue
+        if name.lower() not in names:
+            raise UnknownCheckError(f"Unknown check {name}, expected one of {', '.join(CHECKS)}")
+        checks.append(names[name.lower()])
+    return checks
+
+
+def get_checks(names=None):
+    """the checks needed to build the sections *names*, with the checks they
+    depend on, in the order they are run. All checks when *names* is None."""
+    if names is None:
+        return list(CHECKS.values())
+    needed = set()
+    todo = list(names)
+    while todo:
+        name = todo.pop()
+        if name not in CHECKS:
+            raise UnknownCheckError(f"Unknown check {name}, expected one of {', '.join(CHECKS)}")
+        if name not in needed:
+            needed.add(name)
+            todo.extend(CHECKS[name].depends)
+    return [check for name, check in CHECKS.items() if name in needed]
+
+
+def get_reusable_sections(summary, parts, previous_parts):
+    """the sections of a previous *summary* that are still valid for a
+    document with the part fingerprints *parts*"""
+    return {
+        name: section for name, section in summary.items()
+        if name in CHECKS
+        and all(parts.get(part) == previous_parts.get(part) for part in CHECKS[name].parts)
+    }
 
 
+class LazySummary(Mapping):
+    """The summary shown on the report page, section name to section. A
+    section is only worked out when it is first read (along with the sections
+    it depends on) and then kept, so sections nobody looks at cost nothing.
+    Only the sections of the *checks* named are listed, the sections they
+    depend on are worked out for them but not shown."""
+
+    def __init__(self, doc, paper_name, checks=None, reuse=None, previous_csv_details=None):
+        # walk the document once and share the result with every check
+        self.doc = get_index(doc)
+        self._checks = OrderedDict(
+            (check.name, check) for check in get_checks(checks)
+            if check.enabled is None or check.enabled())
+        self._names = [name for name in self._checks if checks is None or name in checks]
+        self._sections = {}
+        self.context = {
+            'paper_name': paper_name,
+            'summary': self,
+            'reuse': reuse or {},
+            'previous_csv_details': previous_csv_details,
+            'reference_csv_details': None,
+        }
+
+    def __getitem__(self, name):
+        if name not in self._sections:
+            check = self._checks[name]
+            for depends in check.depends:
+                self[depends]
+            reuse = self.context['reuse']
+            if name in reuse and name != 'SPMS':
+                self._sections[name] = reuse[name]
+            else:
+                self._sections[name] = check.build(self.doc, self.context)
+        return self._sections[name]
+
+    def __contains__(self, name):
+        # without working the section out
+        return name in self._names
+
+    def __iter__(self):
+        return iter(self._names)
+
+    def __len__(self):
+        return len(self._names)
+
+    def read_further(self, doc):
+        """carries on with *doc*, the same document with more of it read. The
+        sections already worked out didn't need the rest, so they are kept,
+        the SPMS comparison along with them."""
+        self.doc = get_index(doc)
+
+    @property
+    def title(self):
+        """details of the title paragraph, None if the title wasn't checked"""
+        return self['Title']['details'][0] if 'Title' in self._checks else None
+
+    @property
+    def reference_csv_details(self):
+        """the SPMS comparison the SPMS section was built from, None if there
+        was no SPMS check"""
+        if 'SPMS' not in self._checks:
+            return None
+        self['SPMS']
+        return self.context['reference_csv_details']
+
+
+def create_upload_variables(doc, paper_name, reuse=None, previous_csv_details=None, checks=None):
+    """The summary shown on the report page from the *checks* named, all of
+    them by default, as a LazySummary.
+    Sections in *reuse* are taken as they are instead of being worked out
+    again, the SPMS section also needs the *previous_csv_details* it was
+    built from."""
+    return LazySummary(doc, paper_name, checks, reuse, previous_csv_details)
@@ -1,7 +1,8 @@
 import re
 from collections import OrderedDict
 from itertools import chain
-from jacowvalidator.docutils.styles import check_style
+from jacowvalidator.docutils.index import get_index
+from jacowvalidator.docutils.styles import check_style, StyleRule
 
 RE_FIG_TITLES = re.compile(r'(^Figure \d+[.:])')
 RE_FIG_INTEXT = re.compile(r'(Fig.\s?\d+|Figure\s?\d+[.\s]+)')
@@ -30,29 +31,33 @@ FIGURE_MULTI_DETAILS = {
     'italic': None,
 }
 
+FIGURE_RULE = StyleRule(FIGURE_DETAILS)
+FIGURE_MULTI_RULE = StyleRule(FIGURE_MULTI_DETAILS)
+
 
 def _fig_to_int(s):
     return int(''.join(filter(str.isdigit, s)))
 
 
 def extract_figures(doc):
+    index = get_index(doc)
     figures_refs = []
     figures_captions = []
 
     def _find_figure_captions(p):
         for f in RE_FIG_TITLES.findall(p.text.strip()):
-            figure_compare = FIGURE_DETAILS
+            figure_compare = FIGURE_RULE
             # 55 chars is approx where it changes from 1 line to 2 lines
             text = p.text.strip()
             if len(text) > 55:
-                figure_compare = FIGURE_MULTI_DETAILS
+                figure_compare = FIGURE_MULTI_RULE
 
             style_ok, detail = check_style(p, figure_compare)
-            style_name = p.style.name
-            if p.style.name not in ['Figure Caption', 'Caption Multi Line', 'Caption']:
+            style_name = p.style
+            if p.style not in ['Figure Caption', 'Caption Multi Line', 'Caption']:
                 final_style_ok = 2
             else:
-                final_style_ok = style_ok and p.style.name in ['Figure Caption', 'Caption Multi Line', 'Caption']
+                final_style_ok = style_ok and p.style in ['Figure Caption', 'Caption Multi Line', 'Caption']
 
             if 40 < len(text) < 80:
                 final_style_ok = 2
@@ -69,7 +74,7 @@ def extract_figures(doc):
             figure_detail.update(detail)
             figures_captions.append(figure_detail)
 
-    for p in doc.paragraphs:
+    for p in index.paragraphs:
         # find references to figures
         for f in iter(f.strip() for f in RE_FIG_INTEXT.findall(p.text)):
             if f.endswith('.') and p.text.strip().startswith(f):
@@ -81,11 +86,8 @@ def extract_figures(doc):
         _find_figure_captions(p)
 
     # search for figure captions in tables
-    for t in doc.tables:
-        for r in t.rows:
-            for c in r.cells:
-                for p in c.paragraphs:
-                    _find_figure_captions(p)
+    for p in index.table_paragraphs:
+        _find_figure_captions(p)
 
     figures = OrderedDict()
     # no figure found means there is probably an error with parsing though.
@@ -0,0 +1,182 @@
+"""Effective paragraph formatting worked out from styles.xml.
+
+   Each style's formatting is resolved once per document by following its
+   full basedOn chain down to the document defaults (w:docDefaults), so the
+   formatting of a paragraph is a lookup of its style plus whatever is set
+   directly on the paragraph and its runs.
+
+   Most papers are written from the same few JACoW templates, so the resolved
+   styles are kept in a process wide cache keyed by a hash of styles.xml and
+   shared by every document with the same styles."""
+
+import hashlib
+import os
+from docx.enum.style import WD_STYLE_TYPE
+from docx.oxml import parse_xml
+from docx.oxml.ns import qn
+from docx.styles import BabelFish
+
+from jacowvalidator.cache import LRUCache
+
+# Word's own font size when neither the styles nor the document defaults set one
+DEFAULT_FONT_SIZE = 10.0
+
+FORMAT_KEYS = ['alignment', 'space_before', 'space_after', 'first_line_indent',
+               'bold', 'italic', 'font_size', 'all_caps']
+
+# resolved styles by sha256 of styles.xml
+STYLES_CACHE = LRUCache(int(os.environ.get('STYLES_CACHE_SIZE', 32)))
+
+
+def styles_digest(blob):
+    return hashlib.sha256(blob).hexdigest()
+
+
+def resolve_styles(blob):
+    """ResolvedStyles for the styles.xml *blob*, parsed and resolved only the
+    first time these styles are seen. The result is shared so must not be
+    changed."""
+    digest = styles_digest(blob)
+    styles = STYLES_CACHE.get(digest)
+    if styles is None:
+        styles = ResolvedStyles(parse_xml(blob), digest)
+        STYLES_CACHE.put(digest, styles)
+    return styles
+
+
+class ResolvedStyles:
+    """Fully resolved formatting for every style in a styles.xml, keyed by
+    style id. Built from the w:styles element, see resolve_styles to share
+    one between documents."""
+
+    def __init__(self, styles, digest=None):
+        # hash of the styles.xml this was built from, if known
+        self.digest = digest
+        defaults = dict.fromkeys(FORMAT_KEYS)
+        doc_defaults = styles.find(qn('w:docDefaults'))
+        if doc_defaults is not None:
+            _update(defaults, _own_format(
+                doc_defaults.find(qn('w:pPrDefault') + '/' + qn('w:pPr')),
+                doc_defaults.find(qn('w:rPrDefault') + '/' + qn('w:rPr'))))
+
+        self.defaults = defaults
+        self.names = []
+        self.styles = {}
+        self._default_ids = {}
+        elements = {}
+        for style in styles.style_lst:
+            if style.styleId is None:
+                continue
+            elements.setdefault(style.styleId, style)
+            if style.name_val is not None:
+                self.names.append(BabelFish.internal2ui(style.name_val))
+            if style.default:
+                # spec calls for last default in document order
+                self._default_ids[_style_type(style)] = style.styleId
+
+        for style_id in elements:
+            self._resolve(style_id, elements, set())
+
+        # stands in for a missing default style
+        self._missing = dict(defaults, name=None, type=None)
+
+    def paragraph(self, style_id):
+        """formatting for the paragraph style *style_id*, or the default
+        paragraph style if there is no such paragraph style"""
+        return self._get(style_id, WD_STYLE_TYPE.PARAGRAPH)
+
+    def character(self, style_id):
+        """formatting for the character style *style_id*, or the default
+        character style if there is no such character style"""
+        return self._get(style_id, WD_STYLE_TYPE.CHARACTER)
+
+    def _get(self, style_id, style_type):
+        style = self.styles.get(style_id)
+        if style is None or style['type'] != style_type:
+            style = self.styles.get(self._default_ids.get(style_type), self._missing)
+        return style
+
+    def _resolve(self, style_id, elements, seen):
+        if style_id in self.styles:
+            return self.styles[style_id]
+        style = elements[style_id]
+        seen.add(style_id)
+        base_id = style.basedOn_val
+        if base_id in elements and base_id not in seen:
+            resolved = dict(self._resolve(base_id, elements, seen))
+        else:
+            resolved = dict(self.defaults)
+        _update(resolved, _own_format(style.pPr, style.rPr))
+        resolved['name'] = BabelFish.internal2ui(style.name_val) if style.name_val is not None else None
+        resolved['type'] = _style_type(style)
+        self.styles[style_id] = resolved
+        return resolved
+
+
+def get_style_details(p, styles):
+    """formatting of the paragraph element *p* using the resolved *styles*"""
+    style = styles.paragraph(p.style)
+    local = _own_format(p.pPr, None)
+    space_before, space_after, first_line_indent = [
+        local[key] if local[key] is not None else style[key]
+        for key in ['space_before', 'space_after', 'first_line_indent']]
+
+    bold, italic, font_size, all_caps = style['bold'], style['italic'], style['font_size'], style['all_caps']
+    # TODO get distinct list
+    for r in p.r_lst:
+        if not r.text.strip() or r.rPr is None:
+            continue
+        run = _own_format(None, r.rPr)
+        if run['font_size'] is not None:
+            font_size = run['font_size']
+        if run['bold'] is not None:
+            bold = run['bold']
+        if run['italic'] is not None:
+            italic = run['italic']
+        if run['all_caps'] is not None:
+            all_caps = run['all_caps']
+
+    if not font_size:
+        font_size = DEFAULT_FONT_SIZE
+
+    alignment = local['alignment'] if local['alignment'] is not None else style['alignment']
+    return {
+        'space_before': space_before,
+        'space_after': space_after,
+        'first_line_indent': first_line_indent,
+        'bold': bold,
+        'italic': italic,
+        'font_size': font_size,
+        'all_caps': all_caps,
+        'alignment': alignment,
+    }
+
+
+def _style_type(style):
+    # a style without w:type is a paragraph style
+    return style.type if style.type is not None else WD_STYLE_TYPE.PARAGRAPH
+
+
+def _update(resolved, own):
+    resolved.update((key, value) for key, value in own.items() if value is not None)
+
+
+def _own_format(pPr, rPr):
+    """the formatting set directly on a pPr and rPr, None where not set"""
+    own = dict.fromkeys(FORMAT_KEYS)
+    if pPr is not None:
+        if pPr.jc_val is not None:
+            own['alignment'] = pPr.jc_val._member_name
+        own['space_before'] = _pt(pPr.spacing_before)
+        own['space_after'] = _pt(pPr.spacing_after)
+        own['first_line_indent'] = _pt(pPr.first_line_indent)
+    if rPr is not None:
+        own['bold'] = rPr._get_bool_val('b')
+        own['italic'] = rPr._get_bool_val('i')
+        own['all_caps'] = rPr._get_bool_val('caps')
+        own['font_size'] = _pt(rPr.sz_val)
+    return own
+
+
+def _pt(length):
+    return None if length is None else length.pt
@@ -1,5 +1,5 @@
-import re
-from jacowvalidator.docutils.styles import check_style
+from jacowvalidator.docutils.index import get_index
+from jacowvalidator.docutils.styles import check_styles, compile_rules
 
 HEADING_DETAILS = {
     'Section': {
@@ -43,50 +43,41 @@ HEADING_DETAILS = {
     },
 }
 
+HEADING_RULES = compile_rules(HEADING_DETAILS)
+
+# heading type for each heading style, the first type listed wins
+HEADING_STYLES = {}
+for _name, _heading in HEADING_DETAILS.items():
+    HEADING_STYLES.setdefault(_heading['styles']['jacow'], _name)
+    HEADING_STYLES.setdefault(_heading['styles']['normal'], _name)
+
 
 def guess_heading_type(p):
     #
-    if p.style.name == 'Heading':
+    if p.style == 'Heading':
         return 'Section'
-    if p.style.name == 'Heading 2':
+    if p.style == 'Heading 2':
         return 'Subsection'
-    if p.style.name == 'Heading 3':
+    if p.style == 'Heading 3':
         return 'Third'
     else:
         return 'Section'
 
 
 def get_headings(doc):
-    data = iter(doc.paragraphs)
     headings = []
-    # don't start looking until abstract header
-    for p in data:
-        if p.text.strip().lower() == 'abstract':
-            break
-
-    for i, p in enumerate(data):
-        # no need to check after references
-        if p.text.lower() == 'references':
-            break
-
-        # find matching style
-        name = [name for name, h in HEADING_DETAILS.items() if p.style.name in [h['styles']['jacow'], h['styles']['normal']]]
-        text = p.text.strip()
-        text = re.sub(' +', ' ', text)
-
-        if name:
-            style_ok, detail = check_style(p, HEADING_DETAILS[name[0]])
-            if detail['all_caps']:
-                text = text.upper()
-
-            heading_details = {
-                'type': name[0],
-                'style': p.style.name,
-                'style_ok': style_ok,
-                'text': p.text
-            }
-            heading_details.update(detail)
-            headings.append(heading_details)
+    # only look between the abstract and references headers
+    found = [(p, HEADING_STYLES[p.style]) for p in get_index(doc).main_text() if p.style in HEADING_STYLES]
+    checked = check_styles((p, HEADING_RULES[name]) for p, name in found)
+    for (p, name), (style_ok, detail) in zip(found, checked):
+        heading_details = {
+            'type': name,
+            'style': p.style,
+            'style_ok': style_ok,
+            'text': p.text
+        }
+        heading_details.update(detail)
+        headings.append(heading_details)
         # elif 10 < len(text) < PARAGRAPH_SIZE_MIN:
         #     # TODO check if any real paragraphs start with figure or table
         #     if text.startswith('Table ') or text.startswith('Figure ') or text.startswith('Fig. '):
@@ -100,7 +91,7 @@ def get_headings(doc):
         #     final_style_ok = 2
         #     heading_details = {
         #         'type': name[0],
-        #         'style': f"'{p.style.name}' checking against heading type: '{name}'",
+        #         'style': f"'{p.style}' checking against heading type: '{name}'",
         #         'style_ok': final_style_ok,
         #         'text': text
         #     }
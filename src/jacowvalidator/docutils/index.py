@@ -0,0 +1,206 @@
+"""Single pass index over the body of a docx document.
+
+   python-docx rebuilds every Paragraph proxy each time doc.paragraphs is
+   read, so rather than have every checker walk the document again, the
+   body is walked once here and the checkers read from the index."""
+
+from collections import namedtuple
+from docx.opc.oxml import serialize_part_xml
+from docx.oxml.table import CT_Tbl, CT_TblPr
+from docx.oxml.text.paragraph import CT_P
+from docx.oxml.text.font import CT_RPr
+from docx.table import Table
+from lxml.etree import _Element
+
+from jacowvalidator.docutils.formatting import resolve_styles
+
+# a run reduced to the values the checkers use
+IndexedRun = namedtuple('IndexedRun', ['text', 'superscript', 'all_caps', 'lang'])
+
+
+class IndexedParagraph:
+    """A paragraph from the body or a table cell. The text and style name
+    are read up front, everything else on first use."""
+
+    def __init__(self, element, index, styles, location=None):
+        self.element = element
+        self.index = index
+        # resolved formatting of the document's styles, shared by all paragraphs
+        self.styles = styles
+        # None for paragraphs in the body, (table, row, column) for table cells
+        self.location = location
+        self.text = ''.join(r.text for r in element.r_lst)
+        self.style_id = element.style
+        self.style = styles.paragraph(self.style_id)['name']
+        self._runs = None
+        # filled in by styles.get_paragraph_details when first checked
+        self.style_details = None
+
+    @property
+    def in_table(self):
+        return self.location is not None
+
+    @property
+    def style_all_caps(self):
+        return bool(self.styles.paragraph(self.style_id)['all_caps'])
+
+    @property
+    def runs(self):
+        if self._runs is None:
+            self._runs = [_index_run(r, self.styles) for r in self.element.r_lst]
+        return self._runs
+
+    def detach(self):
+        """reads everything still to be read from the paragraph so the xml
+        behind it can be freed"""
+        self._runs = self.runs
+        self.element = None
+
+
+class IndexedTable:
+    """A top level table with the paragraph directly before it, which is
+    where the table caption should be."""
+
+    def __init__(self, table, number, title):
+        self.number = number
+        self.title = title
+        self.rows = len(table.rows)
+        self.columns = len(table.columns)
+        self.floating = is_floating_table(table._element)
+        self.paragraphs = []
+
+    @property
+    def has_text(self):
+        return any(p.text.strip() for p in self.paragraphs)
+
+
+class DocumentIndex:
+    """Everything the checkers need from a document, gathered in one walk"""
+
+    def __init__(self):
+        self.paragraphs = []
+        self.tables = []
+        self.sections = []
+        self.styles = None
+        self.core_properties = None
+        self.tracking_on = False
+        self.title_index = -1
+        self.abstract_index = -1
+        self.references_index = -1
+
+    @property
+    def style_names(self):
+        return self.styles.names
+
+    @property
+    def table_paragraphs(self):
+        for table in self.tables:
+            yield from table.paragraphs
+
+    def front_matter(self):
+        """the paragraphs between the title and the abstract heading"""
+        return self.paragraphs[self.title_index + 1:self.abstract_index]
+
+    def after_abstract(self):
+        """the paragraphs after the abstract heading to the end of the document"""
+        if self.abstract_index == -1:
+            return []
+        return self.paragraphs[self.abstract_index + 1:]
+
+    def main_text(self):
+        """the paragraphs between the abstract heading and the references heading"""
+        if self.abstract_index == -1:
+            return []
+        end = self.references_index if self.references_index != -1 else len(self.paragraphs)
+        return self.paragraphs[self.abstract_index + 1:end]
+
+
+def get_index(doc):
+    """returns *doc* if it is already an index, otherwise indexes it"""
+    if isinstance(doc, DocumentIndex):
+        return doc
+    return index_document(doc)
+
+
+def index_document(doc):
+    """Indexes a document already opened with python-docx. See
+    reader.index_docx to index a file without opening it this way."""
+    index = DocumentIndex()
+    index.styles = resolve_styles(serialize_part_xml(doc.styles.element))
+    prev = None
+    for child in doc.element.body.iterchildren():
+        if isinstance(child, CT_P):
+            prev = add_paragraph(index, child)
+        elif isinstance(child, CT_Tbl):
+            add_table(index, child, prev)
+
+    index.sections = list(doc.sections)
+    index.core_properties = doc.core_properties
+    return index
+
+
+def add_paragraph(index, p):
+    """adds the next body paragraph to the index"""
+    entry = IndexedParagraph(p, len(index.paragraphs), index.styles)
+    index.paragraphs.append(entry)
+
+    text = entry.text.strip()
+    if text:
+        if index.title_index == -1:
+            index.title_index = entry.index
+        if index.abstract_index == -1:
+            if text.lower() == 'abstract':
+                index.abstract_index = entry.index
+        elif index.references_index == -1 and text.lower() == 'references':
+            index.references_index = entry.index
+
+    if not index.tracking_on:
+        index.tracking_on = any(c.tag.endswith('}ins') for c in p.iterchildren())
+    return entry
+
+
+def add_table(index, tbl, title):
+    """adds the next top level table to the index, *title* is the paragraph before it"""
+    table = Table(tbl, None)
+    entry = IndexedTable(table, len(index.tables) + 1, title)
+    # row.cells repeats merged cells, as doc.tables did for the checkers
+    for r in table.rows:
+        for col, c in enumerate(r.cells, 1):
+            for p in c._tc.p_lst:
+                entry.paragraphs.append(IndexedParagraph(p, 0, index.styles, (entry.number, r._index + 1, col)))
+    index.tables.append(entry)
+    return entry
+
+
+def _index_run(run, styles):
+    lang = None
+    for c in run.iterchildren():
+        if isinstance(c, CT_RPr):
+            for cc in c.iterchildren():
+                if isinstance(cc, _Element) and 'lang' in str(cc):
+                    lang = cc.items()[0][1]
+    rPr = run.rPr
+    superscript = rPr.superscript if rPr is not None else None
+    all_caps = bool(styles.character(run.style)['all_caps'] or rPr is not None and rPr._get_bool_val('caps'))
+    return IndexedRun(run.text, superscript, all_caps, lang)
+
+
+def is_floating_table(tbl):
+    # check whether floating table
+    tblppr = False
+    width_type = False
+    for c in tbl.iterchildren():
+        if isinstance(c, CT_TblPr):
+            for c2 in c.iterchildren():
+                if isinstance(c2, _Element) and 'tblpPr' in str(c2):
+                    tblppr = True
+                    for c3 in c2.items():
+                        if 'tblpY' in str(c3):
+                            # width should be higher then the line height of 11
+                            tblppr = int(c3[1]) > 11
+                # also need to check that tblW is auto
+                if isinstance(c2, _Element) and 'tblW' in str(c2):
+                    # type is the second attribute of tblW
+                    width_type = c2.items()[1][1] == 'auto'
+
+    return tblppr and width_type
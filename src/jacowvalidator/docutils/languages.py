@@ -1,5 +1,4 @@
-from docx.oxml.text.font import CT_RPr
-from lxml.etree import _Element
+from jacowvalidator.docutils.index import get_index
 
 VALID_LANGUAGES = ['en-US', 'en-GB', 'en-AU', 'en-NZ']
 
@@ -12,15 +11,13 @@ def get_language_tags(doc):
 
 
 def get_language_tags_location(doc):
+    index = get_index(doc)
     tags = {}
-    if doc.core_properties.language != '':
-        tags['-1'] = doc.core_properties.language
-    for i, p in enumerate(doc.paragraphs):
+    if index.core_properties.language != '':
+        tags['-1'] = index.core_properties.language
+    for p in index.paragraphs:
         for r in p.runs:
-            for c in r.element.iterchildren():
-                if isinstance(c, CT_RPr):
-                    for cc in c.iterchildren():
-                        if isinstance(cc, _Element) and 'lang' in str(cc):
-                            tags[r.text] = cc.items()[0][1]
+            if r.lang is not None:
+                tags[r.text] = r.lang
     # get unique list
     return tags
@@ -1,10 +1,11 @@
 from lxml.etree import _Element
+from jacowvalidator.docutils.index import get_index
 from jacowvalidator.docutils.page import get_page_size, convert_twips_to_cm
 
 
 def check_sections(doc):
     sections = []
-    for i, section in enumerate(doc.sections):
+    for i, section in enumerate(get_index(doc).sections):
         cols = get_columns(section)
         sections.append(
             {
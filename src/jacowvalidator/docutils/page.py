@@ -1,5 +1,6 @@
 from docx.shared import Inches, Mm, Twips
-from jacowvalidator.docutils.styles import check_style
+from jacowvalidator.docutils.index import get_index
+from jacowvalidator.docutils.styles import check_style, StyleRule
 # from jacowvalidator.docutils.doc import AbstractNotFoundError
 
 class TrackingOnError(Exception):
@@ -33,6 +34,9 @@ ABSTRACT_DETAILS = {
     'italic': True,
 }
 
+AUTHOR_RULE = StyleRule(AUTHOR_DETAILS)
+ABSTRACT_RULE = StyleRule(ABSTRACT_DETAILS)
+
 
 def get_page_size(section):
     width = round(section.page_width, -4)
@@ -45,39 +49,35 @@ def get_page_size(section):
 
 
 def get_abstract_and_author(doc):
+    index = get_index(doc)
     abstract = {}
-    title_start = -1
-    for i, p in enumerate(doc.paragraphs):
-        if p.text.strip() and title_start == -1:
-            title_start = i
-
-        if p.text.strip().lower() == 'abstract':
-            style_ok, detail = check_style(p, ABSTRACT_DETAILS)
-            abstract = {
-                'start': i,
-                'text': p.text,
-                'style': p.style.name,
-                'style_ok': style_ok,
-            }
-            abstract.update(detail)
-            break
+    if index.abstract_index != -1:
+        p = index.paragraphs[index.abstract_index]
+        style_ok, detail = check_style(p, ABSTRACT_RULE)
+        abstract = {
+            'start': p.index,
+            'text': p.text,
+            'style': p.style,
+            'style_ok': style_ok,
+        }
+        abstract.update(detail)
 
     # if abstract not found
     # if 'start' not in abstract:
     #    raise AbstractNotFoundError("Abstract header not found")
 
-    author_paragraphs = doc.paragraphs[title_start+1: abstract['start']]
+    author_paragraphs = index.paragraphs[index.title_index+1: abstract['start']]
 
     authors = []
     for p in author_paragraphs:
         if p.text.strip():
             superscript_removed_text = ''  # remove superscript footnotes
             for r in p.runs:
-                superscript_removed_text += r.text if not r.font.superscript else ''
-            style_ok, detail = check_style(p, AUTHOR_DETAILS)
+                superscript_removed_text += r.text if not r.superscript else ''
+            style_ok, detail = check_style(p, AUTHOR_RULE)
             author_details = {
                 'text': superscript_removed_text,
-                'style': p.style.name,
+                'style': p.style,
                 'style_ok': style_ok,
             }
             author_details.update(detail)
@@ -86,8 +86,8 @@ def get_abstract_and_author(doc):
 
 
 def get_text(p):
-    text = ''.join([r.text.upper() if r.style.font.all_caps or r.font.all_caps else r.text for r in p.runs])
-    if p.style.font.all_caps or p.style.base_style and p.style.base_style.font.all_caps:
+    text = ''.join([r.text.upper() if r.all_caps else r.text for r in p.runs])
+    if p.style_all_caps:
         text = text.upper()
     return text
 
@@ -105,10 +105,7 @@ def convert_twips_to_cm(twips):
 
 
 def check_tracking_on(doc):
-    for i, p in enumerate(doc.paragraphs):
-        element = p._element
-        for child in element.iterchildren():
-            if '}ins ' in str(child) or '}del ' in child or 'proofErr' in child:
-                raise TrackingOnError('Tracking Changes is on. Please Accept or Reject tracked changes, turn off track changes and resubmit')
+    if get_index(doc).tracking_on:
+        raise TrackingOnError('Tracking Changes is on. Please Accept or Reject tracked changes, turn off track changes and resubmit')
 
     return False
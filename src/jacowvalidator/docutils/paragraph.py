@@ -1,6 +1,7 @@
 import re
-from jacowvalidator.docutils.styles import check_style
-from jacowvalidator.docutils.heading import HEADING_DETAILS
+from jacowvalidator.docutils.index import get_index
+from jacowvalidator.docutils.styles import check_styles, StyleRule
+from jacowvalidator.docutils.heading import HEADING_STYLES
 
 PARAGRAPH_DETAILS = {
     'styles': {
@@ -14,54 +15,48 @@ PARAGRAPH_DETAILS = {
     'first_line_indent': 9.35  # 0.33cm
 }
 
+PARAGRAPH_RULE = StyleRule(PARAGRAPH_DETAILS)
+
 PARAGRAPH_SIZE_MIN = 50
 
 
 def get_paragraphs(doc):
-    data = iter(doc.paragraphs)
-    paragraphs = []
-    # don't start looking until abstract header
-    for p in data:
-        if p.text.strip().lower() == 'abstract':
-            break
-
-    for i, p in enumerate(data):
+    found = []
+    # only look between the abstract and references headers
+    for p in get_index(doc).main_text():
         # only for paraphaphs that are not references, figure captions, headings
         text = p.text.strip()
         text = re.sub(' +', ' ', text)
 
         if text:
-            # no need to check after references
-            if text.lower() == 'references':
-                break
-
             # ignore table and figure cations
             # TODO check if any real paragraphs start with figure or table
             if text.startswith('Table ') or text.startswith('Figure ') or text.startswith('Fig. '):
                 continue
 
             # ignore if heading style
-            name = [name for name, h in HEADING_DETAILS.items() if
-                        p.style.name in [h['styles']['jacow'], h['styles']['normal']]]
-
-            if name:
+            if p.style in HEADING_STYLES:
                 continue
 
             # short paragraphs are probably headings
             if len(text) < PARAGRAPH_SIZE_MIN:
                 continue
 
-            style_ok, detail = check_style(p, PARAGRAPH_DETAILS)
-            if detail['all_caps']:
-                text = text.upper()
+            found.append((p, text))
 
-            paragraph_details = {
-                'type': 'Paragraph',
-                'style': p.style.name,
-                'style_ok': style_ok,
-                'text': text
-            }
-            paragraph_details.update(detail)
-            paragraphs.append(paragraph_details)
+    paragraphs = []
+    checked = check_styles((p, PARAGRAPH_RULE) for p, _ in found)
+    for (p, text), (style_ok, detail) in zip(found, checked):
+        if detail['all_caps']:
+            text = text.upper()
+
+        paragraph_details = {
+            'type': 'Paragraph',
+            'style': p.style,
+            'style_ok': style_ok,
+            'text': text
+        }
+        paragraph_details.update(detail)
+        paragraphs.append(paragraph_details)
 
     return paragraphs
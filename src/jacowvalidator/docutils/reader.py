@@ -0,0 +1,251 @@
+"""Read only access to a .docx package for validation.
+
+   Document() loads every part of the package (media, fonts, custom xml) and
+   keeps the whole of word/document.xml in memory. Validation only needs the
+   body, the styles and the core properties, so this streams the body with
+   iterparse, frees each block once it has been indexed, and only parses the
+   other parts when they are asked for."""
+
+import hashlib
+import posixpath
+import zipfile
+from lxml import etree
+from docx.opc.constants import RELATIONSHIP_TYPE as RT
+from docx.opc.coreprops import CoreProperties
+from docx.opc.exceptions import PackageNotFoundError
+from docx.opc.parts.coreprops import CorePropertiesPart
+from docx.oxml import element_class_lookup, parse_xml
+from docx.oxml.ns import qn
+from docx.oxml.section import CT_SectPr
+from docx.oxml.table import CT_Tbl
+from docx.oxml.text.paragraph import CT_P
+from docx.section import Section
+from docx.settings import Settings
+from docx.styles.styles import Styles
+
+from jacowvalidator.docutils.formatting import resolve_styles, styles_digest
+from jacowvalidator.docutils.index import DocumentIndex, add_paragraph, add_table
+from jacowvalidator.docutils.styles import get_paragraph_details
+
+BODY_TAGS = (qn('w:p'), qn('w:tbl'), qn('w:sectPr'))
+RELATIONSHIPS_NS = '{http://schemas.openxmlformats.org/package/2006/relationships}Relationship'
+
+class DocxReader:
+    """Opens the zip of a .docx file (a path or a file like object) and
+    gives lazy access to the parts used for validation"""
+
+    def __init__(self, source):
+        try:
+            self._zip = zipfile.ZipFile(source)
+        except zipfile.BadZipFile:
+            raise PackageNotFoundError("Package not found")
+
+        package_rels = self._relationships('/')
+        if RT.OFFICE_DOCUMENT not in package_rels:
+            self.close()
+            raise PackageNotFoundError("Package has no main document part")
+        self.document_partname = package_rels[RT.OFFICE_DOCUMENT]
+        self.core_properties_partname = package_rels.get(RT.CORE_PROPERTIES)
+        self._document_rels = self._relationships(self.document_partname)
+
+        self._styles = None
+        self._settings = None
+        self._core_properties = None
+        self._sections = None
+        self._digests = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self._zip.close()
+
+    def read(self, partname):
+        return self._zip.read(partname.lstrip('/'))
+
+    def part_for(self, reltype):
+        """partname of the document part related by *reltype*, or None"""
+        return self._document_rels.get(reltype)
+
+    @property
+    def styles_xml(self):
+        """the raw bytes of styles.xml"""
+        partname = self.part_for(RT.STYLES)
+        if partname is None:
+            return _DEFAULT_STYLES.encode()
+        return self.read(partname)
+
+    @property
+    def styles(self):
+        if self._styles is None:
+            self._styles = Styles(parse_xml(self.styles_xml))
+        return self._styles
+
+    @property
+    def settings(self):
+        if self._settings is None:
+            partname = self.part_for(RT.SETTINGS)
+            if partname is None:
+                self._settings = Settings(parse_xml(_DEFAULT_SETTINGS))
+            else:
+                self._settings = Settings(parse_xml(self.read(partname)))
+        return self._settings
+
+    @property
+    def core_properties(self):
+        if self._core_properties is None:
+            if self.core_properties_partname is None:
+                # same defaults python-docx uses for a package without them
+                self._core_properties = CorePropertiesPart.default(None).core_properties
+            else:
+                self._core_properties = CoreProperties(parse_xml(self.read(self.core_properties_partname)))
+        return self._core_properties
+
+    def iter_body(self):
+        """Yields the paragraphs, tables and final section properties directly
+        under w:body in document order. Each element is cleared when the next
+        one is asked for, so it must be fully read before then."""
+        with self._open_document() as f:
+            context = etree.iterparse(f, events=('end',), tag=BODY_TAGS, remove_blank_text=True)
+            context.set_element_class_lookup(element_class_lookup)
+            for _, element in context:
+                parent = element.getparent()
+                if parent is None or parent.tag != qn('w:body'):
+                    # paragraphs in tables are read with their table
+                    continue
+                yield element
+                if not isinstance(element, CT_SectPr):
+                    element.clear()
+                # drop what has already been read from the tree
+                while element.getprevious() is not None:
+                    del parent[0]
+
+    def read_sections(self):
+        """The section properties of the document in order, read without
+        keeping the rest of the body. The body and sections fingerprints are
+        worked out in the same pass, which is only made once."""
+        if self._sections is not None:
+            return self._sections
+
+        self._sections = []
+        body, sections = hashlib.sha256(), hashlib.sha256()
+        with self._open_document() as f:
+            for _, element in etree.iterparse(f, events=('end',), tag=BODY_TAGS):
+                parent = element.getparent()
+                if parent is None or parent.tag != qn('w:body'):
+                    # read with the block they are in
+                    continue
+                sectPr = _section_break(element)
+                if sectPr is not None:
+                    xml = etree.tostring(sectPr)
+                    sections.update(xml)
+                    self._sections.append(parse_xml(xml))
+                    sectPr.getparent().remove(sectPr)
+                if element.tag != qn('w:sectPr'):
+                    body.update(etree.tostring(element))
+                element.clear()
+                while element.getprevious() is not None:
+                    del parent[0]
+        self._digests = {'body': body.hexdigest(), 'sections': sections.hexdigest()}
+        return self._sections
+
+    def fingerprints(self):
+        """Hashes of the parts of the package the checks read, so a revised
+        upload can tell which checks need to be run again.
+
+        document.xml is split into the section properties ('sections') and
+        everything else ('body'), as page setup is often fixed on its own.
+        Both are hashed a block at a time as the sections are read."""
+        self.read_sections()
+        return {
+            'styles': styles_digest(self.styles_xml),
+            'body': self._digests['body'],
+            'sections': self._digests['sections'],
+            # the rest of the core properties change on every save
+            'language': self.core_properties.language,
+        }
+
+    def _open_document(self):
+        return self._zip.open(self.document_partname.lstrip('/'))
+
+    def _relationships(self, partname):
+        """{relationship type: target partname} for the part *partname*"""
+        base = posixpath.dirname(partname)
+        rels_name = posixpath.join(base, '_rels', posixpath.basename(partname) + '.rels').lstrip('/')
+        try:
+            rels = etree.fromstring(self._zip.read(rels_name))
+        except KeyError:
+            return {}
+        result = {}
+        for rel in rels.iter(RELATIONSHIPS_NS):
+            if rel.get('TargetMode') == 'External':
+                continue
+            target = rel.get('Target')
+            if not target.startswith('/'):
+                target = posixpath.normpath(posixpath.join('/', base, target))
+            result.setdefault(rel.get('Type'), target)
+        return result
+
+
+def index_docx(source, body=True):
+    """Builds a DocumentIndex straight from a .docx file without loading the
+    whole package. Only one block of the body is held as xml at a time."""
+    with DocxReader(source) as reader:
+        return read_index(reader, body)
+
+
+def read_index(reader, body=True):
+    """Builds a DocumentIndex from an open DocxReader. With *body* False only
+    the styles, sections and core properties are read."""
+    index = DocumentIndex()
+    index.styles = resolve_styles(reader.styles_xml)
+    if not body:
+        index.sections = [Section(sectPr, None) for sectPr in reader.read_sections()]
+        index.core_properties = reader.core_properties
+        return index
+
+    prev = None
+    for element in reader.iter_body():
+        if isinstance(element, CT_P):
+            # keep any section break before the paragraph is cleared
+            if element.pPr is not None and element.pPr.sectPr is not None:
+                sectPr = element.pPr.sectPr
+                element.pPr.remove(sectPr)
+                index.sections.append(Section(sectPr, None))
+            prev = add_paragraph(index, element)
+            _detach(prev)
+        elif isinstance(element, CT_Tbl):
+            for p in add_table(index, element, prev).paragraphs:
+                _detach(p)
+        elif isinstance(element, CT_SectPr):
+            index.sections.append(Section(element, None))
+
+    index.core_properties = reader.core_properties
+    return index
+
+
+def _section_break(element):
+    """the section properties of a block directly under w:body, or None"""
+    if element.tag == qn('w:sectPr'):
+        return element
+    if element.tag == qn('w:p'):
+        return element.find(f"{qn('w:pPr')}/{qn('w:sectPr')}")
+    return None
+
+
+def _detach(p):
+    # work out the formatting now, the xml is gone once the next block is read
+    get_paragraph_details(p)
+    p.detach()
+
+
+_DEFAULT_STYLES = (
+    '<w:styles xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"/>'
+)
+
+_DEFAULT_SETTINGS = (
+    '<w:settings xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"/>'
+)
@@ -1,6 +1,7 @@
 import re
 from itertools import chain
-from jacowvalidator.docutils.styles import check_style
+from jacowvalidator.docutils.index import get_index
+from jacowvalidator.docutils.styles import check_style, StyleRule
 
 RE_REFS_LIST = re.compile(r'^\[([\d]+)\]')
 RE_REFS_LIST_TAB = re.compile(r'^\[([\d]+)\]\t')
@@ -43,6 +44,10 @@ REFERENCE_MORE_DETAILS = {
     'first_line_indent': -18.7,  # 0.68 cm,
 }
 
+REFERENCE_RULE = StyleRule(REFERENCE_DETAILS)
+REFERENCE_LESS_RULE = StyleRule(REFERENCE_LESS_DETAILS)
+REFERENCE_MORE_RULE = StyleRule(REFERENCE_MORE_DETAILS)
+
 
 def _ref_to_int(ref):
     try:
@@ -58,15 +63,13 @@ def _ref_to_int(ref):
 
 
 def extract_references(doc, strict_styles=False):
-    data = iter(doc.paragraphs)
+    index = get_index(doc)
     references_in_text = []
 
     # don't start looking until abstract header
-    for p in data:
-        if p.text.strip().lower() == 'abstract':
-            break
-    else:
+    if index.abstract_index == -1:
         raise Exception('Abstract header not found')
+    data = index.after_abstract()
 
     # find all references in text and references list
     references_list = []
@@ -81,7 +84,7 @@ def extract_references(doc, strict_styles=False):
                 if int(ref) == 1:
                     ref_list_start = i
                 references_list.append(
-                    dict(id=int(ref), text=p.text.strip(), style=p.style.name)
+                    dict(id=int(ref), text=p.text.strip(), style=p.style)
                 )
         elif ref_list_start > 0:
             should_find = references_list[-1]['id'] + 1
@@ -90,7 +93,7 @@ def extract_references(doc, strict_styles=False):
                     dict(
                         id=should_find,
                         text=p.text.strip(),
-                        style=p.style.name,
+                        style=p.style,
                         text_ok=False,
                         text_error=f"Number format wrong should be [{should_find}]"
                     )
@@ -137,7 +140,7 @@ def extract_references(doc, strict_styles=False):
             ref['text_ok'] = False
 
         if ref_count <= 9:
-            style_ok, detail = check_style(p, REFERENCE_DETAILS)
+            style_ok, detail = check_style(p, REFERENCE_RULE)
             if strict_styles:
                 ref['style_ok'] = ref['style'] == 'JACoW_Reference when <= 9 Refs'
                 if not ref['style_ok']:
@@ -146,7 +149,7 @@ def extract_references(doc, strict_styles=False):
                 ref['style_ok'] = style_ok
         else:
             if i <= 9:
-                style_ok, detail = check_style(p, REFERENCE_LESS_DETAILS)
+                style_ok, detail = check_style(p, REFERENCE_LESS_RULE)
                 if strict_styles:
                     ref['style_ok'] = ref['style'] == 'JACoW_Reference #1-9 when >= 10 Refs'
                     if not ref['style_ok']:
@@ -155,7 +158,7 @@ def extract_references(doc, strict_styles=False):
                     ref['style_ok'] = style_ok
 
             else:
-                style_ok, detail = check_style(p, REFERENCE_MORE_DETAILS)
+                style_ok, detail = check_style(p, REFERENCE_MORE_RULE)
                 if strict_styles:
                     ref['style_ok'] = ref['style'] == 'JACoW_Reference #10 onwards'
                     if not ref['style_ok']:
@@ -1,4 +1,8 @@
 import operator
+import os
+from jacowvalidator.cache import LRUCache
+from jacowvalidator.docutils.formatting import FORMAT_KEYS, STYLES_CACHE, get_style_details
+from jacowvalidator.docutils.index import get_index
 
 
 VALID_STYLES = ['JACoW_Abstract_Heading',
@@ -27,206 +31,150 @@ VALID_NON_JACOW_STYLES = ['Figure Caption',
 # 'Heading 3' for Acronyms header
 OTHER_VALID_STYLES = ['Body Text Indent', 'Normal', 'Caption', 'Heading 3']
 
+# check_jacow_styles results by sha256 of styles.xml, the result only
+# depends on the style names
+JACOW_STYLES_CACHE = LRUCache(int(os.environ.get('STYLES_CACHE_SIZE', 32)))
+
 
 # check if th
 def check_jacow_styles(doc):
-    result = []
-    jacow_styles = get_jacow_styles(doc)
+    index = get_index(doc)
+    digest = index.styles.digest
+    result = JACOW_STYLES_CACHE.get(digest) if digest is not None else None
+    if result is None:
+        result = []
+        jacow_styles = get_jacow_styles(index)
+
+        for valid_style in VALID_STYLES:
+            result.append({'style': valid_style, 'style_ok': valid_style in jacow_styles})
+
+        if digest is not None:
+            JACOW_STYLES_CACHE.put(digest, result)
+
+    # copied so the cached result is never changed by the caller
+    return [dict(item) for item in result]
 
-    for valid_style in VALID_STYLES:
-        result.append({'style': valid_style, 'style_ok': valid_style in jacow_styles})
 
-    return result
+def get_styles_cache_info():
+    """hit and miss counts of the style caches, for sizing STYLES_CACHE_SIZE"""
+    return {
+        'resolved_styles': STYLES_CACHE.info(),
+        'jacow_styles': JACOW_STYLES_CACHE.info(),
+    }
 
 
 def get_jacow_styles(doc):
-    return [s.name for s in doc.styles if s.name.startswith('JACoW')]
+    return [name for name in get_index(doc).style_names if name.startswith('JACoW')]
 
 
 def get_paragraph_style_exceptions(doc):
-    jacow_styles = get_jacow_styles(doc)
+    index = get_index(doc)
+    jacow_styles = get_jacow_styles(index)
     exceptions = []
-    for i, p in enumerate(doc.paragraphs):
+    for p in index.paragraphs:
         if (
             not p.text.strip() == ''
-            and p.style.name not in jacow_styles
-            and p.style.name not in OTHER_VALID_STYLES
+            and p.style not in jacow_styles
+            and p.style not in OTHER_VALID_STYLES
         ):
             exceptions.append(p)
     return exceptions
 
 
-def get_paragraph_alignment(paragraph):
-    # alignment style can be overridden by more local definition
-    alignment = paragraph.style.paragraph_format.alignment
-    if alignment is None and paragraph.style.base_style is not None and \
-            paragraph.style.base_style.paragraph_format.alignment is not None:
-        alignment = paragraph.style.base_style.paragraph_format.alignment
-
-    if paragraph.alignment is not None:
-        alignment = paragraph.alignment
-    elif paragraph.paragraph_format.alignment is not None:
-        alignment = paragraph.paragraph_format.alignment
-
-    if alignment:
-        return alignment._member_name
-    else:
-        return None
-
-
-def get_paragraph_space(paragraph):
-    # paragraph formatting style can be overridden by more local definition
-    before, after, first_line_indent = \
-        paragraph.style.paragraph_format.space_before, \
-        paragraph.style.paragraph_format.space_after, \
-        paragraph.style.paragraph_format.first_line_indent
-    if before is None and paragraph.style.base_style is not None:
-        before = paragraph.style.base_style.paragraph_format.space_before
-    if after is None and paragraph.style.base_style is not None:
-        after = paragraph.style.base_style.paragraph_format.space_after
-    if first_line_indent is None and paragraph.style.base_style is not None:
-        first_line_indent = paragraph.style.base_style.paragraph_format.first_line_indent
-
-    if paragraph.paragraph_format.space_before is not None:
-        before = paragraph.paragraph_format.space_before
-    if paragraph.paragraph_format.space_after is not None:
-        after = paragraph.paragraph_format.space_after
-    if paragraph.paragraph_format.first_line_indent is not None:
-        first_line_indent = paragraph.paragraph_format.first_line_indent
-
-    if before:
-        before = before.pt
-    if after:
-        after = after.pt
-    if first_line_indent:
-        first_line_indent = first_line_indent.pt
-
-    return before, after, first_line_indent
-
-
-def get_style_font(paragraph):
-    # use paragraph style if values set
-    style = paragraph.style
-    bold, italic, font_size, all_caps = style.font.bold, style.font.italic, style.font.size, style.font.all_caps
-    if paragraph.style.base_style is not None:
-        style = paragraph.style.base_style
-        # if values not set, use base style
-        if font_size is None:
-            font_size = style.font.size
-        if bold is None:
-            bold = style.font.bold
-        if italic is None:
-            italic = style.font.italic
-        if all_caps is None:
-            all_caps = style.font.all_caps
-
-    # TODO get distinct list
-    for r in paragraph.runs:
-        if not r.text.strip():
-            continue
-
-        if r.font is not None:
-            if r.font.size is not None:
-                font_size = r.font.size
-            if r.font.bold is not None:
-                bold = r.font.bold
-            if r.font.italic is not None:
-                italic = r.font.italic
-            if r.font.all_caps is not None:
-                all_caps = r.font.all_caps
-        if r.bold is not None:
-            bold = r.bold
-        if r.italic is not None:
-            italic = r.italic
-
-    if not font_size:
-        font_size = 10.0
-        # TODO find default size (from section ?)
-        # styles = paragraph._parent._parent._parent._parent.styles
-    else:
-        font_size = font_size.pt
-
-    return bold, italic, font_size, all_caps
-
-
-def get_style_details(p):
-    space_before, space_after, first_line_indent = get_paragraph_space(p)
-    bold, italic, font_size, all_caps = get_style_font(p)
-    alignment = get_paragraph_alignment(p)
-    return locals()
-
-
-def get_compare(inp, relate, cut):
-    ops = {'>': operator.gt,
-           '<': operator.lt,
-           '>=': operator.ge,
-           '<=': operator.le,
-           '=': operator.eq}
-    return ops[relate](inp, cut)
-
-
-def check_style(p, compare):
-    detail = get_style_details(p)
-    # remove paragraph from dict returned since it is not json serialisable
-    del detail['p']
-
-    # use list from compare
-    style_ok = True
-    for key, value in compare.items():
-        if key not in detail:
-            continue
-        elif key in ['space_before', 'space_after']:
-            if isinstance(compare[key], list):
-                result = detail[key] is not None and get_compare(detail[key], compare[key][0], compare[key][1])
-                if not result:
-                    detail[key] = f"{detail[key]} should be {' '.join(map(str, compare[key]))}"
-            else:
-                result = any([detail[key] == compare[key], detail[key] is None and compare[key] == 0.0])
-                if not result:
-                    detail[key] = f"{detail[key]} should be {compare[key]}"
-        else:
-            result = detail[key] == compare[key]
-            if not result:
-                detail[key] = f"{detail[key]} should be {compare[key]}"
-        if not result:
-            style_ok = False
-
-    # if key not in compare, then change to NA
-    for key, value in detail.items():
-        if not key == 'all_caps' and key not in compare.keys():
-            detail[key] = 'NA'
-    return style_ok, detail
-
-
-def check_style_detail(p, compare):
-    detail = get_style_details(p)
-    # remove paragraph from dict returned since it is not json serialisable
-    del detail['p']
-
-    # use list from compare
-    style_ok = True
-    for key, value in compare.items():
-        if key not in detail:
-            continue
-        elif key in ['space_before', 'space_after']:
-            if isinstance(compare[key], list):
-                result = detail[key] is not None and get_compare(detail[key], compare[key][0], compare[key][1])
-                if not result:
-                    detail[key] = f"{detail[key]} should be {' '.join(map(str, compare[key]))}"
+def get_paragraph_details(p):
+    # formatting is worked out once per indexed paragraph, the copy returned
+    # can be changed by the caller
+    if p.style_details is None:
+        p.style_details = get_style_details(p.element, p.styles)
+    return dict(p.style_details)
+
+
+COMPARE_OPS = {
+    '>': operator.gt,
+    '<': operator.lt,
+    '>=': operator.ge,
+    '<=': operator.le,
+    '=': operator.eq,
+}
+
+
+class StyleRule:
+    """A formatting spec such as DETAILS['Title'] compiled into the tests to
+    run on a paragraph's formatting, so specs are only read once at import
+    rather than for every paragraph checked.
+
+    Values in the spec must match exactly. For space before and after a
+    [relation, value] list compares instead, eg ['>=', 3.0], and a spacing
+    of 0.0 is also met by no spacing set at all. Other keys in the spec
+    (styles, type, case) are not formatting and are left to the caller."""
+
+    def __init__(self, spec):
+        self.spec = spec
+        # (key, compare, expected value, met when not set, expected text)
+        self.tests = []
+        for key, value in spec.items():
+            if key not in FORMAT_KEYS:
+                continue
+            if key in ['space_before', 'space_after'] and isinstance(value, list):
+                self.tests.append((key, COMPARE_OPS[value[0]], value[1], False, ' '.join(map(str, value))))
             else:
-                result = any([detail[key] == compare[key], detail[key] is None and compare[key] == 0.0])
-                if not result:
-                    detail[key] = f"{detail[key]} should be {compare[key]}"
-        else:
-            result = detail[key] == compare[key]
-            if not result:
-                detail[key] = f"{detail[key]} should be {compare[key]}"
-        if not result:
+                unset_ok = value is None or key in ['space_before', 'space_after'] and value == 0.0
+                self.tests.append((key, operator.eq, value, unset_ok, f"{value}"))
+        # shown as NA as they aren't part of the rule
+        self.na_keys = [key for key in FORMAT_KEYS if key != 'all_caps' and key not in spec]
+
+    def check(self, p):
+        """(style_ok, details) for the paragraph *p*, formatting that doesn't
+        match is replaced by a message saying what it should be"""
+        detail = get_paragraph_details(p)
+        style_ok, changes = self.evaluate(detail)
+        detail.update(changes)
+        return style_ok, detail
+
+    def evaluate(self, detail):
+        """(style_ok, changes) for the formatting *detail*, changes holds the
+        message or NA to show for each key that isn't simply its value"""
+        changes = {}
+        style_ok = True
+        for key, compare, expected, unset_ok, text in self.tests:
+            value = detail[key]
+            if unset_ok if value is None else compare(value, expected):
+                continue
+            changes[key] = f"{value} should be {text}"
             style_ok = False
-        detail['style_ok'] = style_ok
 
-    # if key not in compare, then change to NA
-    for key, value in detail.items():
-        if key not in ['all_caps','style_ok'] and key not in compare.keys():
-            detail[key] = 'NA'
-    return detail
+        for key in self.na_keys:
+            changes[key] = 'NA'
+        return style_ok, changes
+
+
+def compile_rules(details):
+    """StyleRules for a spec, or for a dict of specs nested to any depth"""
+    if any(key in FORMAT_KEYS for key in details):
+        return StyleRule(details)
+    return {name: compile_rules(spec) for name, spec in details.items()}
+
+
+def check_style(p, rule):
+    """checks the formatting of the paragraph *p* against the StyleRule *rule*"""
+    return rule.check(p)
+
+
+def check_styles(checks):
+    """check_style for each (paragraph, rule) in *checks*, in order.
+
+    Most paragraphs of a kind have exactly the same formatting, so each rule
+    is only evaluated once for each distinct formatting and the result is
+    shared by every paragraph with that formatting."""
+    results = {}
+    checked = []
+    for p, rule in checks:
+        detail = get_paragraph_details(p)
+        signature = (id(rule), *detail.values())
+        result = results.get(signature)
+        if result is None:
+            result = results[signature] = rule.evaluate(detail)
+        style_ok, changes = result
+        detail.update(changes)
+        checked.append((style_ok, detail))
+    return checked
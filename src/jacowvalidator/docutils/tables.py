@@ -1,12 +1,12 @@
 import re
 from docx.document import Document as _Document
 from docx.oxml.text.paragraph import CT_P
-from docx.oxml.table import CT_Tbl, CT_TblPr
+from docx.oxml.table import CT_Tbl
 from docx.table import _Cell, _Row, Table
 from docx.text.paragraph import Paragraph
-from lxml.etree import _Element
 
-from jacowvalidator.docutils.styles import check_style
+from jacowvalidator.docutils.index import get_index, is_floating_table, IndexedTable
+from jacowvalidator.docutils.styles import check_style, StyleRule
 from titlecase import titlecase
 
 RE_TABLE_LIST = re.compile(r'^Table \d+:')
@@ -42,6 +42,9 @@ TABLE_MULTI_DETAILS = {
     'italic': None,
 }
 
+TABLE_RULE = StyleRule(TABLE_DETAILS)
+TABLE_MULTI_RULE = StyleRule(TABLE_MULTI_DETAILS)
+
 
 def iter_block_items(parent):
     """
@@ -98,51 +101,25 @@ def check_caption_format(title, format_checks):
 
 
 def check_is_floating(table):
-    # check whether floating table
-    tblppr = False
-    width_type = False
-    for c in table._element.iterchildren():
-        if isinstance(c, CT_TblPr):
-            for c2 in c.iterchildren():
-                if isinstance(c2, _Element) and 'tblpPr' in str(c2):
-                    tblppr = True
-                    for c3 in c2.items():
-                        if 'tblpY' in str(c3):
-                            # width should be higher then the line height of 11
-                            tblppr = int(c3[1]) > 11
-                # also need to check that tblW is auto
-                if isinstance(c2, _Element) and 'tblW' in str(c2):
-                    # type is the second attribute of tblW
-                    width_type = c2.items()[1][1] == 'auto'
-
-    return tblppr and width_type
+    # floating is worked out when the table is indexed
+    if isinstance(table, IndexedTable):
+        return table.floating
+    return is_floating_table(table._element)
 
 
 def get_table_paragraphs(doc):
-    prev = None
     table_details = []
-    for block in iter_block_items(doc):
-        if isinstance(block, Paragraph):
-            prev = block
-        elif isinstance(block, Table):
-            # exclude those with only 1 column, since not likely to be real tables.
-            if len(block.columns) == 1:
-                continue
-            # exclude those with only 1 row, since not likely to be real tables.
-            if len(block.rows) == 1:
-                continue
-
-            # check whether there is data in table
-            text_found = False
-            for row in block.rows:
-                for cell in row.cells:
-                    for paragraph in cell.paragraphs:
-                        if paragraph.text.strip() is not '':
-                            text_found = True
-                            break
-
-            if text_found:
-                table_details.append({'table': block, 'title': prev})
+    for table in get_index(doc).tables:
+        # exclude those with only 1 column, since not likely to be real tables.
+        if table.columns == 1:
+            continue
+        # exclude those with only 1 row, since not likely to be real tables.
+        if table.rows == 1:
+            continue
+
+        # check whether there is data in table
+        if table.has_text:
+            table_details.append({'table': table, 'title': table.title})
     return table_details
 
 
@@ -157,11 +134,12 @@ def check_table_titles(doc):
     All tables start with “Table n:”.
     All tables must be referred to in the main text and use “Table n”.
     """
-    table_details = get_table_paragraphs(doc)
+    index = get_index(doc)
+    table_details = get_table_paragraphs(index)
 
     refs = []
     table_titles = [item['title'].text for item in table_details]
-    for paragraph in doc.paragraphs:
+    for paragraph in index.paragraphs:
         # don't include if it is one of the table titles
         if paragraph.text not in table_titles:
             # make sure we are using normal spaces
@@ -204,10 +182,10 @@ def check_table_titles(doc):
 
         floating = check_is_floating(table['table'])
 
-        table_compare = TABLE_DETAILS
+        table_compare = TABLE_RULE
         # 55 chars is approx where it changes from 1 line to 2 lines
         if len(title.text.strip()) > 55:
-            table_compare = TABLE_MULTI_DETAILS
+            table_compare = TABLE_MULTI_RULE
         style_ok, detail = check_style(title, table_compare)
 
         title_detail = {
@@ -218,9 +196,9 @@ def check_table_titles(doc):
             'used': used_count,
             'used_ok': used_count > 0,
             'order_ok': f'Table {count}' in order_check,
-            'style': title.style.name,
-            'style_ok': style_ok and title.style.name in ['Caption', 'Table Caption', 'Table Caption Multi Line'],
-            'table': f"rows: {len(table['table'].rows)}, columns: {len(table['table'].columns)}, floating: {floating}"
+            'style': title.style,
+            'style_ok': style_ok and title.style in ['Caption', 'Table Caption', 'Table Caption Multi Line'],
+            'table': f"rows: {table['table'].rows}, columns: {table['table'].columns}, floating: {floating}"
         }
         title_detail.update(detail)
         title_details.append(title_detail)
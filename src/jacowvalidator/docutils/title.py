@@ -1,4 +1,5 @@
-from jacowvalidator.docutils.styles import check_style
+from jacowvalidator.docutils.index import get_index
+from jacowvalidator.docutils.styles import check_style, StyleRule
 
 
 TITLE_DETAILS = {
@@ -14,23 +15,25 @@ TITLE_DETAILS = {
     'italic': None,
 }
 
+TITLE_RULE = StyleRule(TITLE_DETAILS)
+
 
 def extract_title(doc):
     # find first not empty paragraph
-    for i, p in enumerate(doc.paragraphs):
+    for i, p in enumerate(get_index(doc).paragraphs):
         if p.text.strip():
             def get_text(r):
-                return r.text.upper() if r.style.font.all_caps or r.font.all_caps else r.text
+                return r.text.upper() if r.all_caps else r.text
 
             title = ''.join([get_text(r) for r in p.runs])
 
-            if p.style.font.all_caps or p.style.base_style and p.style.base_style.font.all_caps:
+            if p.style_all_caps:
                 title = title.upper()
 
-            style_ok, detail = check_style(p, TITLE_DETAILS)
+            style_ok, detail = check_style(p, TITLE_RULE)
             title_detail = {
                 'text': title,
-                'style': p.style.name,
+                'style': p.style,
                 'style_ok': style_ok,
                 'case_ok': check_title_case(title),
             }
@@ -0,0 +1,209 @@
+"""Runs validation in worker processes with limits on time and memory.
+
+   A pathological document can take minutes to check or use enough memory
+   for the kernel to kill the whole gunicorn worker. Each validation instead
+   runs in a worker process, at most *processes* at a time, with a limit on
+   its address space (RLIMIT_AS) and a wall-clock budget. A worker that goes
+   over either is stopped and DocumentTooComplexError is raised in the
+   gunicorn worker, which carries on serving and gets all of its memory back.
+
+   Worker processes are kept between validations, so the style caches, the
+   references catalog and the author cache they fill are there for the next
+   document. They are started from a fork server rather than forked from the
+   gunicorn worker, so they never inherit a lock held by one of its threads."""
+
+import multiprocessing
+import os
+import queue
+import signal
+import threading
+import time
+from contextlib import closing
+
+try:
+    import resource
+except ImportError:  # not available on windows, where no limits are set
+    resource = None
+
+MB = 1024 * 1024
+
+# longest a worker may take to get a function it is sent ready to run, a new
+# worker imports the validator first, in seconds
+START_TIME_LIMIT = 60
+
+# the name of each worker process, the package leaves the web app out of them
+WORKER_NAME = 'ValidationWorker'
+
+# kinds of message a worker process sends back
+STARTED, ITEM, RESULT, END, ERROR = 'started', 'item', 'result', 'end', 'error'
+
+
+class DocumentTooComplexError(Exception):
+    """Raised when checking a document goes over the time or memory allowed
+    for a single validation"""
+    pass
+
+
+class ValidationPool:
+    """Runs functions in worker processes, at most *processes* at once, each
+    run allowed *time_limit* seconds and *memory_limit* bytes of memory on
+    top of what its worker already uses. The functions and their arguments
+    are pickled to be sent to the worker. With no processes functions are run
+    in the calling process without any limits."""
+
+    def __init__(self, processes=2, time_limit=120, memory_limit=1024 * MB):
+        self.processes = processes
+        self.time_limit = time_limit
+        self.memory_limit = memory_limit
+        self.slots = threading.BoundedSemaphore(processes) if processes > 0 else None
+        # workers waiting for their next function
+        self.idle = queue.LifoQueue()
+        try:
+            self.context = multiprocessing.get_context('forkserver')
+        except ValueError:
+            self.context = multiprocessing.get_context('spawn')
+
+    def run(self, func, *args, **kwargs):
+        """the result of func(*args, **kwargs), worked out in a worker
+        process. Exceptions raised by *func* are raised here too."""
+        if self.slots is None:
+            return func(*args, **kwargs)
+        with self.slots, closing(self._run(func, args, kwargs, stream=False)) as results:
+            return next(results)
+
+    def stream(self, func, *args, **kwargs):
+        """yields the items of the generator func(*args, **kwargs) as soon as
+        the worker process working them out has each one"""
+        if self.slots is None:
+            yield from func(*args, **kwargs)
+            return
+        with self.slots:
+            yield from self._run(func, args, kwargs, stream=True)
+
+    def _get_worker(self):
+        while True:
+            try:
+                process, connection = self.idle.get_nowait()
+            except queue.Empty:
+                break
+            if process.is_alive():
+                return process, connection
+            _stop(process, connection)
+        receiver, sender = self.context.Pipe()
+        process = self.context.Process(
+            target=_serve, args=(sender, self.time_limit, self.memory_limit), name=WORKER_NAME, daemon=True)
+        process.start()
+        sender.close()
+        return process, receiver
+
+    def _run(self, func, args, kwargs, stream):
+        process, connection = self._get_worker()
+        # the worker is only used again once it has finished cleanly
+        finished = False
+        try:
+            connection.send((func, args, kwargs, stream))
+            deadline = time.monotonic() + START_TIME_LIMIT
+            while True:
+                if not connection.poll(max(0, deadline - time.monotonic())):
+                    raise DocumentTooComplexError(
+                        f"The document is too large or complex to check, "
+                        f"it took longer than {self.time_limit} seconds.")
+                kind, value = connection.recv()
+                if kind == STARTED:
+                    deadline = time.monotonic() + self.time_limit
+                    continue
+                if kind == ERROR:
+                    # a worker that ran out of memory stops rather than carry on
+                    finished = not isinstance(value, DocumentTooComplexError)
+                    raise value
+                if kind == END:
+                    finished = True
+                    return
+                if kind == RESULT:
+                    finished = True
+                yield value
+                if kind == RESULT:
+                    return
+        except (EOFError, BrokenPipeError):
+            # the worker was killed, by going over its limits or otherwise
+            process.join(1)
+            if process.exitcode == -getattr(signal, 'SIGXCPU', 0):
+                raise DocumentTooComplexError(
+                    f"The document is too large or complex to check, "
+                    f"it took more than {self.time_limit} seconds of processing time.")
+            raise DocumentTooComplexError(
+                "The document is too large or complex to check, it needed more memory than allowed.")
+        finally:
+            if finished:
+                self.idle.put((process, connection))
+            else:
+                _stop(process, connection)
+
+
+def _stop(process, connection):
+    if process.is_alive():
+        process.kill()
+    process.join()
+    connection.close()
+
+
+def _serve(connection, time_limit, memory_limit):
+    # runs each function sent until the gunicorn worker goes away
+    while True:
+        try:
+            func, args, kwargs, stream = connection.recv()
+        except EOFError:
+            return
+        _set_limits(time_limit, memory_limit)
+        connection.send((STARTED, None))
+        try:
+            if stream:
+                for item in func(*args, **kwargs):
+                    _send(connection, (ITEM, item))
+                message = END, None
+            else:
+                message = RESULT, func(*args, **kwargs)
+        except MemoryError:
+            _send(connection, (ERROR, DocumentTooComplexError(
+                f"The document is too large or complex to check, "
+                f"it needed more than {memory_limit // MB} MB of memory.")))
+            return
+        except Exception as err:
+            message = ERROR, err
+        _send(connection, message)
+
+
+def _send(sender, message):
+    try:
+        sender.send(message)
+    except Exception as err:
+        # the value or exception couldn't be pickled
+        sender.send((ERROR, RuntimeError(f"Failed to return the validation result: {err!r}")))
+
+
+def _set_limits(time_limit, memory_limit):
+    # set again for each function, from what the worker has used so far
+    if resource is None:
+        return
+    # the wall-clock budget is kept by the gunicorn worker, cpu time is a
+    # backstop in case it is itself held up
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    cpu = int(usage.ru_utime + usage.ru_stime + time_limit) + 1
+    hard = resource.getrlimit(resource.RLIMIT_CPU)[1]
+    if hard != resource.RLIM_INFINITY:
+        cpu = min(cpu, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (cpu, hard))
+    limit = _address_space() + memory_limit
+    hard = resource.getrlimit(resource.RLIMIT_AS)[1]
+    if hard != resource.RLIM_INFINITY:
+        limit = min(limit, hard)
+    resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+
+
+def _address_space():
+    """bytes of address space used by this process, 0 if it can't be read"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[0]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return 0
@@ -0,0 +1,269 @@
+"""Background validation jobs.
+
+   Validating a paper can take longer than a request should, so uploads are
+   put on a queue and given a job id straight away. Worker threads take jobs
+   off the queue and store the finished report (or the error to show) against
+   the job, which the results page polls for. Each section of the report is
+   recorded as soon as it is worked out, so the page can show it straight
+   away.
+
+   The queue is pluggable, QUEUE_BACKENDS maps a backend name to its class.
+   The sqlite backend keeps jobs in a single database file that every
+   gunicorn worker process shares, so it needs no outside services."""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import namedtuple
+
+from jacowvalidator import serialize
+
+logger = logging.getLogger(__name__)
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+Job = namedtuple('Job', ['id', 'status', 'filename', 'paper_name', 'checks', 'upload', 'result', 'error'])
+
+
+class JobNotFoundError(Exception):
+    """Raised when there is no job with the id asked for, it may have expired"""
+    pass
+
+
+class UnknownQueueBackendError(Exception):
+    """Raised when the JOB_QUEUE setting names a backend that doesn't exist"""
+    pass
+
+
+class JobQueue(ABC):
+    """What a queue backend provides. A job is submitted with the uploaded
+    bytes, claimed by one worker, then finished with a result or failed with
+    an error message. A backend that leaves out any of these can't be
+    created."""
+
+    @abstractmethod
+    def submit(self, filename, paper_name, checks, upload, job_id=None):
+        """queues a job and returns its id, a new one unless *job_id* is given"""
+
+    @abstractmethod
+    def claim(self):
+        """the oldest queued job, now marked as running, or None"""
+
+    @abstractmethod
+    def finish(self, job_id, result):
+        """marks the job done, with its *result*"""
+
+    @abstractmethod
+    def fail(self, job_id, error):
+        """marks the job failed, with the *error* message to show"""
+
+    @abstractmethod
+    def get(self, job_id, upload=False):
+        """the Job with *job_id*, with the uploaded bytes if *upload* is set.
+        Raises JobNotFoundError if there isn't one"""
+
+    @abstractmethod
+    def add_section(self, job_id, name, section):
+        """records a section of the report as soon as the job has it"""
+
+    @abstractmethod
+    def get_sections(self, job_id, after=0):
+        """(number, name, section) for each section the job has recorded, in
+        order, leaving out those numbered *after* or before"""
+
+
+class SQLiteJobQueue(JobQueue):
+    """Jobs in the sqlite database at *path*. Jobs left running for longer
+    than *timeout* seconds, by a worker that was killed, are failed so their
+    page doesn't wait forever, and jobs are removed *expire* seconds after
+    they were submitted."""
+
+    def __init__(self, path, timeout=600, expire=24 * 60 * 60):
+        self.path = path
+        self.timeout = timeout
+        self.expire = expire
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, mode=0o700, exist_ok=True)
+        with self._connect() as db:
+            db.execute(
+                'CREATE TABLE IF NOT EXISTS jobs ('
+                'id TEXT PRIMARY KEY, status TEXT NOT NULL, filename TEXT, paper_name TEXT, checks TEXT, '
+                'upload BLOB, result BLOB, error TEXT, submitted REAL NOT NULL, started REAL)')
+            db.execute('CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, submitted)')
+            db.execute(
+                'CREATE TABLE IF NOT EXISTS job_sections ('
+                'job_id TEXT NOT NULL, number INTEGER NOT NULL, name TEXT NOT NULL, section BLOB NOT NULL, '
+                'PRIMARY KEY (job_id, number))')
+
+    def _connect(self):
+        # a connection for each call, so any thread or process can use the queue
+        db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        db.execute('PRAGMA journal_mode=WAL')
+        return _Connection(db)
+
+    def submit(self, filename, paper_name, checks, upload, job_id=None):
+        job_id = job_id or new_job_id()
+        now = time.time()
+        with self._connect() as db:
+            db.execute('DELETE FROM jobs WHERE submitted < ?', (now - self.expire,))
+            db.execute('DELETE FROM job_sections WHERE job_id NOT IN (SELECT id FROM jobs)')
+            db.execute(
+                'INSERT INTO jobs (id, status, filename, paper_name, checks, upload, submitted) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (job_id, QUEUED, filename, paper_name, _join_checks(checks), upload, now))
+        return job_id
+
+    def claim(self):
+        now = time.time()
+        with self._connect() as db:
+            # taken under a write lock so two workers never claim the same job
+            db.execute('BEGIN IMMEDIATE')
+            db.execute(
+                'UPDATE jobs SET status = ?, error = ?, upload = NULL WHERE status = ? AND started < ?',
+                (FAILED, 'Validation was interrupted, please upload the document again.',
+                 RUNNING, now - self.timeout))
+            row = db.execute(
+                'SELECT id FROM jobs WHERE status = ? ORDER BY submitted LIMIT 1', (QUEUED,)).fetchone()
+            if row is None:
+                db.execute('COMMIT')
+                return None
+            db.execute('UPDATE jobs SET status = ?, started = ? WHERE id = ?', (RUNNING, now, row[0]))
+            db.execute('COMMIT')
+        return self.get(row[0], upload=True)
+
+    def finish(self, job_id, result):
+        with self._connect() as db:
+            db.execute(
+                'UPDATE jobs SET status = ?, result = ?, upload = NULL WHERE id = ?',
+                (DONE, serialize.dumps(result), job_id))
+
+    def fail(self, job_id, error):
+        with self._connect() as db:
+            db.execute(
+                'UPDATE jobs SET status = ?, error = ?, upload = NULL WHERE id = ?',
+                (FAILED, str(error), job_id))
+
+    def get(self, job_id, upload=False):
+        # the uploaded bytes are only needed by the worker running the job
+        columns = 'id, status, filename, paper_name, checks, {}, result, error'.format(
+            'upload' if upload else 'NULL')
+        with self._connect() as db:
+            row = db.execute(f'SELECT {columns} FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        if row is None:
+            raise JobNotFoundError(f"No validation job {job_id}, it may have expired")
+        job_id, status, filename, paper_name, checks, upload, result, error = row
+        return Job(
+            job_id, status, filename, paper_name, _split_checks(checks), upload,
+            serialize.loads(result) if result is not None else None, error)
+
+    def add_section(self, job_id, name, section):
+        with self._connect() as db:
+            db.execute(
+                'INSERT INTO job_sections (job_id, number, name, section) '
+                'SELECT ?, COALESCE(MAX(number), 0) + 1, ?, ? FROM job_sections WHERE job_id = ?',
+                (job_id, name, serialize.dumps(section), job_id))
+
+    def get_sections(self, job_id, after=0):
+        with self._connect() as db:
+            rows = db.execute(
+                'SELECT number, name, section FROM job_sections WHERE job_id = ? AND number > ? ORDER BY number',
+                (job_id, after)).fetchall()
+        return [(number, name, serialize.loads(section)) for number, name, section in rows]
+
+
+class _Connection:
+    """closes the sqlite connection at the end of a with block"""
+
+    def __init__(self, db):
+        self.db = db
+
+    def __enter__(self):
+        return self.db
+
+    def __exit__(self, *exc):
+        self.db.close()
+
+
+def new_job_id():
+    return uuid.uuid4().hex
+
+
+QUEUE_BACKENDS = {
+    'sqlite': SQLiteJobQueue,
+}
+
+
+def create_job_queue(backend, *args, **kwargs):
+    """the JobQueue for the *backend* name, given the backend's own options"""
+    try:
+        queue_class = QUEUE_BACKENDS[backend]
+    except KeyError:
+        raise UnknownQueueBackendError(
+            f"Unknown job queue '{backend}', expected one of: {', '.join(QUEUE_BACKENDS)}")
+    return queue_class(*args, **kwargs)
+
+
+def run_job(queue, job, handler):
+    """runs *handler* for the claimed *job* and records its result. The handler
+    returns the result or raises an exception whose text is shown to the user."""
+    try:
+        result = handler(job)
+    except Exception as err:
+        queue.fail(job.id, err)
+    else:
+        queue.finish(job.id, result)
+
+
+def run_next_job(queue, handler):
+    """runs the oldest queued job, False if there was nothing to do"""
+    job = queue.claim()
+    if job is None:
+        return False
+    run_job(queue, job, handler)
+    return True
+
+
+def start_workers(queue, handler, count, interval=0.2):
+    """starts *count* daemon threads that run queued jobs with *handler*,
+    checking the queue every *interval* seconds when it is empty"""
+    def work():
+        while True:
+            try:
+                busy = run_next_job(queue, handler)
+            except Exception:
+                # eg the database was locked for too long, try again later
+                logger.exception("Failed to run a validation job")
+                busy = False
+            if not busy:
+                time.sleep(interval)
+
+    workers = [threading.Thread(target=work, name=f'job-worker-{i}', daemon=True) for i in range(count)]
+    for worker in workers:
+        worker.start()
+    return workers
+
+
+def wait_for_job(queue, job_id, timeout, interval=0.25):
+    """the job once it is done or failed, or as it is after *timeout* seconds"""
+    deadline = time.monotonic() + timeout
+    job = queue.get(job_id)
+    while job.status in (QUEUED, RUNNING) and time.monotonic() < deadline:
+        time.sleep(interval)
+        job = queue.get(job_id)
+    return job
+
+
+def _join_checks(checks):
+    return ','.join(checks) if checks is not None else None
+
+
+def _split_checks(text):
+    return text.split(',') if text is not None else None
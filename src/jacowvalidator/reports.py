@@ -0,0 +1,282 @@
+"""Validation reports for uploaded documents.
+
+   Authors re-upload the same document many times, so reports are cached by
+   the sha256 of the uploaded bytes together with everything else that can
+   change the report: the paper name it was uploaded as, the version of the
+   validator and the version of the SPMS references csv. Recent reports are
+   kept in memory and all reports are written to a directory that every
+   worker process shares.
+
+   The latest report for each paper is also kept along with fingerprints of
+   the package parts it was built from, so a revised upload of the same paper
+   only works out again the sections whose parts changed."""
+
+import datetime
+import hashlib
+import json
+import os
+import tempfile
+
+from jacowvalidator import serialize
+from jacowvalidator.cache import LRUCache
+from jacowvalidator.docutils.doc import create_upload_variables, get_checks, get_reusable_sections
+from jacowvalidator.docutils.page import check_tracking_on
+from jacowvalidator.docutils.reader import DocxReader, read_index
+from jacowvalidator.spms import get_reference_csv_version
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+METADATA_FIELDS = ['author', 'revision', 'created', 'modified', 'version', 'language']
+
+CHUNK_SIZE = 64 * 1024
+
+# section fields carried into an encoded report
+SECTION_FIELDS = ['title', 'ok', 'message', 'anchor', 'details']
+
+# fields left out of an encoded report unless it is asked to be verbose
+VERBOSE_FIELDS = {'text', 'original_text', 'rules', 'extra'}
+
+JSON_MIMETYPE = 'application/json'
+MSGPACK_MIMETYPE = 'application/x-msgpack'
+
+
+def build_report(source, paper_name, previous=None, checks=None):
+    """Validates the .docx file *source* (a path or a file like object) and
+    returns the variables upload.html needs to show the report. Only the
+    *checks* named are run, all of them by default. Sections of a *previous*
+    report for the same paper are reused where the parts they depend on are
+    unchanged."""
+    for name, value in iter_report(source, paper_name, previous, checks):
+        if name is None:
+            return value
+
+
+def iter_report(source, paper_name, previous=None, checks=None):
+    """build_report a section at a time. Yields (name, section) for each
+    section as soon as it is worked out and finally (None, report) with the
+    whole report. Sections that don't need the body of the document, or that
+    are reused, come first as they are ready before the body is read."""
+    with DocxReader(source) as reader:
+        parts = reader.fingerprints()
+        parts['spms'] = get_reference_csv_version(paper_name) or ''
+
+        reuse = {}
+        previous_csv_details = None
+        if previous and 'parts' in previous:
+            reuse = get_reusable_sections(previous['summary'], parts, previous['parts'])
+            previous_csv_details = previous['reference_csv_details']
+
+        def needs_body(name):
+            return any('body' in check.parts for check in get_checks([name]) if check.name not in reuse)
+
+        index = read_index(reader, body=False)
+        summary = create_upload_variables(index, paper_name, reuse, previous_csv_details, checks)
+        ready = {}
+        for name in summary:
+            if not needs_body(name):
+                ready[name] = summary[name]
+                yield name, ready[name]
+
+        # the body is only read when a section that needs it is out of date
+        body = len(ready) < len(summary)
+        if body:
+            index = read_index(reader, body=True)
+
+    metadata = {field: getattr(index.core_properties, field) for field in METADATA_FIELDS}
+
+    if body:
+        # check whether tracking on, whenever the body has been read
+        check_tracking_on(index)
+        summary.read_further(index)
+        for name in summary:
+            if name not in ready:
+                yield name, summary[name]
+
+    yield None, dict(
+        summary=dict(summary),
+        reference_csv_details=summary.reference_csv_details,
+        title=summary.title,
+        metadata=metadata,
+        parts=parts,
+    )
+
+
+def encode_report(report, paper_name, verbose=False):
+    """the report as plain dicts, lists and strings ready to be sent as json
+    or msgpack. Only the section fields other scripts need are kept, along
+    with the SPMS comparison, the full text of paragraphs and the rules
+    checked are only included when *verbose*."""
+    sections = {}
+    for name, section in report['summary'].items():
+        fields = SECTION_FIELDS + ['rules', 'extra'] if verbose else SECTION_FIELDS
+        sections[name] = {field: _plain(section[field], verbose) for field in fields if field in section}
+
+    return {
+        'paper_name': paper_name,
+        'ok': all(section['ok'] for section in sections.values()),
+        'metadata': _plain(report['metadata'], verbose),
+        'sections': sections,
+        'spms': _plain(report['reference_csv_details'], verbose),
+    }
+
+
+def dump_report(encoded, mimetype=JSON_MIMETYPE):
+    """the bytes of an encoded report as json, or msgpack when that is asked
+    for and installed"""
+    if mimetype == MSGPACK_MIMETYPE and msgpack is not None:
+        return msgpack.packb(encoded, use_bin_type=True)
+    return json.dumps(encoded).encode()
+
+
+def _plain(value, verbose):
+    if isinstance(value, dict):
+        return {str(key): _plain(item, verbose) for key, item in value.items()
+                if verbose or key not in VERBOSE_FIELDS}
+    if isinstance(value, (list, tuple)):
+        return [_plain(item, verbose) for item in value]
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return str(value)
+
+
+def hash_upload(stream):
+    """sha256 of everything left in the file like object *stream*, which is
+    put back where it was"""
+    start = stream.tell()
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: stream.read(CHUNK_SIZE), b''):
+        digest.update(chunk)
+    stream.seek(start)
+    return digest.hexdigest()
+
+
+def get_source_version():
+    """identifies the validator code by the latest change to the package
+    source, for when there is no git commit to go by"""
+    package = os.path.dirname(os.path.abspath(__file__))
+    latest = 0
+    for root, _, files in os.walk(package):
+        for name in files:
+            if name.endswith(('.py', '.html')):
+                latest = max(latest, os.stat(os.path.join(root, name)).st_mtime_ns)
+    return str(latest)
+
+
+class ReportCache:
+    """Reports by upload key, the most recent *maxsize* in memory and up to
+    *disk_maxsize* written as json in *directory*. Without a directory only the memory
+    tier is used. *version* identifies the validator code, reports from any
+    other version are never returned."""
+
+    def __init__(self, directory=None, maxsize=64, disk_maxsize=1000, version=None):
+        self.directory = directory
+        self.version = version if version is not None else get_source_version()
+        self.disk_maxsize = disk_maxsize
+        self.memory = LRUCache(maxsize)
+        self.disk_hits = 0
+        self.disk_misses = 0
+        if directory:
+            # only this user can add reports
+            os.makedirs(directory, mode=0o700, exist_ok=True)
+
+    def key(self, digest, paper_name, checks=None):
+        """cache key for an upload with sha256 *digest* uploaded as *paper_name*
+        and validated with *checks*"""
+        parts = [digest, paper_name, self.version, get_reference_csv_version(paper_name) or '',
+                 ','.join(checks) if checks is not None else '']
+        return hashlib.sha256('\0'.join(parts).encode()).hexdigest()
+
+    def paper_key(self, paper_name):
+        """cache key for the latest report for *paper_name*, whatever was uploaded"""
+        return hashlib.sha256('\0'.join(['paper', paper_name, self.version]).encode()).hexdigest()
+
+    def get(self, key):
+        report = self.memory.get(key)
+        if report is not None or not self.directory:
+            return report
+
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                report = serialize.loads(f.read())
+        except FileNotFoundError:
+            self.disk_misses += 1
+            return None
+        except (OSError, ValueError):
+            # a report from an older or broken write, it will be rebuilt
+            self.disk_misses += 1
+            self._remove(path)
+            return None
+
+        self.disk_hits += 1
+        self.memory.put(key, report)
+        return report
+
+    def put(self, key, report):
+        self.memory.put(key, report)
+        if not self.directory or self.disk_maxsize <= 0:
+            return
+
+        # written to a temporary file and renamed so other workers never
+        # read a partly written report
+        data = serialize.dumps(report)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, self._path(key))
+        except OSError:
+            self._remove(tmp_path)
+            return
+        self._prune()
+
+    def discard(self, key):
+        self.memory.pop(key)
+        if self.directory:
+            self._remove(self._path(key))
+
+    def info(self):
+        info = self.memory.info()
+        info['disk_hits'] = self.disk_hits
+        info['disk_misses'] = self.disk_misses
+        if self.directory:
+            info['disk_size'] = len(self._disk_entries())
+            info['disk_maxsize'] = self.disk_maxsize
+        return info
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.json')
+
+    def _disk_entries(self):
+        try:
+            return [e for e in os.scandir(self.directory) if e.name.endswith('.json')]
+        except FileNotFoundError:
+            return []
+
+    def _prune(self):
+        # drop the oldest reports once the directory is over its size
+        entries = self._disk_entries()
+        if len(entries) <= self.disk_maxsize:
+            return
+        entries.sort(key=_mtime)
+        for entry in entries[:len(entries) - self.disk_maxsize]:
+            self._remove(entry.path)
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def _mtime(entry):
+    try:
+        return entry.stat().st_mtime
+    except OSError:
+        return 0
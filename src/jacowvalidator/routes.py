@@ -1,18 +1,34 @@
+import io
 import os
 import json
+import time
+import zipfile
 from datetime import datetime
 from subprocess import run
 from docx import Document
 from docx.opc.exceptions import PackageNotFoundError
-from flask import redirect, render_template, request, url_for, send_file, abort
-from flask_uploads import UploadNotAllowed
+from flask import (
+    Response, abort, get_template_attribute, jsonify, redirect, render_template, request, send_file,
+    stream_with_context, url_for)
+from lxml.etree import XMLSyntaxError
+from werkzeug.utils import secure_filename
 
 from jacowvalidator import app, documents
 from .models import Log
-from jacowvalidator.docutils.page import (check_tracking_on, TrackingOnError)
-from jacowvalidator.docutils.doc import create_upload_variables, AbstractNotFoundError
+from jacowvalidator.docutils.page import TrackingOnError
+from jacowvalidator.docutils.doc import AbstractNotFoundError, UnknownCheckError, parse_checks
+from jacowvalidator.reports import (
+    JSON_MIMETYPE, MSGPACK_MIMETYPE, ReportCache, build_report, dump_report, encode_report, hash_upload, iter_report,
+    msgpack)
+from jacowvalidator.batch import (
+    NoPapersError, TooManyEntriesError, check_archive, get_entries, hash_entry, iter_batch, summarise, validate_entry)
+from jacowvalidator.executor import MB, DocumentTooComplexError, ValidationPool
+from jacowvalidator.worker import get_validation_cache_info
+from jacowvalidator.jobs import (
+    DONE, FAILED, JobNotFoundError, create_job_queue, new_job_id, start_workers, wait_for_job)
 from .test_utils import replace_identifying_text
-from .spms import PaperNotFoundError
+from .spms import (
+    PaperNotFoundError, UnknownConferenceError, get_conference_path, get_conferences, qualify_paper_name)
 
 
 try:
@@ -22,12 +38,199 @@ try:
 except Exception:
     commit_sha, commit_date = None, None
 
+report_cache = ReportCache(
+    app.config['REPORT_CACHE_DIR'],
+    maxsize=app.config['REPORT_CACHE_SIZE'],
+    disk_maxsize=app.config['REPORT_CACHE_DISK_SIZE'],
+    version=commit_sha)
+
+
+# errors from validating a document that are explained to the user
+UPLOAD_ERRORS = (
+    PackageNotFoundError, ValueError, XMLSyntaxError, TrackingOnError, OSError,
+    PaperNotFoundError, AbstractNotFoundError, DocumentTooComplexError)
+
+# longest a status request waits for its job to finish, in seconds
+MAX_JOB_WAIT = 20
+
+
+class ValidationError(Exception):
+    """Raised by a background validation job, with the message to show the
+    user in place of the report"""
+    pass
+
+
+def validate_upload(source, paper_name, checks, report_key):
+    """builds the report for the uploaded file like object *source* and caches it"""
+    # a revised upload only works out again what it changed
+    paper_key = report_cache.paper_key(paper_name)
+    # the upload is sent to a validation worker, so it is read into memory
+    report = validation_pool.run(
+        build_report, io.BytesIO(source.read()), paper_name, previous=report_cache.get(paper_key), checks=checks)
+    report_cache.put(report_key, report)
+    report_cache.put(paper_key, report)
+    return report
+
+
+def get_report(source, paper_name, checks):
+    """the cached report for the uploaded file like object *source*, or a
+    newly built one"""
+    report_key = report_cache.key(hash_upload(source), paper_name, checks)
+    report = report_cache.get(report_key)
+    if report is None:
+        report = validate_upload(source, paper_name, checks, report_key)
+    return report
+
+
+def get_paper_name(paper_name):
+    """*paper_name* qualified with the conference chosen in the request, if
+    one was, so that it is checked against that conference's references"""
+    conference = request.values.get('conference')
+    if not conference:
+        return paper_name
+    get_conference_path(conference)
+    return qualify_paper_name(conference, paper_name)
+
+
+def upload_error(err, filename):
+    """the message shown instead of the report when validating *filename*
+    raised *err*"""
+    if isinstance(err, (PackageNotFoundError, ValueError, XMLSyntaxError)):
+        return f"Failed to open document {filename}. Is it a valid Word document?"
+    if isinstance(err, (TrackingOnError, AbstractNotFoundError, DocumentTooComplexError)):
+        return str(err)
+    if isinstance(err, OSError):
+        return f"It seems the file {filename} is corrupted"
+    if isinstance(err, PaperNotFoundError):
+        message = (f"It seems the file {filename} has no corresponding entry in the SPMS references list. "
+                   f"Is your filename the same as your Paper name?")
+        if err.suggestions:
+            message += f" Did you mean {' or '.join(err.suggestions)}?"
+        return message
+    app.logger.error("Failed to process document", exc_info=err)
+    return f"Failed to process document: {filename}"
+
+
+def validate_job(job):
+    """validates the upload of a queued job, recording each section of the
+    report as it is worked out, the whole report is its result"""
+    if is_batch(job):
+        return validate_batch(job)
+    source = io.BytesIO(job.upload)
+    report_key = report_cache.key(hash_upload(source), job.paper_name, job.checks)
+    paper_key = report_cache.paper_key(job.paper_name)
+    try:
+        for name, value in validation_pool.stream(
+                iter_report, source, job.paper_name, previous=report_cache.get(paper_key), checks=job.checks):
+            if name is not None:
+                job_queue.add_section(job.id, name, value)
+    except Exception as err:
+        raise ValidationError(upload_error(err, job.filename))
+
+    report_cache.put(report_key, value)
+    report_cache.put(paper_key, value)
+    return value
+
+
+def is_batch(job):
+    """whether the job is for a zip archive of papers"""
+    return job.filename.lower().endswith('.zip')
+
+
+def batch_path(job_id):
+    return os.path.join(app.config['BATCH_DIR'], job_id + '.zip')
+
+
+def validate_batch(job):
+    """validates each paper in the zip archive of a queued job, recording a
+    row for each paper as it is done, the number of papers is its result"""
+    archive_path = batch_path(job.id)
+    try:
+        entries = get_entries(archive_path, app.config['BATCH_MAX_PAPERS'])
+
+        max_size = app.config['BATCH_MAX_PAPER_SIZE'] * MB
+
+        def check(name, paper_name):
+            report_key = report_cache.key(hash_entry(archive_path, name, max_size), paper_name, job.checks)
+            report = report_cache.get(report_key)
+            if report is None:
+                report = validation_pool.run(
+                    validate_entry, archive_path, name, paper_name, checks=job.checks, max_size=max_size)
+                report_cache.put(report_key, report)
+            return report_key, summarise(encode_report(report, paper_name))
+
+        failed = 0
+        for name, paper_name, result, error in iter_batch(entries, check, app.config['BATCH_WORKERS']):
+            row = {'filename': name, 'paper_name': paper_name, 'report_key': None, 'error': None}
+            if error is not None:
+                row['error'] = upload_error(error, os.path.basename(name))
+                failed += 1
+            else:
+                row['report_key'], summary = result
+                row.update(summary)
+            job_queue.add_section(job.id, paper_name, row)
+    except NoPapersError as err:
+        raise ValidationError(err)
+    except (zipfile.BadZipFile, OSError):
+        raise ValidationError(f"Failed to open {job.filename}. Is it a valid zip archive?")
+    finally:
+        remove_file(archive_path)
+    return {'papers': len(entries), 'failed': failed}
+
+
+def remove_old_batches(age=24 * 60 * 60):
+    """removes archives left behind by batch jobs that never ran"""
+    cutoff = time.time() - age
+    for entry in os.scandir(app.config['BATCH_DIR']):
+        if entry.name.endswith('.zip') and entry.stat().st_mtime < cutoff:
+            remove_file(entry.path)
+
+
+def remove_file(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def render_section(name, section):
+    """the html for one section of the report, as on the report page"""
+    return render_template("_report_sections.html", summary={name: section})
+
+
+validation_pool = ValidationPool(
+    app.config['VALIDATION_PROCESSES'],
+    time_limit=app.config['VALIDATION_TIME_LIMIT'],
+    memory_limit=app.config['VALIDATION_MEMORY_LIMIT'] * MB)
+
+job_queue = None
+if app.config['JOB_WORKERS'] > 0:
+    job_queue = create_job_queue(
+        app.config['JOB_QUEUE'], app.config['JOB_QUEUE_PATH'], timeout=app.config['JOB_TIMEOUT'])
+
+
+@app.before_first_request
+def start_job_workers():
+    # started in each worker process once it is serving, not in a parent it may be forked from
+    if job_queue is not None:
+        start_workers(job_queue, validate_job, app.config['JOB_WORKERS'])
+
 
 @app.context_processor
 def inject_commit_details():
     return dict(commit_sha=commit_sha, commit_date=commit_date)
 
 
+@app.context_processor
+def inject_conferences():
+    return dict(conferences=list(get_conferences()))
+
+
+@app.context_processor
+def inject_batch():
+    return dict(batch_enabled=job_queue is not None)
+
+
 @app.context_processor
 def inject_debug():
     debug = app.env == 'development' or app.debug
@@ -79,75 +282,252 @@ def hello():
 def upload():
     admin = 'DEV_DEBUG' in os.environ and os.environ['DEV_DEBUG'] == 'True'
     if request.method == "POST" and documents.name in request.files:
-        try:
-            filename = documents.save(request.files[documents.name])
-            paper_name = os.path.splitext(filename)[0]
-        except UploadNotAllowed:
+        # the upload is checked from the request, it is never saved in the
+        # upload folder so the paper name is always the uploaded filename
+        storage = request.files[documents.name]
+        filename = documents.get_basename(storage.filename)
+        if not documents.file_allowed(storage, filename):
             return render_template("upload.html", error=f"Wrong file extension. Please upload .docx files only")
-        fullpath = documents.path(filename)
+        paper_name = os.path.splitext(filename)[0]
 
         try:
-            doc = Document(fullpath)
-            metadata = doc.core_properties
-
-            # check whether tracking on
-            result = check_tracking_on(doc)
-
-            # get variables to pass to template
-            summary, reference_csv_details, title = create_upload_variables(doc, paper_name)
-
-            # log = Log()
-            # log.filename = filename
-            # log.report = json.dumps(json_serialise(locals()))
-            # db.session.add(log)
-            # db.session.commit()
-
-            return render_template("upload.html", processed=True, **locals())
-        except (PackageNotFoundError, ValueError):
-            return render_template(
-                "upload.html",
-                filename=filename,
-                error=f"Failed to open document {filename}. Is it a valid Word document?",
-                admin=admin)
-        except TrackingOnError as err:
+            # eg checks=margins,spms for only some of the report
+            checks = parse_checks(request.values.get('checks'))
+            paper_name = get_paper_name(paper_name)
+        except (UnknownCheckError, UnknownConferenceError) as err:
             return render_template(
                 "upload.html",
                 filename=filename,
                 error=err,
                 admin=admin)
-        except OSError:
-            return render_template(
-                "upload.html",
-                filename=filename,
-                error=f"It seems the file {filename} is corrupted",
-                admin=admin)
-        except PaperNotFoundError:
-            return render_template(
-                "upload.html",
-                processed=True,
-                **locals(),
-                error=f"It seems the file {filename} has no corresponding entry in the SPMS references list. "
-                      f"Is your filename the same as your Paper name?")
-        except AbstractNotFoundError as err:
-            return render_template(
-                "upload.html",
-                filename=filename,
-                error=err)
-        except Exception:
-            if app.debug:
-                raise
-            else:
-                app.logger.exception("Failed to process document")
+
+        # an unchanged re-upload gets the report built the last time
+        report_key = report_cache.key(hash_upload(storage.stream), paper_name, checks)
+        report = report_cache.get(report_key)
+
+        if report is None and job_queue is not None:
+            job_id = job_queue.submit(filename, paper_name, checks, storage.read())
+            return redirect(url_for('job_report', job_id=job_id))
+
+        if report is None:
+            # no background workers, so validate while the user waits
+            try:
+                report = validate_upload(storage.stream, paper_name, checks, report_key)
+            except Exception as err:
+                if app.debug and not isinstance(err, UPLOAD_ERRORS):
+                    raise
                 return render_template(
                     "upload.html",
-                    error=f"Failed to process document: {filename}",
+                    filename=filename,
+                    error=upload_error(err, filename),
                     admin=admin)
-        finally:
-            os.remove(fullpath)
+
+        # log = Log()
+        # log.filename = filename
+        # log.report = json.dumps(json_serialise(report))
+        # db.session.add(log)
+        # db.session.commit()
+
+        return render_template("upload.html", processed=True, filename=filename, admin=admin, **report)
 
     return render_template("upload.html", admin=admin)
 
 
+@app.route("/jobs/<job_id>", methods=["GET"])
+def job_report(job_id):
+    admin = 'DEV_DEBUG' in os.environ and os.environ['DEV_DEBUG'] == 'True'
+    if job_queue is None:
+        abort(404)
+    try:
+        job = job_queue.get(job_id)
+    except JobNotFoundError:
+        abort(404)
+
+    if is_batch(job):
+        papers = [dict(row, number=number) for number, _, row in job_queue.get_sections(job_id)]
+        return render_template("batch.html", job=job, papers=papers, admin=admin)
+    if job.status == DONE:
+        return render_template("upload.html", processed=True, filename=job.filename, admin=admin, **job.result)
+    if job.status == FAILED:
+        return render_template("upload.html", filename=job.filename, error=job.error, admin=admin)
+    return render_template("upload.html", pending=True, job_id=job.id, filename=job.filename, admin=admin)
+
+
+@app.route("/jobs/<job_id>/papers", methods=["GET"])
+def batch_papers(job_id):
+    """the rows of the batch table for a zip archive job as json"""
+    if job_queue is None:
+        abort(404)
+    try:
+        job = job_queue.get(job_id)
+    except JobNotFoundError:
+        abort(404)
+    papers = [dict(row, number=number) for number, _, row in job_queue.get_sections(job_id)]
+    return jsonify(id=job.id, status=job.status, error=job.error, papers=papers)
+
+
+@app.route("/jobs/<job_id>/papers/<int:number>", methods=["GET"])
+def batch_paper(job_id, number):
+    """the report for one paper of a zip archive job, as on the upload page or
+    with ?format=json as from the api"""
+    admin = 'DEV_DEBUG' in os.environ and os.environ['DEV_DEBUG'] == 'True'
+    if job_queue is None:
+        abort(404)
+    sections = job_queue.get_sections(job_id, after=number - 1)
+    if not sections or sections[0][0] != number:
+        abort(404)
+    row = sections[0][2]
+    if row['error']:
+        return render_template("upload.html", filename=row['filename'], error=row['error'], admin=admin)
+    report = report_cache.get(row['report_key'])
+    if report is None:
+        abort(410, "The report has expired, please check the paper again")
+    if request.args.get('format') == 'json':
+        return jsonify(encode_report(report, row['paper_name'], request.args.get('verbose') == '1'))
+    return render_template("upload.html", processed=True, filename=row['filename'], admin=admin, **report)
+
+
+@app.route("/batch", methods=["GET", "POST"])
+def batch():
+    """checks every paper in an uploaded zip archive as a background job"""
+    admin = 'DEV_DEBUG' in os.environ and os.environ['DEV_DEBUG'] == 'True'
+    if job_queue is None:
+        abort(404)
+    max_size = app.config['MAX_CONTENT_LENGTH']
+    if request.method == "POST" and request.content_length and request.content_length > max_size:
+        # turned away before any of it is read
+        return render_template(
+            "batch.html", error=f"The zip archive is too large, at most {max_size // MB} MB can be uploaded",
+            admin=admin), 413
+    if request.method == "POST" and 'archive' in request.files:
+        storage = request.files['archive']
+        filename = secure_filename(storage.filename)
+        if not filename.lower().endswith('.zip'):
+            return render_template("batch.html", error="Wrong file extension. Please upload a .zip archive", admin=admin)
+        try:
+            checks = parse_checks(request.values.get('checks'))
+        except UnknownCheckError as err:
+            return render_template("batch.html", error=err, admin=admin)
+
+        # the archive is kept on disk, it can hold any number of papers
+        os.makedirs(app.config['BATCH_DIR'], exist_ok=True)
+        remove_old_batches()
+        job_id = new_job_id()
+        storage.save(batch_path(job_id))
+        try:
+            check_archive(batch_path(job_id), app.config['BATCH_MAX_ENTRIES'])
+        except (TooManyEntriesError, zipfile.BadZipFile) as err:
+            remove_file(batch_path(job_id))
+            error = err if isinstance(err, TooManyEntriesError) else "The file is not a valid zip archive"
+            return render_template("batch.html", error=error, admin=admin)
+        job_queue.submit(filename, None, checks, None, job_id=job_id)
+        return redirect(url_for('job_report', job_id=job_id))
+
+    return render_template("batch.html", admin=admin)
+
+
+@app.route("/jobs/<job_id>/status", methods=["GET"])
+def job_status(job_id):
+    """the status of a job as json, with ?wait=seconds it waits for the job
+    to finish for up to that long before answering"""
+    if job_queue is None:
+        abort(404)
+    try:
+        wait = min(float(request.args.get('wait', 0)), MAX_JOB_WAIT)
+        job = wait_for_job(job_queue, job_id, wait)
+    except ValueError:
+        abort(400)
+    except JobNotFoundError:
+        abort(404)
+    return jsonify(id=job.id, status=job.status, url=url_for('job_report', job_id=job.id))
+
+
+@app.route("/jobs/<job_id>/events", methods=["GET"])
+def job_events(job_id):
+    """server-sent events with the html of each section of the report as
+    soon as the job has it, then a done event once the job has finished. A
+    connection is kept open for at most MAX_JOB_WAIT seconds, browsers
+    reconnect from the Last-Event-ID they got to."""
+    if job_queue is None:
+        abort(404)
+    try:
+        job_queue.get(job_id)
+        after = int(request.headers.get('Last-Event-ID', 0))
+    except JobNotFoundError:
+        abort(404)
+    except ValueError:
+        abort(400)
+
+    summary_item = get_template_attribute("section_macro.html", "summary_item")
+
+    def events(after):
+        deadline = time.monotonic() + MAX_JOB_WAIT
+        while True:
+            # the status is read first, so every section is sent before done
+            job = job_queue.get(job_id)
+            for number, name, section in job_queue.get_sections(job_id, after):
+                data = {
+                    'name': name,
+                    'ok': section['ok'],
+                    'summary': str(summary_item(section)),
+                    'html': render_section(name, section),
+                }
+                yield f"id: {number}\nevent: section\ndata: {json.dumps(data)}\n\n"
+                after = number
+            if job.status in (DONE, FAILED):
+                data = {'status': job.status, 'url': url_for('job_report', job_id=job_id)}
+                yield f"event: done\ndata: {json.dumps(data)}\n\n"
+                return
+            if time.monotonic() > deadline:
+                return
+            time.sleep(0.2)
+
+    return Response(
+        stream_with_context(events(after)),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+@app.route("/api/validate", methods=["POST"])
+def api_validate():
+    """validates the uploaded document and returns the report as json, or as
+    msgpack when the request accepts application/x-msgpack. ?verbose=1 adds
+    the full text of paragraphs and the rules checked, ?checks= works as for
+    the upload page."""
+    mimetypes = [JSON_MIMETYPE, MSGPACK_MIMETYPE] if msgpack is not None else [JSON_MIMETYPE]
+    mimetype = request.accept_mimetypes.best_match(mimetypes, default=JSON_MIMETYPE)
+
+    def respond(encoded, status=200):
+        return Response(dump_report(encoded, mimetype), status=status, mimetype=mimetype)
+
+    if documents.name not in request.files:
+        return respond({'error': f"No document uploaded, expected a file named '{documents.name}'"}, 400)
+    storage = request.files[documents.name]
+    filename = documents.get_basename(storage.filename)
+    if not documents.file_allowed(storage, filename):
+        return respond({'error': "Wrong file extension. Please upload .docx files only"}, 400)
+    paper_name = os.path.splitext(filename)[0]
+
+    try:
+        checks = parse_checks(request.values.get('checks'))
+        paper_name = get_paper_name(paper_name)
+    except (UnknownCheckError, UnknownConferenceError) as err:
+        return respond({'error': str(err)}, 400)
+
+    try:
+        report = get_report(storage.stream, paper_name, checks)
+    except Exception as err:
+        if app.debug and not isinstance(err, UPLOAD_ERRORS):
+            raise
+        body = {'paper_name': paper_name, 'error': upload_error(err, filename)}
+        if isinstance(err, PaperNotFoundError):
+            body['suggestions'] = err.suggestions
+        return respond(body, 422)
+
+    verbose = request.values.get('verbose', '').lower() in ('1', 'true', 'yes')
+    return respond(encode_report(report, paper_name, verbose))
+
+
 @app.route("/convert", methods=["GET", "POST"])
 def convert():
     admin = 'DEV_DEBUG' in os.environ and os.environ['DEV_DEBUG'] == 'True'
@@ -191,3 +571,13 @@ def log():
         abort(403)
     logs = [] #Log.query.all()
     return render_template("logs.html", logs=logs, admin=admin)
+
+
+@app.route("/cache", methods=["GET"])
+def cache_stats():
+    admin = 'DEV_DEBUG' in os.environ and os.environ['DEV_DEBUG'] == 'True'
+    if not admin:
+        abort(403)
+    info = validation_pool.run(get_validation_cache_info)
+    info['reports'] = report_cache.info()
+    return jsonify(info)
@@ -0,0 +1,58 @@
+"""Reports and job results as json, for keeping them where other processes
+   read them back: the report cache directory and the job queue database.
+
+   Reading json can't run any code, unlike unpickling, so a file someone else
+   put in one of those places can do no harm. The few kinds of value in a
+   report that json has no type for (tuples, dates and dicts with keys that
+   aren't strings) are written as an object with one special key and turned
+   back into what they were when read."""
+
+import datetime
+import json
+
+TUPLE = '__tuple__'
+DATETIME = '__datetime__'
+DATE = '__date__'
+ITEMS = '__items__'
+
+DECODERS = {
+    TUPLE: tuple,
+    DATETIME: datetime.datetime.fromisoformat,
+    DATE: datetime.date.fromisoformat,
+    ITEMS: lambda items: {key: item for key, item in items},
+}
+
+
+def dumps(value):
+    """the json bytes of *value*, made of dicts, lists, tuples, strings,
+    numbers, dates and None"""
+    return json.dumps(_encode(value), separators=(',', ':')).encode()
+
+
+def loads(data):
+    """the value written by dumps"""
+    return json.loads(data, object_hook=_decode)
+
+
+def _encode(value):
+    if isinstance(value, dict):
+        if all(isinstance(key, str) for key in value) and not (len(value) == 1 and next(iter(value)) in DECODERS):
+            return {key: _encode(item) for key, item in value.items()}
+        return {ITEMS: [[_encode(key), _encode(item)] for key, item in value.items()]}
+    if isinstance(value, list):
+        return [_encode(item) for item in value]
+    if isinstance(value, tuple):
+        return {TUPLE: [_encode(item) for item in value]}
+    if isinstance(value, datetime.datetime):
+        return {DATETIME: value.isoformat()}
+    if isinstance(value, datetime.date):
+        return {DATE: value.isoformat()}
+    return value
+
+
+def _decode(value):
+    if len(value) == 1:
+        tag, encoded = next(iter(value.items()))
+        if tag in DECODERS:
+            return DECODERS[tag](encoded)
+    return value
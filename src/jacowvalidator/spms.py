@@ -1,24 +1,62 @@
 """For verifying that an uploaded file matches an entry from the spms
    references csv file and if so, verifies that the title and authors match """
 
+import logging
 import os
-import csv
 import re
+import sqlite3
+import threading
+import unicodedata
+from collections import defaultdict, deque, namedtuple
+
+from jacowvalidator.cache import LRUCache
 from jacowvalidator.docutils.authors import get_author_list
+from jacowvalidator.spms_index import (
+    ColumnNotFoundError, edit_distance, get_file_version, get_spms_index, hash_row, read_references,
+    suggest_papers, variants)
+from jacowvalidator.spms_titles import MIN_SIMILARITY, TitleIndex, diff_spans, similarity
+
+logger = logging.getLogger(__name__)
 
 RE_MULTI_SPACE = re.compile(r' +')
+# a paper name qualified with its conference, eg IPAC21_MOPAB001
+RE_CONFERENCE_PAPER = re.compile(r'([A-Za-z0-9]+)[_-](.+)')
+
+# applied after NFKD, which splits an accented letter into the letter and its
+# accent, to leave out the accents (combining marks) and spell out the letters
+# that have no plain version
+ACCENTS_TABLE = {
+    **dict.fromkeys(range(0x300, 0x370)),
+    **str.maketrans({
+        'ß': 'ss', 'æ': 'ae', 'Æ': 'AE', 'œ': 'oe', 'Œ': 'OE', 'ø': 'o', 'Ø': 'O', 'ł': 'l', 'Ł': 'L',
+        'đ': 'd', 'Đ': 'D', 'ð': 'd', 'Ð': 'D', 'þ': 'th', 'Þ': 'Th', 'ı': 'i'}),
+}
+
+# also leaves out hyphens (sometimes inconsistently applied), asterisks
+# (sometimes included in docx authors text) and formatting characters
+# occasionally observed
+AUTHOR_NAME_TABLE = {**ACCENTS_TABLE, **str.maketrans('', '', '-*†')}
+
+# surnames at least this long may be misspelled by two letters, shorter ones
+# by one, and still be a (not exact) match
+LONG_SURNAME = 8
+
+# comparison objects for author names from documents
+AUTHOR_CACHE = LRUCache(int(os.environ.get('AUTHOR_CACHE_SIZE', 4096)))
+
+# the papers looked up in the conferences' databases, by paper id and the
+# hash_row of their title and authors
+REFERENCE_CACHE = LRUCache(int(os.environ.get('REFERENCE_CACHE_SIZE', 1024)))
 
 
 class PaperNotFoundError(Exception):
     """Raised when the paper submitted by a user has no matching entry in the
-    spms references list of papers"""
-    pass
-
+    spms references list of papers, *suggestions* are the codes of the papers
+    it may have been meant to be"""
 
-class ColumnNotFoundError(Exception):
-    """Raised when the spms references csv file doesn't have a column this
-    function expected"""
-    pass
+    def __init__(self, message, suggestions=()):
+        super().__init__(message)
+        self.suggestions = list(suggestions)
 
 
 class CSVPathNotDeclared(Exception):
@@ -33,12 +71,207 @@ class CSVFileNotFound(Exception):
     pass
 
 
+class UnknownConferenceError(Exception):
+    """Raised when a conference asked for has no references csv in the
+    PATH_TO_JACOW_CONFERENCES folder"""
+    pass
+
+
+# a paper in the references csv, with its title ready for comparing and its
+# authors already extracted
+Reference = namedtuple('Reference', ['paper', 'title', 'authors', 'author_list', 'compare_authors'])
+
+
+class ReferenceCatalog:
+    """The papers in the spms references csv file at *path* by paper id, read
+    once so that many papers can be checked against it. The papers of a
+    *previous* catalog whose rows are unchanged are used again rather than
+    worked out from their rows."""
+
+    def __init__(self, path, previous=None):
+        self.path = path
+        # taken before reading, a file replaced while it's read is read again
+        self.version = get_file_version(path)
+        self.references = {}
+        self.hashes = {}
+        for paper, title, authors in read_references(path):
+            # the first row for a paper is the one that is used
+            if paper in self.references:
+                continue
+            row_hash = self.hashes[paper] = hash_row(title, authors)
+            if previous is not None and previous.hashes.get(paper) == row_hash:
+                self.references[paper] = previous.references[paper]
+            else:
+                self.references[paper] = make_reference(paper, title, authors)
+        self.titles = TitleIndex(
+            {paper: reference.title for paper, reference in self.references.items()},
+            previous.titles if previous is not None else None)
+
+    def get(self, paper_name):
+        return self.references.get(paper_name)
+
+    def best_title_match(self, title):
+        """the paper id of the title most like *title*, or None"""
+        match = self.titles.best_match(title)
+        return match[0] if match else None
+
+
+class SharedCatalog:
+    """A ReferenceCatalog read from the sqlite database of a conference's
+    references csv rather than held in memory. The database is memory mapped,
+    so however many conferences there are, every worker process shares the
+    one copy of each. The papers looked up are kept in REFERENCE_CACHE."""
+
+    def __init__(self, path):
+        self.path = path
+        self.index = get_spms_index(path)
+
+    def get(self, paper_name):
+        row = self.index.get(paper_name)
+        # the database looks up codes whatever their case, the catalog doesn't
+        if row is None or row[0] != paper_name:
+            return None
+        # working out the authors of a paper each time it is checked costs
+        # more than the lookup, a row that is edited gets a new key
+        key = (paper_name, hash_row(*row[1:]))
+        reference = REFERENCE_CACHE.get(key)
+        if reference is None:
+            reference = make_reference(*row)
+            REFERENCE_CACHE.put(key, reference)
+        return reference
+
+    def best_title_match(self, title):
+        # the full text search finds the titles sharing the most words, of
+        # those the one that is most alike is the match
+        best, best_similarity = None, MIN_SIMILARITY
+        for paper, spms_title, _ in self.index.search(title):
+            score = similarity(title, spms_title)
+            if score >= best_similarity:
+                best, best_similarity = paper, score
+        return best
+
+
+def make_reference(paper, title, authors):
+    author_list = get_author_list(authors)
+    # worked out once for each paper when the csv is read, not cached
+    return Reference(paper, RE_MULTI_SPACE.sub(' ', title.upper()), authors,
+                     author_list, [make_comparison_author(author) for author in author_list])
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def get_reference_catalog(path):
+    """the ReferenceCatalog for the references csv file at *path*, loaded the
+    first time and again whenever the file changes. The new catalog replaces
+    the old one in one step, checks already running keep the one they have."""
+    global _catalog
+    catalog = _catalog
+    if catalog is None or catalog.path != path or catalog.version != get_file_version(path):
+        with _catalog_lock:
+            # another thread may have loaded it while this one waited
+            catalog = _catalog
+            if catalog is None or catalog.path != path:
+                catalog = _catalog = ReferenceCatalog(path)
+            elif catalog.version != get_file_version(path):
+                # only the papers whose rows changed are worked out again
+                catalog = _catalog = ReferenceCatalog(path, previous=catalog)
+    return catalog
+
+
+def get_conferences():
+    """the references csv for each conference by its code, from the
+    <CODE>.csv files in the PATH_TO_JACOW_CONFERENCES folder"""
+    directory = os.environ.get('PATH_TO_JACOW_CONFERENCES')
+    if not directory or not os.path.isdir(directory):
+        return {}
+    conferences = {}
+    for name in sorted(os.listdir(directory)):
+        code, ext = os.path.splitext(name)
+        if ext.lower() == '.csv':
+            conferences[code.upper()] = os.path.join(directory, name)
+    return conferences
+
+
+def get_conference_path(conference):
+    """the references csv of the conference with the code *conference*"""
+    path = get_conferences().get(conference.upper())
+    if path is None:
+        raise UnknownConferenceError(f"There is no references csv for the conference {conference}")
+    return path
+
+
+def qualify_paper_name(conference, paper_name):
+    """*paper_name* with the *conference* it is for in front, the way
+    resolve_paper_name reads it back"""
+    return f"{conference.upper()}_{paper_name}"
+
+
+def resolve_paper_name(paper_name):
+    """(references csv path, paper id) for a paper name that starts with the
+    code of a conference, eg IPAC21_MOPAB001 or ipac21-MOPAB001, or (None,
+    paper_name) when it doesn't"""
+    match = RE_CONFERENCE_PAPER.fullmatch(paper_name)
+    if match:
+        path = get_conferences().get(match.group(1).upper())
+        if path is not None:
+            return path, match.group(2)
+    return None, paper_name
+
+
+_shared_catalogs = {}
+
+
+def get_shared_catalog(path):
+    """the SharedCatalog for the references csv at *path*, opened again
+    whenever the file changes"""
+    catalog = _shared_catalogs.get(path)
+    if catalog is None or catalog.index.version != get_file_version(path):
+        # a new one replaces the old in one step, building the database is
+        # already safe for several threads at once
+        catalog = _shared_catalogs[path] = SharedCatalog(path)
+    return catalog
+
+
+def get_reference_csv_version(paper_name=None):
+    """identifies the references csv currently in use, it changes whenever
+    the file is replaced or edited. For *paper_name* it identifies just the
+    paper's row (in the csv of its conference), which only changes when that
+    row is edited, added or removed. None if there is no SPMS check."""
+    conference_path, paper = resolve_paper_name(paper_name) if paper_name is not None else (None, None)
+    if conference_path is not None:
+        return _get_row_version(conference_path, paper)
+    if 'URL_TO_JACOW_REFERENCES_CSV' not in os.environ:
+        return None
+    path = os.environ.get('PATH_TO_JACOW_REFERENCES_CSV')
+    if not path or not os.path.isfile(path):
+        return 'missing'
+    if paper_name is not None:
+        return _get_row_version(path, paper_name)
+    return get_file_version(path)
+
+
+def _get_row_version(path, paper):
+    try:
+        return get_spms_index(path).get_hash(paper) or 'not found'
+    except (OSError, sqlite3.Error):
+        logger.exception("Failed to build the spms index")
+        # all the reports for the csv change with it instead
+        return get_file_version(path)
+
+
 # runs conformity checks against the references csv file and returns a dict of
 # results, eg: result = { title_match: True, authors_match: False }
 def reference_csv_check(filename_minus_ext, title, authors):
     result = {
         'title_match': False, 'authors_match': False,
     }
+    conference_path, paper_name = resolve_paper_name(filename_minus_ext)
+    if conference_path is not None:
+        catalog = get_shared_catalog(conference_path)
+        return _check_catalog(catalog, conference_path, paper_name, title, authors)
+
     if 'PATH_TO_JACOW_REFERENCES_CSV' not in os.environ:
         raise CSVPathNotDeclared("The environment variable "
                                  "PATH_TO_JACOW_REFERENCES_CSV is not "
@@ -46,100 +279,102 @@ def reference_csv_check(filename_minus_ext, title, authors):
                                  "title checking")
     if not os.path.isfile(os.environ['PATH_TO_JACOW_REFERENCES_CSV']):
         raise CSVFileNotFound(f"No file was found at the location {os.environ['PATH_TO_JACOW_REFERENCES_CSV']}")
-    # the encoding value is one that should work for most documents.
-    # the encoding for a file can be detected with the command:
-    #    ` file -i FILE `
-    with open(os.environ['PATH_TO_JACOW_REFERENCES_CSV'], encoding="ISO-8859-1") as f:
-        reader = csv.reader(f)
-        reading_header_row = True
-        match_found = False
-        for spms_row in reader:
-            if reading_header_row:
-                reading_header_row = False
-                header = spms_row
-                title_col = header.index("title")
-                paper_col = header.index("paper")
-                authors_col = header.index("authors")
-                # confirm those headers existed as expected:
-                for heading in ['title_col', 'paper_col', 'authors_col']:
-                    # (if they didn't exist, the vars will be undefined)
-                    if heading not in locals():
-                        raise ColumnNotFoundError(f"could not identify {heading} column in references csv")
-            else:
-                if filename_minus_ext == spms_row[paper_col]:
-                    reference_title = RE_MULTI_SPACE.sub(' ', spms_row[title_col].upper())
-                    title_match = title.upper().strip('*') == reference_title
-                    report, authors_match = get_author_list_report(authors, spms_row[authors_col])
-
-                    # builds the data for display, match_ok determines the colour of the cell
-                    # True for green, False for red, 2 for amber.
-                    summary_list = [{
-                        'type': 'Author',
-                        'match_ok': 2 if result['match'] and not result['exact'] else result['match'],
-                        'docx': result['docx'],
-                        'spms': result['spms']} for result in report]
-
-                    return {
-                        'title': {
-                            'match': title_match,
-                            'docx': title,
-                            'spms': reference_title
-                        },
-                        'author': {
-                            'match': authors_match,
-                            'docx': authors,
-                            'spms': spms_row[authors_col],
-                            'docx_list': get_author_list(authors),
-                            'spms_list': get_author_list(spms_row[authors_col]),
-                            'report': report
-                        },
-                        'summary': [{
-                            'type': 'Title',
-                            'match_ok': title_match,
-                            'docx': title,
-                            'spms': reference_title
-                        }, {
-                            'type': 'Extracted Author List',
-                            'match_ok': authors_match,
-                            'docx': authors,
-                            'spms': spms_row[authors_col],
-                        }, *summary_list],
-                    }
-
-        # if not returned by now its because the paper wasn't found in the list
-        if 'SPMS_DEBUG' in os.environ and os.environ['SPMS_DEBUG'] == 'True':
-            return {
-                'title': {
-                    'match': False,
-                    'docx': title.upper(),
-                    'spms': 'No matching paper found in the spms csv file'
-                },
-                'author': {
-                    'match': False,
-                    'docx': authors,
-                    'spms': 'No matching paper found in the spms csv file',
-                    'docx_list': list(),
-                    'spms_list': list(),
-                    'report': list()
-                },
-                'summary': [{
-                    'type': 'title',
-                    'match': False,
-                    'docx': title.upper(),
-                    'spms': 'No matching paper found in the spms csv file'
-                    }, {
-                    'type': 'author',
-                    'match': False,
-                    'docx': authors,
-                    'spms': 'No matching paper found in the spms csv file',
-                }],
-
-            }
-        else:
-            raise PaperNotFoundError("No matching paper found in the spms csv file")
-
-
-def get_author_list_report(docx_text, spms_text):
+    catalog = get_reference_catalog(os.environ['PATH_TO_JACOW_REFERENCES_CSV'])
+    return _check_catalog(catalog, os.environ['PATH_TO_JACOW_REFERENCES_CSV'], filename_minus_ext, title, authors)
+
+
+def _check_catalog(catalog, path, filename_minus_ext, title, authors):
+    reference = catalog.get(filename_minus_ext)
+
+    if reference is not None:
+        return compare_reference(reference, title, authors)
+
+    # if not returned by now its because the paper wasn't found in the list
+    if 'SPMS_DEBUG' in os.environ and os.environ['SPMS_DEBUG'] == 'True':
+        return {
+            'title': {
+                'match': False,
+                'docx': title.upper(),
+                'spms': 'No matching paper found in the spms csv file'
+            },
+            'author': {
+                'match': False,
+                'docx': authors,
+                'spms': 'No matching paper found in the spms csv file',
+                'docx_list': list(),
+                'spms_list': list(),
+                'report': list()
+            },
+            'summary': [{
+                'type': 'title',
+                'match': False,
+                'docx': title.upper(),
+                'spms': 'No matching paper found in the spms csv file'
+                }, {
+                'type': 'author',
+                'match': False,
+                'docx': authors,
+                'spms': 'No matching paper found in the spms csv file',
+            }],
+
+        }
+    else:
+        suggestions = suggest_papers(path, filename_minus_ext, title, authors)
+        # the paper with the closest title, if it is close enough, comes first
+        best_match = catalog.best_title_match(title)
+        if best_match:
+            suggestions = [best_match, *[paper for paper in suggestions if paper != best_match]][:3]
+        raise PaperNotFoundError("No matching paper found in the spms csv file", suggestions)
+
+
+def compare_reference(reference, title, authors):
+    """compares the *title* and *authors* text of a document with the paper's
+    Reference, giving the details reference_csv_check returns"""
+    reference_title = reference.title
+    docx_title = title.upper().strip('*')
+    title_match = docx_title == reference_title
+    report, authors_match = get_author_list_report(authors, reference.authors, reference.compare_authors)
+
+    # how alike the titles are, with the parts that differ when they don't match
+    title_differences = {'similarity': 1.0 if title_match else similarity(docx_title, reference_title)}
+    if not title_match:
+        title_differences['docx_spans'], title_differences['spms_spans'] = diff_spans(docx_title, reference_title)
+    title_details = {'match': title_match, 'docx': title, 'spms': reference_title, **title_differences}
+
+    # builds the data for display, match_ok determines the colour of the cell
+    # True for green, False for red, 2 for amber.
+    summary_list = [{
+        'type': 'Author',
+        'match_ok': 2 if result['match'] and not result['exact'] else result['match'],
+        'docx': result['docx'],
+        'spms': result['spms']} for result in report]
+
+    return {
+        'title': title_details,
+        'author': {
+            'match': authors_match,
+            'docx': authors,
+            'spms': reference.authors,
+            'docx_list': get_author_list(authors),
+            'spms_list': list(reference.author_list),
+            'report': report
+        },
+        'summary': [{
+            'type': 'Title',
+            'match_ok': title_match,
+            'docx': title,
+            'spms': reference_title,
+            **title_differences,
+        }, {
+            'type': 'Extracted Author List',
+            'match_ok': authors_match,
+            'docx': authors,
+            'spms': reference.authors,
+        }, *summary_list],
+    }
+
+
+def get_author_list_report(docx_text, spms_text, spms_authors=None):
     """Compares two lists of authors (one sourced from the uploaded docx file
     and one sourced from the corresponding paper's entry in the SPMS references
     csv file) and produces a dict array report of the form:
@@ -165,10 +400,10 @@ def get_author_list_report(docx_text, spms_text):
         ]
     """
     extracted_docx_authors = get_author_list(docx_text)
-    extracted_spms_authors = get_author_list(spms_text)
     # extracted_docx_authors = ['Y. Z. Gómez Martínez', 'T. X. Therou', 'A. Tiller']
     docx_list = build_comparison_author_objects(extracted_docx_authors)
-    spms_list = build_comparison_author_objects(extracted_spms_authors)
+    if spms_authors is None:
+        spms_authors = build_comparison_author_objects(get_author_list(spms_text))
     # docx_list = [
     # {
     #   original-value: 'Y. Z. Gómez Martínez',
@@ -177,48 +412,77 @@ def get_author_list_report(docx_text, spms_text):
     #   compare-last: 'Gomez Martinez'
     # }, ... ]
 
-    # create lists needed for matching and sorting:
+    # the docx authors not yet matched, by their position in the document.
+    # each round looks them up by a key, taking the first one in the document
+    # with the same key as the spms author
 
-    spms_matched = list()
-    spms_unmatched = list()
-    docx_matched = list()
+    docx_unmatched = dict(enumerate(docx_list))
     results = list()
 
     # perform first round of matching, looking for exact matches:
 
     all_authors_match = True  # assume they all match until left with unpaired authors
-    for spms_author in spms_list[:]:
-        docx_author = next((docx_author for docx_author in docx_list if docx_author['compare-value'] == spms_author['compare-value']), None)
-        if docx_author:
-            docx_matched.append(docx_author)
-            docx_list.remove(docx_author)
-            spms_matched.append(spms_author)
-            spms_list.remove(spms_author)
-            results.append({'docx': docx_author['original-value'],
-                            'spms': spms_author['original-value'],
-                            'exact': True,
-                            'match': True})
-        else:
+    spms_unmatched = list()
+    docx_by_value = group_authors(docx_unmatched, 'compare-value')
+    for spms_author in spms_authors:
+        position = take_first(docx_by_value, spms_author['compare-value'])
+        if position is None:
             spms_unmatched.append(spms_author)
-            spms_list.remove(spms_author)
-
-    # Move remaining authors in docx_list to docx_unmatched:
-
-    docx_unmatched = docx_list
+            continue
+        docx_author = docx_unmatched.pop(position)
+        results.append({'docx': docx_author['original-value'],
+                        'spms': spms_author['original-value'],
+                        'exact': True,
+                        'match': True})
 
     # if any unmatched authors remain, perform second round of matching, looking for loose matches (missing initials)
 
-    for spms_author in spms_unmatched[:]:
-        docx_author = next((docx_author for docx_author in docx_unmatched if docx_author['compare-first-last'] == spms_author['compare-first-last']), None)
-        if docx_author:
-            docx_matched.append(docx_author)
-            docx_unmatched.remove(docx_author)
-            spms_matched.append(spms_author)
-            spms_unmatched.remove(spms_author)
-            results.append({'docx': docx_author['original-value'],
-                            'spms': spms_author['original-value'],
-                            'exact': False,
-                            'match': True})
+    spms_remaining = list()
+    docx_by_first_last = group_authors(docx_unmatched, 'compare-first-last')
+    for spms_author in spms_unmatched:
+        position = take_first(docx_by_first_last, spms_author['compare-first-last'])
+        if position is None:
+            spms_remaining.append(spms_author)
+            continue
+        docx_author = docx_unmatched.pop(position)
+        results.append({'docx': docx_author['original-value'],
+                        'spms': spms_author['original-value'],
+                        'exact': False,
+                        'match': True})
+    spms_unmatched = spms_remaining
+
+    # a third round matches authors left with the same first initial whose
+    # surnames are misspelled by a letter (two for long surnames). Only the
+    # docx authors whose surname has a version with one letter left out in
+    # common are measured, which finds every surname a letter out
+
+    spms_remaining = list()
+    docx_by_variant = defaultdict(list)
+    for position, docx_author in docx_unmatched.items():
+        if docx_author['compare-last']:
+            for variant in variants(docx_author['compare-last']):
+                docx_by_variant[(docx_author['compare-value'][:1], variant)].append(position)
+    for spms_author in spms_unmatched:
+        surname = spms_author['compare-last']
+        allowed = 2 if len(surname) >= LONG_SURNAME else 1
+        best = None
+        for variant in variants(surname) if surname else ():
+            for position in docx_by_variant.get((spms_author['compare-value'][:1], variant), ()):
+                if position not in docx_unmatched:
+                    continue
+                distance = edit_distance(docx_unmatched[position]['compare-last'], surname)
+                if distance <= allowed and (best is None or (distance, position) < best):
+                    best = (distance, position)
+        if best is None:
+            spms_remaining.append(spms_author)
+            continue
+        docx_author = docx_unmatched.pop(best[1])
+        results.append({'docx': docx_author['original-value'],
+                        'spms': spms_author['original-value'],
+                        'exact': False,
+                        'match': True})
+    spms_unmatched = spms_remaining
+
     # after all matching rounds completed, any authors remaining in the
     # unmatched lists are added to results with a match value of false:
 
@@ -229,7 +493,7 @@ def get_author_list_report(docx_text, spms_text):
                         'match': False})
         all_authors_match = False
 
-    for docx_author in docx_unmatched:
+    for docx_author in docx_unmatched.values():
         results.append({'docx': docx_author['original-value'],
                         'spms': '',
                         'exact': False,
@@ -239,35 +503,55 @@ def get_author_list_report(docx_text, spms_text):
     return results, all_authors_match
 
 
+def group_authors(authors, key):
+    """the positions of the *authors* (a dict of author objects by position)
+    by the value of *key*, in order"""
+    groups = defaultdict(deque)
+    for position, author in authors.items():
+        groups[author[key]].append(position)
+    return groups
+
+
+def take_first(groups, value):
+    """removes and returns the first position grouped under *value*, None if
+    there isn't one"""
+    positions = groups.get(value)
+    return positions.popleft() if positions else None
+
+
 def build_comparison_author_objects(author_names):
-    author_compare_objects = list()
-    for author in author_names:
-        original_value = author
-        compare_value = normalize_author_name(author)
-        compare_first_last = get_first_last_only(compare_value)
-        compare_last = get_surname(compare_first_last)
-        author_compare_objects.append(
-            {
-                'original-value': original_value,
-                'compare-value': compare_value,
-                'compare-first-last': compare_first_last,
-                'compare-last': compare_last
-            })
-    return author_compare_objects
+    return [get_comparison_author(author) for author in author_names]
+
+
+def get_comparison_author(author):
+    """the comparison object for an author name from a document, the same
+    names are checked again and again so they are kept in AUTHOR_CACHE"""
+    author_object = AUTHOR_CACHE.get(author)
+    if author_object is None:
+        author_object = make_comparison_author(author)
+        AUTHOR_CACHE.put(author, author_object)
+    return author_object
+
+
+def make_comparison_author(author):
+    compare_value = normalize_author_name(author)
+    compare_first_last = get_first_last_only(compare_value)
+    compare_last = get_surname(compare_first_last)
+    return {
+        'original-value': author,
+        'compare-value': compare_value,
+        'compare-first-last': compare_first_last,
+        'compare-last': compare_last
+    }
 
 
 def normalize_author_name(author_name):
     """returns a normalized name suitable for comparing"""
     # ensure periods are followed by a space:
     normalized_name = author_name.replace('.', '. ').replace('  ', ' ')
-    # convert frequently interchanged accented characters with their asci equivalents:
-    normalized_name = remove_accented_chars(normalized_name)
-    # remove hyphens (sometimes inconsistently applied):
-    normalized_name = normalized_name.replace('-', '')
-    # remove asterisks (sometimes included in docx authors text):
-    normalized_name = normalized_name.replace('*', '')
-    # remove formatting characters occasionally observed:
-    normalized_name = normalized_name.replace('†', '')
+    # convert accented characters to their ascii equivalents and remove
+    # characters not always used, in one pass:
+    normalized_name = unicodedata.normalize('NFKD', normalized_name).translate(AUTHOR_NAME_TABLE)
     # strip possible extra whitespace:
     normalized_name = normalized_name.strip()
     return normalized_name
@@ -288,7 +572,8 @@ def get_surname(author_name):
 
 
 def remove_accented_chars(name):
-    return name   # Todo
+    """*name* with its accented letters as plain ones, eg Gómez as Gomez"""
+    return unicodedata.normalize('NFKD', name).translate(ACCENTS_TABLE)
 
 
 def clone_list(list_to_clone):
@@ -0,0 +1,338 @@
+"""The spms references csv file compiled into a sqlite database, for finding
+   the paper a document was meant to be when its filename isn't exactly a
+   paper code (MOPAB001_1.docx, mopab001.docx, THPMK148_v2.docx).
+
+   The database has the papers indexed by code and a full text index of their
+   titles and authors. It is built next to the csv file the first time it is
+   needed, into a new file that is then moved into place, so every gunicorn
+   worker process shares the one database and never sees it half built. When
+   the csv file changes only the papers whose rows changed are updated, in
+   one transaction, so the database goes from one version of the csv to the
+   next in one step."""
+
+import csv
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+from contextlib import closing
+
+logger = logging.getLogger(__name__)
+
+# the paper code at the start of a filename, eg THPMK148 in THPMK148_v2
+RE_PAPER_CODE = re.compile(r'[A-Z]+[0-9]+')
+RE_WORD = re.compile(r'\w+')
+
+# the most of a database that is memory mapped, more than any references csv
+MMAP_SIZE = 256 * 1024 * 1024
+# changed whenever the tables change, older databases are built again
+INDEX_FORMAT = '2'
+
+
+class ColumnNotFoundError(Exception):
+    """Raised when the spms references csv file doesn't have a column this
+    function expected"""
+    pass
+
+
+def read_references(path):
+    """(paper, title, authors) for each row of the references csv file at
+    *path*, in the order of the file"""
+    # the encoding value is one that should work for most documents.
+    # the encoding for a file can be detected with the command:
+    #    ` file -i FILE `
+    with open(path, encoding="ISO-8859-1") as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        try:
+            title_col = header.index("title")
+            paper_col = header.index("paper")
+            authors_col = header.index("authors")
+        except ValueError as err:
+            raise ColumnNotFoundError(f"could not identify column in references csv: {err}")
+        for row in reader:
+            if len(row) > paper_col:
+                yield row[paper_col], row[title_col], row[authors_col]
+
+
+def read_papers(path):
+    """{paper: (paper, title, authors)} of the references csv file at *path*
+    by the code in capitals, the first row for a paper is the one used"""
+    papers = {}
+    for row in read_references(path):
+        papers.setdefault(row[0].upper(), row)
+    return papers
+
+
+def hash_row(title, authors):
+    """identifies the title and authors of a paper, it changes whenever either
+    of them is edited"""
+    return hashlib.blake2b(f"{title}\0{authors}".encode(), digest_size=8).hexdigest()
+
+
+def get_file_version(path):
+    """changes whenever the file at *path* is replaced or edited"""
+    stat = os.stat(path)
+    return f"{stat.st_mtime_ns}-{stat.st_size}"
+
+
+def build_spms_index(csv_path, db_path):
+    """compiles the references csv file into a new sqlite database at
+    *db_path*, replacing any database already there in one step"""
+    version = get_file_version(csv_path)
+    building_path = f"{db_path}.{os.getpid()}.{threading.get_ident()}"
+    if os.path.exists(building_path):
+        os.remove(building_path)
+    try:
+        with closing(sqlite3.connect(building_path)) as db:
+            db.execute('CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)')
+            db.execute(
+                'CREATE TABLE papers ('
+                'paper TEXT PRIMARY KEY COLLATE NOCASE, title TEXT, authors TEXT, hash TEXT NOT NULL)')
+            # the rowid of a paper is the same as in papers
+            db.execute(
+                "CREATE VIRTUAL TABLE papers_search USING fts5("
+                "paper UNINDEXED, title, authors, tokenize='unicode61 remove_diacritics 2')")
+            db.execute('CREATE TABLE paper_variants (variant TEXT NOT NULL, paper TEXT NOT NULL)')
+            _insert_papers(db, read_papers(csv_path).values())
+            db.execute('CREATE INDEX paper_variants_variant ON paper_variants (variant)')
+            db.execute('CREATE INDEX paper_variants_paper ON paper_variants (paper)')
+            db.executemany('INSERT INTO meta (key, value) VALUES (?, ?)', [
+                ('version', version), ('format', INDEX_FORMAT)])
+            db.commit()
+        os.replace(building_path, db_path)
+    finally:
+        if os.path.exists(building_path):
+            os.remove(building_path)
+
+
+def update_spms_index(csv_path, db_path):
+    """brings the sqlite database at *db_path* up to date with the references
+    csv file, adding, changing and removing only the papers whose rows
+    differ, by code and a hash of the row. Returns the codes of the papers
+    that changed, or None if the database had to be built again."""
+    try:
+        with closing(sqlite3.connect(db_path, isolation_level=None)) as db:
+            # also waits for any other process updating it
+            db.execute('BEGIN IMMEDIATE')
+            try:
+                changed = _apply_changes(db, csv_path)
+            except BaseException:
+                db.execute('ROLLBACK')
+                raise
+            # the new version is seen by every reader at once
+            db.execute('COMMIT')
+    except sqlite3.Error:
+        changed = None
+    if changed is None:
+        build_spms_index(csv_path, db_path)
+    elif changed:
+        logger.info("Updated %s for %d changed papers", db_path, len(changed))
+    return changed
+
+
+def _apply_changes(db, csv_path):
+    # the changed papers, None if the database is from another format
+    meta = dict(db.execute('SELECT key, value FROM meta'))
+    if meta.get('format') != INDEX_FORMAT:
+        return None
+    version = get_file_version(csv_path)
+    if meta.get('version') == version:
+        # another process brought it up to date while this one waited
+        return set()
+
+    papers = read_papers(csv_path)
+    current = {paper.upper(): (rowid, paper, row_hash) for rowid, paper, row_hash in db.execute(
+        'SELECT rowid, paper, hash FROM papers')}
+    removed, added = [], []
+    for key, (rowid, paper, row_hash) in current.items():
+        row = papers.get(key)
+        if row is None or row[0] != paper or hash_row(*row[1:]) != row_hash:
+            removed.append((rowid, paper))
+            # a paper that changed is removed and added again
+            if row is not None:
+                added.append(row)
+    added.extend(row for key, row in papers.items() if key not in current)
+    db.executemany('DELETE FROM papers WHERE rowid = ?', [(rowid,) for rowid, _ in removed])
+    db.executemany('DELETE FROM papers_search WHERE rowid = ?', [(rowid,) for rowid, _ in removed])
+    db.executemany('DELETE FROM paper_variants WHERE paper = ?', [(paper,) for _, paper in removed])
+    _insert_papers(db, added)
+    db.execute("UPDATE meta SET value = ? WHERE key = 'version'", (version,))
+    return {paper for _, paper in removed} | {row[0] for row in added}
+
+
+def _insert_papers(db, rows):
+    for paper, title, authors in rows:
+        rowid = db.execute(
+            'INSERT INTO papers (paper, title, authors, hash) VALUES (?, ?, ?, ?)',
+            (paper, title, authors, hash_row(title, authors))).lastrowid
+        db.execute(
+            'INSERT INTO papers_search (rowid, paper, title, authors) VALUES (?, ?, ?, ?)',
+            (rowid, paper, title, authors))
+        db.executemany('INSERT INTO paper_variants (variant, paper) VALUES (?, ?)', [
+            (variant, paper) for variant in variants(paper.upper())])
+
+
+class SPMSIndex:
+    """Lookups in the sqlite database at *path* built by build_spms_index.
+    Papers are (paper, title, authors) tuples."""
+
+    def __init__(self, path):
+        self.path = path
+        with self._connect() as db:
+            meta = dict(db.execute('SELECT key, value FROM meta'))
+        self.version = meta.get('version')
+        self.format = meta.get('format')
+
+    def _connect(self):
+        # a connection for each call, so any thread can use the index. The
+        # file is read through memory mapping, so every worker process shares
+        # the one copy in the page cache instead of each having its own
+        db = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+        db.execute(f'PRAGMA mmap_size = {MMAP_SIZE}')
+        return closing(db)
+
+    def get(self, paper):
+        """the paper with the code *paper*, whatever its case, or None"""
+        with self._connect() as db:
+            return db.execute('SELECT paper, title, authors FROM papers WHERE paper = ?', (paper,)).fetchone()
+
+    def get_hash(self, paper):
+        """the hash_row of the paper with exactly the code *paper*, or None"""
+        with self._connect() as db:
+            row = db.execute('SELECT paper, hash FROM papers WHERE paper = ?', (paper,)).fetchone()
+        return row[1] if row and row[0] == paper else None
+
+    def find_by_prefix(self, prefix, limit=5):
+        """papers whose codes start with *prefix*"""
+        with self._connect() as db:
+            # a range on the code so the index is used
+            return db.execute(
+                'SELECT paper, title, authors FROM papers WHERE paper >= ? AND paper < ? ORDER BY paper LIMIT ?',
+                (prefix, prefix + '\uffff', limit)).fetchall()
+
+    def find_similar(self, paper, max_distance=2, limit=5):
+        """papers whose codes are at most *max_distance* (1 or 2) edits from
+        *paper*, closest first"""
+        paper = paper.upper()
+        # codes within 2 edits of each other nearly always have a variant with
+        # one character left out in common, only those are measured
+        with self._connect() as db:
+            candidates = db.execute(
+                'SELECT DISTINCT paper, title, authors FROM papers WHERE paper IN ('
+                '  SELECT paper FROM paper_variants WHERE variant IN ({}))'.format(
+                    ', '.join('?' * len(variants(paper)))), variants(paper)).fetchall()
+        similar = []
+        for candidate in candidates:
+            distance = edit_distance(candidate[0].upper(), paper)
+            if distance <= max_distance:
+                similar.append((distance, candidate))
+        similar.sort(key=lambda item: (item[0], item[1][0]))
+        return [candidate for _, candidate in similar[:limit]]
+
+    def search(self, title, authors=None, limit=5):
+        """papers whose titles best match the words in *title*, and then
+        whose authors best match *authors*, best first"""
+        words = RE_WORD.findall(title)
+        if not words:
+            return []
+        query = f"title : ({_any_word(words)})"
+        if authors and RE_WORD.search(authors):
+            query += f" OR authors : ({_any_word(RE_WORD.findall(authors))})"
+        with self._connect() as db:
+            # a title word counts for ten times as much as an author's name
+            return db.execute(
+                'SELECT paper, title, authors FROM papers_search WHERE papers_search MATCH ? '
+                'ORDER BY bm25(papers_search, 0, 10, 1) LIMIT ?', (query, limit)).fetchall()
+
+    def suggest(self, paper_name, title=None, authors=None, limit=3):
+        """the codes of the papers a document named *paper_name* (with
+        *title* and *authors*) was most likely meant to be, best first"""
+        # the same code in another case, or with something added after it
+        code = RE_PAPER_CODE.match(paper_name.upper())
+        for name in [paper_name, code.group() if code else None]:
+            paper = self.get(name) if name else None
+            if paper is not None:
+                return [paper[0]]
+
+        suggestions = []
+        if title:
+            suggestions.extend(self.search(title, authors, limit=1))
+        suggestions.extend(self.find_similar(code.group() if code else paper_name, limit=limit))
+        suggestions.extend(self.find_by_prefix(paper_name, limit=limit))
+
+        codes = []
+        for paper in suggestions:
+            if paper[0] not in codes:
+                codes.append(paper[0])
+        return codes[:limit]
+
+
+def variants(code):
+    """*code* and each version of it with one character left out"""
+    return sorted({code} | {code[:i] + code[i + 1:] for i in range(len(code))})
+
+
+def _any_word(words):
+    return ' OR '.join('"{}"'.format(word.replace('"', '')) for word in words)
+
+
+def edit_distance(first, second):
+    """the number of single character insertions, deletions and substitutions
+    that turn *first* into *second*"""
+    if len(first) < len(second):
+        first, second = second, first
+    previous = list(range(len(second) + 1))
+    for i, a in enumerate(first, 1):
+        current = [i]
+        for j, b in enumerate(second, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (a != b)))
+        previous = current
+    return previous[-1]
+
+
+# the SPMSIndex for each database, by path
+_indexes = {}
+_index_lock = threading.Lock()
+
+
+def get_spms_index(csv_path, db_path=None):
+    """the SPMSIndex for the references csv file at *csv_path*, building the
+    database (at *db_path*, by default next to the csv file) when it is
+    missing and updating it when it is older than the csv file"""
+    db_path = db_path or os.path.splitext(csv_path)[0] + '.sqlite3'
+    version = get_file_version(csv_path)
+    index = _indexes.get(db_path)
+    if index is None or index.version != version:
+        with _index_lock:
+            index = _indexes.get(db_path)
+            if index is None or index.version != version:
+                index = _open_index(db_path)
+                if index is None or index.format != INDEX_FORMAT:
+                    build_spms_index(csv_path, db_path)
+                    index = SPMSIndex(db_path)
+                elif index.version != version:
+                    update_spms_index(csv_path, db_path)
+                    index = SPMSIndex(db_path)
+                _indexes[db_path] = index
+    return index
+
+
+def _open_index(db_path):
+    # the database another process already built, if there is one
+    try:
+        return SPMSIndex(db_path)
+    except sqlite3.Error:
+        return None
+
+
+def suggest_papers(csv_path, paper_name, title=None, authors=None):
+    """SPMSIndex.suggest for the references csv file at *csv_path*, no
+    suggestions if the database can't be built"""
+    try:
+        return get_spms_index(csv_path).suggest(paper_name, title, authors)
+    except (OSError, sqlite3.Error):
+        logger.exception("Failed to build the spms index")
+        return []
@@ -0,0 +1,104 @@
+"""Finding how close a document's title is to the titles in the spms
+   references csv.
+
+   Each title is broken into its trigrams (every run of three characters) and
+   an index from trigram to the titles that have it is built when the csv is
+   read. Finding the titles closest to another then only compares it with the
+   titles that share its rarest trigrams, rather than with every title."""
+
+import heapq
+import re
+from collections import defaultdict
+from difflib import SequenceMatcher
+
+RE_NOT_WORD = re.compile(r'[\W_]+')
+
+# below this a title is too different to be the one meant
+MIN_SIMILARITY = 0.5
+# how many of a title's trigrams are looked up to find the titles to compare
+CANDIDATE_TRIGRAMS = 8
+
+
+def normalize_title(title):
+    """*title* in capitals with anything but letters and digits as one space"""
+    return RE_NOT_WORD.sub(' ', title.upper()).strip()
+
+
+def trigrams(title):
+    """the set of trigrams of the normalized *title*, padded so that short
+    words and the start and end of the title count too"""
+    padded = f"  {normalize_title(title)} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def similarity(first, second):
+    """how alike two titles are, from 0 (nothing shared) to 1 (the same once
+    normalized), the Dice coefficient of their trigrams"""
+    first, second = trigrams(first), trigrams(second)
+    if not first and not second:
+        return 1.0
+    return 2 * len(first & second) / (len(first) + len(second))
+
+
+class TitleIndex:
+    """The trigrams of each title in *titles*, a dict of paper id to title.
+    Those of titles also in a *previous* index are taken from it."""
+
+    def __init__(self, titles, previous=None):
+        self.papers = list(titles)
+        self.titles = [titles[paper] for paper in self.papers]
+        known = dict(zip(previous.titles, previous.trigrams)) if previous is not None else {}
+        self.trigrams = [known.get(title) or frozenset(trigrams(title)) for title in self.titles]
+        self.index = defaultdict(list)
+        for number, paper_trigrams in enumerate(self.trigrams):
+            for trigram in paper_trigrams:
+                self.index[trigram].append(number)
+
+    def best_matches(self, title, limit=3, min_similarity=MIN_SIMILARITY):
+        """(paper id, similarity) of the titles most like *title*, best first"""
+        title_trigrams = trigrams(title)
+        # only titles with one of its rarest trigrams are compared, a title
+        # alike enough to be the one meant nearly always has several of them,
+        # and common trigrams such as 'THE' are never looked up. Trigrams in
+        # no title, as a typo makes, would find nothing and are left out
+        known = [trigram for trigram in title_trigrams if trigram in self.index]
+        rarest = heapq.nsmallest(CANDIDATE_TRIGRAMS, known, key=lambda trigram: len(self.index[trigram]))
+        candidates = set()
+        for trigram in rarest:
+            candidates.update(self.index[trigram])
+
+        best = []
+        for number in candidates:
+            paper_trigrams = self.trigrams[number]
+            score = 2 * len(title_trigrams & paper_trigrams) / (len(title_trigrams) + len(paper_trigrams))
+            if score < min_similarity:
+                continue
+            if len(best) < limit:
+                heapq.heappush(best, (score, -number))
+            else:
+                heapq.heappushpop(best, (score, -number))
+        return [(self.papers[-number], score) for score, number in sorted(best, reverse=True)]
+
+    def best_match(self, title, min_similarity=MIN_SIMILARITY):
+        """(paper id, similarity) of the title most like *title*, or None"""
+        matches = self.best_matches(title, 1, min_similarity)
+        return matches[0] if matches else None
+
+
+def diff_spans(first, second):
+    """the two titles as lists of (text, changed) spans, changed when the
+    text isn't in the other title"""
+    first_spans, second_spans = [], []
+    for tag, i1, i2, j1, j2 in SequenceMatcher(None, first, second, autojunk=False).get_opcodes():
+        _add_span(first_spans, first[i1:i2], tag != 'equal')
+        _add_span(second_spans, second[j1:j2], tag != 'equal')
+    return first_spans, second_spans
+
+
+def _add_span(spans, text, changed):
+    if not text:
+        return
+    if spans and spans[-1][1] == changed:
+        spans[-1] = (spans[-1][0] + text, changed)
+    else:
+        spans.append((text, changed))
@@ -0,0 +1,15 @@
+"""Functions the web app runs in its validation worker processes, other than
+   validating documents, so that they don't need the web app to be imported
+   in the worker to be run there"""
+
+from jacowvalidator.docutils.styles import get_styles_cache_info
+from jacowvalidator.spms import AUTHOR_CACHE, REFERENCE_CACHE
+
+
+def get_validation_cache_info():
+    """hit and miss counts of the caches filled by validating documents, in
+    the validation worker this is run in"""
+    info = get_styles_cache_info()
+    info['authors'] = AUTHOR_CACHE.info()
+    info['references'] = REFERENCE_CACHE.info()
+    return info
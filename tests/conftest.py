@@ -0,0 +1,38 @@
+import pytest
+from docx import Document
+from docx.shared import Mm, Pt
+
+
+@pytest.fixture
+def make_paper():
+    """makes a paper with a title, authors, an abstract and some text, or with
+    *full* a heading, a table, two sections and references as well. It is
+    saved to *path* if one is given, the python-docx Document otherwise."""
+    def make(path=None, title='A Title', full=False, left_margin=None):
+        doc = Document()
+        if not full:
+            for text in [title, 'A. Author', 'Abstract', 'Some text.']:
+                doc.add_paragraph(text)
+        else:
+            doc.core_properties.language = 'en-GB'
+            # an empty paragraph before the title is skipped
+            doc.add_paragraph('')
+            doc.add_paragraph(title)
+            doc.add_paragraph('A. Author, Institute, Country')
+            doc.add_paragraph('Abstract')
+            doc.add_paragraph('INTRODUCTION', style='Heading 1')
+            p = doc.add_paragraph('Body text long enough to be counted as a paragraph, see Table 1 for details.')
+            p.paragraph_format.space_after = Pt(6)
+            doc.add_paragraph('Table 1: Some Results')
+            table = doc.add_table(rows=2, cols=2)
+            table.rows[1].cells[1].text = 'In a cell'
+            doc.add_section()
+            doc.add_paragraph('References')
+            doc.add_paragraph('[1]\tA reference')
+        if left_margin is not None:
+            doc.sections[0].left_margin = Mm(left_margin)
+        if path is None:
+            return doc
+        doc.save(str(path))
+
+    return make
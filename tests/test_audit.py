@@ -0,0 +1,33 @@
+from jacowvalidator.audit import ERROR, MISMATCH, MISSING, OK, ORPHAN, audit_papers, read_front_matter
+
+
+def test_read_front_matter(make_paper, tmp_path):
+    make_paper(tmp_path / 'MOPAB001.docx')
+    assert read_front_matter(str(tmp_path / 'MOPAB001.docx')) == ('MOPAB001', 'A Title', 'A. Author, ')
+
+
+def test_audit_unreadable_paper(tmp_path):
+    references = tmp_path / 'references.csv'
+    references.write_text('paper,title,authors\nMOPAB001,A Title,A. Author\n')
+    (tmp_path / 'MOPAB001.docx').write_bytes(b'not a docx')
+
+    rows = list(audit_papers([str(tmp_path / 'MOPAB001.docx')], str(references), processes=1))
+    assert [(row['paper_name'], row['status']) for row in rows] == [('MOPAB001', ERROR)], "not also an orphan"
+
+
+def test_audit(make_paper, tmp_path):
+    references = tmp_path / 'references.csv'
+    references.write_text(
+        'paper,title,authors\nMOPAB001,A Title,A. Author\nMOPAB002,A Title,A. Author\nMOPAB003,Not Sent,B. Author\n')
+    make_paper(tmp_path / 'MOPAB001.docx')
+    make_paper(tmp_path / 'MOPAB002.docx', title='Another Title')
+    make_paper(tmp_path / 'TUPAB001.docx')
+    (tmp_path / 'TUPAB002.docx').write_bytes(b'not a docx')
+    paths = [str(tmp_path / f'{name}.docx') for name in ['MOPAB001', 'MOPAB002', 'TUPAB001', 'TUPAB002']]
+
+    rows = list(audit_papers(paths, str(references), processes=1))
+    assert sorted((row['paper_name'], row['status']) for row in rows[:-1]) == [
+        ('MOPAB001', OK), ('MOPAB002', MISMATCH), ('TUPAB001', MISSING), ('TUPAB002', ERROR)]
+    assert (rows[-1]['paper_name'], rows[-1]['status']) == ('MOPAB003', ORPHAN), "papers without a document come last"
+    mismatch = next(row for row in rows if row['status'] == MISMATCH)
+    assert not mismatch['title_match'] and mismatch['authors_match']
@@ -1,5 +1,6 @@
 from jacowvalidator.docutils.authors import get_author_list
-from jacowvalidator.spms import normalize_author_name, get_first_last_only
+from jacowvalidator.spms import (
+    normalize_author_name, get_first_last_only, get_reference_catalog, get_author_list_report, remove_accented_chars)
 
 def test_normalize():
     author_name = 'E.-R. Olivas*'
@@ -7,6 +8,14 @@ def test_normalize():
     assert normed == 'E. R. Olivas'
 
 
+def test_accents_are_normalized():
+    assert normalize_author_name('C. Gómez-Martínez') == 'C. GomezMartinez'
+    assert normalize_author_name('S. Ødegård') == 'S. Odegard'
+    assert remove_accented_chars('Ł. Wałęsa') == 'L. Walesa'
+    report, authors_match = get_author_list_report('Y. Z. Gómez Martínez', 'Y.Z. Gomez Martinez')
+    assert authors_match and report[0]['exact'], "an accent should not stop authors matching"
+
+
 def test_first_initial_version_extraction():
     normalized_author_name = 'E. R. Olivas'
     first_last_only = get_first_last_only(normalized_author_name)
@@ -52,6 +61,47 @@ def test_linking_word_and_is_parsed():
     assert 'J. C. Huang' in list
     assert 'C. S. Hwang' in list
 
+
+def test_reference_catalog(tmp_path):
+    path = tmp_path / 'references.csv'
+    path.write_text('paper,title,authors\nMOPAB001,A  Title,A. Author and B.C. Other\nMOPAB001,Again,B. Author\n')
+    catalog = get_reference_catalog(str(path))
+    reference = catalog.get('MOPAB001')
+    assert reference.title == 'A TITLE', "the first row for a paper should be used"
+    assert reference.author_list == ['A. Author', 'B.C. Other']
+    assert catalog.get('MOPAB002') is None
+    assert get_reference_catalog(str(path)) is catalog, "the csv should only be read again when it changes"
+
+    path.write_text('paper,title,authors\nMOPAB002,Another Title,C. Author\n')
+    catalog = get_reference_catalog(str(path))
+    assert catalog.get('MOPAB001') is None
+    assert catalog.get('MOPAB002').title == 'ANOTHER TITLE'
+
+
+def test_author_list_report():
+    report, authors_match = get_author_list_report(
+        'T. X. Therou, A. Tiller, Y. Z. Smith, J. Smith, K. Mueller Schmidt',
+        'J. Smith, T. Therou, B. Tiller, Q. Missing, K. Muller Schmidt')
+    assert [(r['docx'], r['spms'], r['exact'], r['match']) for r in report] == [
+        ('J. Smith', 'J. Smith', True, True),
+        ('T. X. Therou', 'T. Therou', False, True),
+        ('K. Mueller Schmidt', 'K. Muller Schmidt', False, True),
+        ('', 'B. Tiller', False, False),
+        ('', 'Q. Missing', False, False),
+        ('A. Tiller', '', False, False),
+        ('Y. Z. Smith', '', False, False),
+    ], "exact matches, then loose matches, then misspelled surnames, then the unmatched"
+    assert not authors_match
+
+    report, authors_match = get_author_list_report('J. Smyth, A. B. Jonson', 'A. Johnson, J. Smith')
+    assert [(r['docx'], r['spms'], r['match']) for r in report] == [
+        ('A. B. Jonson', 'A. Johnson', True), ('J. Smyth', 'J. Smith', True)]
+    assert authors_match, "a surname a letter out is still a match, though not an exact one"
+
+    report, authors_match = get_author_list_report('A. Author, B. Author, A. Author', 'A. Author, A. Author, B. Author')
+    assert [r['docx'] for r in report] == ['A. Author', 'A. Author', 'B. Author']
+    assert authors_match
+
 #
 # def test_footnote_chars_removed():
 #     FOOTNOTE_SYMBOL_EXAMPLE = "J. C. Jan†, F. Y. Lin,"
@@ -0,0 +1,86 @@
+import threading
+import time
+import zipfile
+
+import pytest
+
+from jacowvalidator.batch import (
+    NoPapersError, PaperTooLargeError, TooManyEntriesError, check_archive, get_entries, hash_entry, iter_batch,
+    summarise, validate_entry)
+from jacowvalidator.reports import encode_report
+
+
+def make_archive(path, names, doc):
+    with zipfile.ZipFile(path, 'w') as archive:
+        for name in names:
+            with archive.open(name, 'w') as f:
+                doc.save(f)
+
+
+def test_entries(make_paper, tmp_path):
+    path = str(tmp_path / 'papers.zip')
+    names = ['MOPAB001.docx', 'papers/TUPAB002.DOCX', '__MACOSX/._MOPAB001.docx', '~$PAB003.docx', 'notes.txt']
+    make_archive(path, names, make_paper())
+    assert get_entries(path) == [('MOPAB001.docx', 'MOPAB001'), ('papers/TUPAB002.DOCX', 'TUPAB002')]
+    assert get_entries(path, max_papers=1) == [('MOPAB001.docx', 'MOPAB001')]
+
+    make_archive(path, ['notes.txt'], make_paper())
+    with pytest.raises(NoPapersError):
+        get_entries(path)
+
+
+def test_check_archive(make_paper, tmp_path):
+    path = str(tmp_path / 'papers.zip')
+    make_archive(path, ['MOPAB001.docx', 'MOPAB002.docx', 'notes.txt'], make_paper())
+    check_archive(path, max_entries=3)
+    with pytest.raises(TooManyEntriesError):
+        check_archive(path, max_entries=2)
+
+    (tmp_path / 'notes.zip').write_text('not a zip archive')
+    with pytest.raises(zipfile.BadZipFile):
+        check_archive(str(tmp_path / 'notes.zip'), max_entries=3)
+
+
+def test_validate_entry(monkeypatch, make_paper, tmp_path):
+    monkeypatch.delenv('URL_TO_JACOW_REFERENCES_CSV', raising=False)
+    path = str(tmp_path / 'papers.zip')
+    make_archive(path, ['MOPAB001.docx'], make_paper())
+    report = validate_entry(path, 'MOPAB001.docx', 'MOPAB001', checks=['Margins', 'Title'])
+    row = summarise(encode_report(report, 'MOPAB001'))
+    assert list(row['sections']) == ['Margins', 'Title']
+    assert row['title_match'] is None, "no SPMS check without a references csv"
+
+
+def test_entry_too_large(make_paper, tmp_path):
+    path = str(tmp_path / 'papers.zip')
+    make_archive(path, ['MOPAB001.docx'], make_paper())
+    size = zipfile.ZipFile(path).getinfo('MOPAB001.docx').file_size
+    assert hash_entry(path, 'MOPAB001.docx', max_size=size) == hash_entry(path, 'MOPAB001.docx')
+    with pytest.raises(PaperTooLargeError):
+        hash_entry(path, 'MOPAB001.docx', max_size=size - 1)
+    with pytest.raises(PaperTooLargeError):
+        validate_entry(path, 'MOPAB001.docx', 'MOPAB001', max_size=size - 1)
+
+
+def test_iter_batch_is_bounded():
+    running = []
+    most = []
+    lock = threading.Lock()
+
+    def check(name, paper_name):
+        with lock:
+            running.append(name)
+            most.append(len(running))
+        time.sleep(0.01)
+        with lock:
+            running.remove(name)
+        if paper_name == 'bad':
+            raise ValueError('not a docx')
+        return paper_name.upper()
+
+    entries = [(f'{name}.docx', name) for name in ['a', 'bad', 'c', 'd', 'e']]
+    results = list(iter_batch(entries, check, workers=2))
+    assert [(paper_name, result) for _, paper_name, result, _ in results] == [
+        ('a', 'A'), ('bad', None), ('c', 'C'), ('d', 'D'), ('e', 'E')], "results should be in archive order"
+    assert isinstance(results[1][3], ValueError)
+    assert max(most) <= 2, "no more than the workers should run at once"
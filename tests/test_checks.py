@@ -0,0 +1,55 @@
+import pytest
+
+from jacowvalidator.docutils import doc as doc_module
+from jacowvalidator.docutils.doc import (
+    CHECKS, UnknownCheckError, create_upload_variables, get_checks, parse_checks)
+
+
+def test_parse_checks():
+    assert parse_checks('margins, SPMS') == ['Margins', 'SPMS']
+    assert parse_checks('') is None, "nothing asked for means every check"
+    with pytest.raises(UnknownCheckError):
+        parse_checks('margins,colours')
+
+
+def test_dependencies_are_included_in_order():
+    assert [check.name for check in get_checks(['SPMS', 'Margins'])] == ['Margins', 'Title', 'Authors', 'SPMS']
+    assert [check.name for check in get_checks()] == list(CHECKS)
+
+
+def test_only_needed_checks_run(monkeypatch, make_paper):
+    monkeypatch.delenv('URL_TO_JACOW_REFERENCES_CSV', raising=False)
+
+    def not_called(doc):
+        raise AssertionError('check was not asked for')
+
+    monkeypatch.setattr(doc_module, 'parse_all_paragraphs', not_called)
+    summary = create_upload_variables(make_paper(), 'MOPAB001', checks=['Margins'])
+    assert list(summary) == ['Margins']
+    assert summary.title is None
+
+
+def test_all_checks_by_default(monkeypatch, make_paper):
+    monkeypatch.delenv('URL_TO_JACOW_REFERENCES_CSV', raising=False)
+    summary = create_upload_variables(make_paper(), 'MOPAB001')
+    assert list(summary) == [name for name in CHECKS if name != 'SPMS'], "SPMS only runs with a references csv"
+    assert summary.reference_csv_details is None
+    assert summary.title['text'] == 'A Title'
+
+
+def test_sections_are_worked_out_when_read(monkeypatch, make_paper):
+    monkeypatch.delenv('URL_TO_JACOW_REFERENCES_CSV', raising=False)
+    calls = []
+
+    def parse_all_paragraphs(doc):
+        calls.append(doc)
+        return []
+
+    monkeypatch.setattr(doc_module, 'parse_all_paragraphs', parse_all_paragraphs)
+    summary = create_upload_variables(make_paper(), 'MOPAB001')
+    assert summary['Margins']['ok'] is False
+    assert 'List' in summary
+    assert calls == [], "List section should not be worked out until it is read"
+    assert summary['List']['details'] == []
+    summary['List']
+    assert len(calls) == 1, "List section should be kept once worked out"
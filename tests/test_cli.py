@@ -0,0 +1,35 @@
+import csv
+import io
+import json
+
+from click.testing import CliRunner
+
+from jacowvalidator.cli import cli, find_papers
+
+
+def test_find_papers(tmp_path):
+    (tmp_path / 'b').mkdir()
+    for name in ['b/TUPAB002.docx', 'MOPAB001.docx', '~$PAB001.docx', 'notes.txt']:
+        (tmp_path / name).write_bytes(b'')
+    assert list(find_papers([str(tmp_path)])) == [
+        str(tmp_path / 'MOPAB001.docx'), str(tmp_path / 'b' / 'TUPAB002.docx')]
+
+
+def test_validate(monkeypatch, make_paper, tmp_path):
+    monkeypatch.delenv('URL_TO_JACOW_REFERENCES_CSV', raising=False)
+    make_paper(tmp_path / 'MOPAB001.docx')
+    runner = CliRunner()
+
+    result = runner.invoke(cli, ['validate', str(tmp_path), '--checks', 'margins', '--jobs', '1'])
+    rows = [json.loads(line) for line in result.output.splitlines()]
+    assert [row['paper_name'] for row in rows] == ['MOPAB001']
+    assert list(rows[0]['sections']) == ['Margins']
+    assert result.exit_code == (0 if rows[0]['ok'] else 1)
+
+    (tmp_path / 'MOPAB002.docx').write_bytes(b'not a docx')
+    result = runner.invoke(cli, ['validate', str(tmp_path), '--checks', 'margins', '--format', 'csv', '--jobs', '1'])
+    rows = list(csv.DictReader(io.StringIO(result.output)))
+    assert sorted(row['paper_name'] for row in rows) == ['MOPAB001', 'MOPAB002']
+    assert [row['error'] for row in rows if row['paper_name'] == 'MOPAB002'] == ['PackageNotFoundError: Package not found']
+    assert result.exit_code == 2, "a paper that couldn't be checked should exit with 2"
+
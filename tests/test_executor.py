@@ -0,0 +1,91 @@
+import os
+import signal
+import sys
+import time
+
+import pytest
+
+from jacowvalidator.executor import MB, DocumentTooComplexError, ValidationPool
+from jacowvalidator.worker import get_validation_cache_info
+
+
+def child_pid(value):
+    return os.getpid(), value
+
+
+def fail():
+    raise ValueError('not a docx')
+
+
+def use_memory(size):
+    return len(bytearray(size))
+
+
+def test_runs_in_child_process():
+    pool = ValidationPool(1)
+    pid, value = pool.run(child_pid, 'report')
+    assert value == 'report'
+    assert pid != os.getpid()
+
+    with pytest.raises(ValueError):
+        pool.run(fail)
+
+    pid, _ = ValidationPool(0).run(child_pid, 'report')
+    assert pid == os.getpid(), "no processes means running in this one"
+
+
+def test_time_limit():
+    pool = ValidationPool(1, time_limit=0.5)
+    start = time.monotonic()
+    with pytest.raises(DocumentTooComplexError):
+        pool.run(time.sleep, 10)
+    assert time.monotonic() - start < 5, "child should be stopped once over its time"
+    assert pool.run(child_pid, 'next')[1] == 'next', "pool should still work"
+
+
+def test_memory_limit():
+    pool = ValidationPool(1, memory_limit=50 * MB)
+    with pytest.raises(DocumentTooComplexError):
+        pool.run(use_memory, 500 * MB)
+    assert pool.run(use_memory, MB) == MB
+
+
+def stop_with(signum):
+    os.kill(os.getpid(), signum)
+    time.sleep(10)
+
+
+def test_reason_worker_stopped():
+    pool = ValidationPool(1)
+    # as the cpu time backstop and the kernel, out of memory, stop it
+    with pytest.raises(DocumentTooComplexError, match='processing time'):
+        pool.run(stop_with, signal.SIGXCPU)
+    with pytest.raises(DocumentTooComplexError, match='memory'):
+        pool.run(stop_with, signal.SIGKILL)
+    assert pool.run(child_pid, 'next')[1] == 'next'
+
+
+def count_runs():
+    global runs
+    runs = globals().get('runs', 0) + 1
+    return os.getpid(), runs
+
+
+def test_workers_are_kept():
+    pool = ValidationPool(1)
+    pid, _ = pool.run(count_runs)
+    assert pool.run(count_runs) == (pid, 2), "the same worker should be used, with what it has kept"
+
+    with pytest.raises(ValueError):
+        pool.run(fail)
+    assert pool.run(count_runs) == (pid, 3), "an exception shouldn't stop the worker"
+
+
+def web_app_loaded():
+    return 'jacowvalidator.routes' in sys.modules
+
+
+def test_workers_leave_out_the_web_app():
+    pool = ValidationPool(1)
+    assert not pool.run(web_app_loaded), "a worker shouldn't set up the routes, their pool and job queue"
+    assert set(pool.run(get_validation_cache_info)) == {'resolved_styles', 'jacow_styles', 'authors', 'references'}
@@ -0,0 +1,131 @@
+from docx.enum.style import WD_STYLE_TYPE
+from docx.enum.text import WD_ALIGN_PARAGRAPH
+from docx.oxml import parse_xml
+from docx.shared import Pt
+
+from jacowvalidator.docutils.formatting import ResolvedStyles, get_style_details, DEFAULT_FONT_SIZE
+from jacowvalidator.docutils.index import index_document
+from jacowvalidator.docutils.styles import StyleRule, check_style, check_styles
+
+
+def add_styles(doc):
+    styles = doc.styles
+    grandparent = styles.add_style('Grandparent', WD_STYLE_TYPE.PARAGRAPH)
+    grandparent.font.size = Pt(14)
+    grandparent.paragraph_format.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    parent = styles.add_style('Parent', WD_STYLE_TYPE.PARAGRAPH)
+    parent.base_style = grandparent
+    parent.font.bold = True
+    child = styles.add_style('Child', WD_STYLE_TYPE.PARAGRAPH)
+    child.base_style = parent
+    child.paragraph_format.space_before = Pt(6)
+    return doc
+
+
+def test_full_based_on_chain(make_paper):
+    doc = add_styles(make_paper())
+    resolved = ResolvedStyles(doc.styles.element)
+
+    child = resolved.paragraph(doc.styles['Child'].style_id)
+    assert child['name'] == 'Child'
+    assert child['font_size'] == 14.0, "font size should come from two styles up the chain"
+    assert child['alignment'] == 'CENTER'
+    assert child['bold'] is True
+    assert child['space_before'] == 6.0
+
+
+def test_unknown_style_is_default(make_paper):
+    resolved = ResolvedStyles(add_styles(make_paper()).styles.element)
+    assert resolved.paragraph('NoSuchStyle')['name'] == 'Normal'
+    assert resolved.paragraph(None)['name'] == 'Normal'
+
+
+def test_doc_defaults():
+    styles = parse_xml(
+        '<w:styles xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+        '<w:docDefaults><w:rPrDefault><w:rPr><w:sz w:val="18"/></w:rPr></w:rPrDefault>'
+        '<w:pPrDefault><w:pPr><w:spacing w:after="60"/></w:pPr></w:pPrDefault></w:docDefaults>'
+        '<w:style w:type="paragraph" w:default="1" w:styleId="Normal"><w:name w:val="Normal"/></w:style>'
+        '</w:styles>')
+    resolved = ResolvedStyles(styles)
+    assert resolved.paragraph('Normal')['font_size'] == 9.0
+    assert resolved.paragraph('Normal')['space_after'] == 3.0
+
+    empty = ResolvedStyles(parse_xml(
+        '<w:styles xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"/>'))
+    p = parse_xml('<w:p xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"/>')
+    assert get_style_details(p, empty)['font_size'] == DEFAULT_FONT_SIZE
+
+
+def test_local_overrides(make_paper):
+    doc = add_styles(make_paper())
+    p = doc.add_paragraph('Some text', style='Child')
+    p.paragraph_format.space_before = Pt(3)
+    p.runs[0].font.size = Pt(9)
+    index = index_document(doc)
+
+    style_ok, detail = check_style(index.paragraphs[-1], StyleRule({'font_size': 9.0, 'space_before': 3.0, 'bold': True}))
+    assert style_ok, detail
+
+
+def test_style_rule(make_paper):
+    doc = add_styles(make_paper())
+    doc.add_paragraph('Some text', style='Child')
+    doc.add_paragraph('More text', style='Grandparent')
+    p, unspaced = index_document(doc).paragraphs[-2:]
+
+    rule = StyleRule({'styles': {'jacow': 'Child'}, 'space_before': ['>=', 3.0], 'italic': True})
+    style_ok, detail = check_style(p, rule)
+    assert style_ok is False
+    assert detail['space_before'] == 6.0
+    assert detail['italic'] == 'None should be True'
+    assert detail['font_size'] == 'NA', "formatting not in the rule is not applicable"
+    assert detail['all_caps'] is None, "all caps is always shown"
+
+    style_ok, detail = check_style(p, StyleRule({'space_before': ['<', 3.0]}))
+    assert detail['space_before'] == '6.0 should be < 3.0'
+
+    style_ok, detail = check_style(unspaced, StyleRule({'space_before': 0.0}))
+    assert style_ok, "no spacing set meets a spacing of 0"
+
+
+def test_check_styles(monkeypatch, make_paper):
+    doc = add_styles(make_paper())
+    for text in ['One', 'Two', 'Three']:
+        doc.add_paragraph(text, style='Child')
+    doc.add_paragraph('Four', style='Grandparent')
+    paragraphs = index_document(doc).paragraphs[-4:]
+    rule = StyleRule({'space_before': ['>=', 3.0], 'italic': True})
+    other = StyleRule({'space_before': 0.0})
+    checks = [(p, rule) for p in paragraphs] + [(paragraphs[0], other)]
+    expected = [check_style(p, r) for p, r in checks]
+
+    calls = []
+    evaluate = StyleRule.evaluate
+    monkeypatch.setattr(StyleRule, 'evaluate', lambda self, detail: calls.append(self) or evaluate(self, detail))
+    checked = check_styles(checks)
+    assert len(calls) == 3, "rule should be evaluated once for each distinct formatting"
+    assert checked == expected, "results should match checking each paragraph on its own"
+
+
+def test_same_styles_are_resolved_once(make_paper):
+    from jacowvalidator.docutils.formatting import STYLES_CACHE
+    from jacowvalidator.docutils.styles import JACOW_STYLES_CACHE, check_jacow_styles
+
+    doc = add_styles(make_paper())
+    first = index_document(doc)
+    hits = STYLES_CACHE.hits
+    second = index_document(doc)
+    assert second.styles is first.styles, "documents with the same styles.xml should share the resolved styles"
+    assert STYLES_CACHE.hits == hits + 1
+
+    result = check_jacow_styles(first)
+    result[0]['style_ok'] = 'changed'
+    hits = JACOW_STYLES_CACHE.hits
+    assert check_jacow_styles(second)[0]['style_ok'] is False, "cached result should not be changed by the caller"
+    assert JACOW_STYLES_CACHE.hits == hits + 1
+
+    doc.styles.add_style('JACoW_Paper Title', WD_STYLE_TYPE.PARAGRAPH)
+    third = index_document(doc)
+    assert third.styles is not first.styles, "changed styles.xml should be resolved again"
+    assert {'style': 'JACoW_Paper Title', 'style_ok': True} in check_jacow_styles(third)
@@ -0,0 +1,35 @@
+from jacowvalidator.docutils.index import index_document, get_index
+from jacowvalidator.docutils.heading import get_headings
+from jacowvalidator.docutils.paragraph import get_paragraphs
+
+
+def test_boundaries(make_paper):
+    index = index_document(make_paper(full=True))
+
+    assert len(index.paragraphs) == 10
+    assert index.title_index == 1
+    assert index.abstract_index == 3
+    assert index.references_index == 8
+    assert [p.text for p in index.front_matter()] == ['A. Author, Institute, Country']
+    assert [p.index for p in index.main_text()] == [4, 5, 6, 7]
+
+
+def test_tables(make_paper):
+    index = index_document(make_paper(full=True))
+
+    assert len(index.tables) == 1
+    table = index.tables[0]
+    assert table.title.index == 6, "table title should be the paragraph before the table"
+    assert (table.rows, table.columns, table.floating) == (2, 2, False)
+    cell = [p for p in index.table_paragraphs if p.text]
+    assert len(cell) == 1 and cell[0].location == (1, 2, 2)
+    assert not any(p.in_table for p in index.paragraphs)
+
+
+def test_checkers_accept_index(make_paper):
+    doc = make_paper(full=True)
+    index = index_document(doc)
+
+    assert get_index(index) is index
+    assert get_paragraphs(index) == get_paragraphs(doc)
+    assert get_headings(index) == get_headings(doc)
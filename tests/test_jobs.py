@@ -0,0 +1,79 @@
+import time
+
+import pytest
+
+from jacowvalidator.jobs import (
+    DONE, FAILED, QUEUED, RUNNING, JobNotFoundError, JobQueue, SQLiteJobQueue, UnknownQueueBackendError,
+    create_job_queue, run_next_job, wait_for_job)
+
+
+def test_job_runs_once(tmp_path):
+    queue = create_job_queue('sqlite', str(tmp_path / 'jobs.db'))
+    first = queue.submit('MOPAB001.docx', 'MOPAB001', ['Margins'], b'first')
+    second = queue.submit('MOPAB002.docx', 'MOPAB002', None, b'second')
+    assert queue.get(first).status == QUEUED
+    assert queue.get(first).upload is None, "uploaded bytes are only read by the worker"
+
+    job = queue.claim()
+    assert job.id == first, "oldest job should be run first"
+    assert job.upload == b'first' and job.checks == ['Margins']
+    assert queue.get(first).status == RUNNING
+    assert queue.claim().id == second, "a running job should not be claimed again"
+    assert queue.claim() is None
+
+    queue.finish(first, {'summary': {}})
+    assert queue.get(first).status == DONE
+    assert queue.get(first).result == {'summary': {}}
+
+    with pytest.raises(JobNotFoundError):
+        queue.get('missing')
+
+
+def test_failed_job(tmp_path):
+    queue = create_job_queue('sqlite', str(tmp_path / 'jobs.db'))
+    job_id = queue.submit('MOPAB001.docx', 'MOPAB001', None, b'not a docx')
+
+    def handler(job):
+        raise ValueError(f"Failed to open document {job.filename}")
+
+    assert run_next_job(queue, handler)
+    job = wait_for_job(queue, job_id, 0)
+    assert job.status == FAILED
+    assert job.error == 'Failed to open document MOPAB001.docx'
+    assert not run_next_job(queue, handler), "nothing left to run"
+
+
+def test_interrupted_job_fails(tmp_path):
+    queue = create_job_queue('sqlite', str(tmp_path / 'jobs.db'), timeout=0)
+    job_id = queue.submit('MOPAB001.docx', 'MOPAB001', None, b'bytes')
+    queue.claim()
+    time.sleep(0.01)
+    # the worker running it was killed, the next claim gives up on it
+    assert queue.claim() is None
+    assert queue.get(job_id).status == FAILED
+
+
+def test_sections_as_they_are_ready(tmp_path):
+    queue = create_job_queue('sqlite', str(tmp_path / 'jobs.db'))
+    job_id = queue.submit('MOPAB001.docx', 'MOPAB001', None, b'bytes')
+    other_id = queue.submit('MOPAB002.docx', 'MOPAB002', None, b'bytes')
+    assert queue.get_sections(job_id) == []
+
+    queue.add_section(job_id, 'Styles', {'ok': True})
+    queue.add_section(other_id, 'Styles', {'ok': False})
+    queue.add_section(job_id, 'Margins', {'ok': False})
+    assert queue.get_sections(job_id) == [(1, 'Styles', {'ok': True}), (2, 'Margins', {'ok': False})]
+    assert queue.get_sections(job_id, after=1) == [(2, 'Margins', {'ok': False})], "only sections not yet seen"
+
+
+def test_unknown_backend():
+    with pytest.raises(UnknownQueueBackendError):
+        create_job_queue('carrier-pigeon')
+
+
+def test_incomplete_backend():
+    class NoSections(JobQueue):
+        submit = claim = finish = fail = get = add_section = SQLiteJobQueue.submit
+
+    with pytest.raises(TypeError):
+        NoSections()
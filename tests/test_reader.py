@@ -0,0 +1,74 @@
+from io import BytesIO
+import pytest
+from docx.opc.exceptions import PackageNotFoundError
+from docx.shared import Mm
+
+from jacowvalidator.docutils.index import index_document
+from jacowvalidator.docutils.reader import DocxReader, index_docx
+from jacowvalidator.docutils.heading import get_headings
+from jacowvalidator.docutils.languages import get_language_tags
+from jacowvalidator.docutils.margins import check_sections
+from jacowvalidator.docutils.paragraph import get_paragraphs
+from jacowvalidator.docutils.tables import check_table_titles
+
+
+def save(doc):
+    f = BytesIO()
+    doc.save(f)
+    f.seek(0)
+    return f
+
+
+def test_stream_matches_document(make_paper):
+    doc = make_paper(full=True)
+    index = index_document(doc)
+    streamed = index_docx(save(doc))
+
+    assert [p.text for p in streamed.paragraphs] == [p.text for p in index.paragraphs]
+    assert [p.style for p in streamed.paragraphs] == [p.style for p in index.paragraphs]
+    assert (streamed.title_index, streamed.abstract_index, streamed.references_index) == \
+        (index.title_index, index.abstract_index, index.references_index)
+    assert streamed.style_names == index.style_names
+    assert streamed.core_properties.language == 'en-GB'
+
+    assert len(streamed.sections) == 2
+    assert check_sections(streamed) == check_sections(index)
+    assert get_language_tags(streamed) == get_language_tags(index)
+    assert get_headings(streamed) == get_headings(index)
+    assert get_paragraphs(streamed) == get_paragraphs(index)
+    assert check_table_titles(streamed) == check_table_titles(index)
+
+
+def test_stream_frees_xml(make_paper):
+    streamed = index_docx(save(make_paper(full=True)))
+    assert all(p.element is None for p in streamed.paragraphs)
+    assert all(p.element is None for p in streamed.table_paragraphs)
+
+
+def test_not_a_docx():
+    with pytest.raises(PackageNotFoundError):
+        index_docx(BytesIO(b'not a zip file'))
+
+
+def test_sections_only(make_paper):
+    doc = make_paper(full=True)
+    index = index_docx(save(doc), body=False)
+    assert index.paragraphs == []
+    assert check_sections(index) == check_sections(index_document(doc))
+
+
+def test_fingerprints(make_paper):
+    doc = make_paper(full=True)
+    with DocxReader(save(doc)) as reader:
+        before = reader.fingerprints()
+
+    doc.sections[-1].left_margin = Mm(25)
+    with DocxReader(save(doc)) as reader:
+        after = reader.fingerprints()
+    assert after['sections'] != before['sections']
+    assert after['body'] == before['body'], "margins are not part of the body"
+    assert after['styles'] == before['styles']
+
+    doc.add_paragraph('More text')
+    with DocxReader(save(doc)) as reader:
+        assert reader.fingerprints()['body'] != after['body']
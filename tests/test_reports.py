@@ -0,0 +1,155 @@
+import datetime
+import io
+import json
+import pickle
+
+from jacowvalidator import reports as reports_module
+from jacowvalidator.docutils import doc as doc_module
+from jacowvalidator.docutils.reader import DocxReader
+from jacowvalidator.reports import ReportCache, build_report, dump_report, encode_report, hash_upload, iter_report
+
+
+def test_hash_upload_rewinds():
+    stream = io.BytesIO(b'same bytes')
+    digest = hash_upload(stream)
+    assert stream.tell() == 0, "stream should be left where it was"
+    assert digest == hash_upload(io.BytesIO(b'same bytes'))
+    assert digest != hash_upload(io.BytesIO(b'other bytes'))
+
+
+def test_report_key(monkeypatch, tmp_path):
+    cache = ReportCache(version='1')
+    key = cache.key('abc', 'MOPAB001')
+    assert key == ReportCache(version='1').key('abc', 'MOPAB001')
+    assert key != cache.key('abc', 'MOPAB002'), "paper name is part of the key"
+    assert key != ReportCache(version='2').key('abc', 'MOPAB001'), "validator version is part of the key"
+
+    csv = tmp_path / 'references.csv'
+    csv.write_text('paper,title,authors\n')
+    monkeypatch.setenv('URL_TO_JACOW_REFERENCES_CSV', 'http://example.org/references.csv')
+    monkeypatch.setenv('PATH_TO_JACOW_REFERENCES_CSV', str(csv))
+    with_csv = cache.key('abc', 'MOPAB001')
+    assert with_csv != key
+    csv.write_text('paper,title,authors\nMOPAB001,A Title,A. Author\n')
+    assert cache.key('abc', 'MOPAB001') != with_csv, "changing the csv should change the key"
+
+
+def test_disk_tier_is_shared(tmp_path):
+    report = {
+        'summary': {'Styles': {'ok': True}, 'Figures': {'details': {1: [('Fig. 1', True)]}}},
+        'title': {'text': 'A Title'},
+        'metadata': {'created': datetime.datetime(2019, 5, 19, 9, 30)},
+    }
+    first = ReportCache(str(tmp_path), version='1')
+    first.put('key', report)
+
+    # another worker process sees the report written by the first
+    second = ReportCache(str(tmp_path), version='1')
+    assert second.get('key') == report
+    assert second.info()['disk_hits'] == 1
+    assert second.get('key') == report
+    assert second.info()['hits'] == 1, "second read should come from memory"
+    assert second.get('missing') is None
+
+
+def test_disk_tier_is_bounded(tmp_path):
+    cache = ReportCache(str(tmp_path), maxsize=0, disk_maxsize=2, version='1')
+    for key in ['a', 'b', 'c']:
+        cache.put(key, {'key': key})
+    assert cache.info()['disk_size'] == 2
+
+
+def test_broken_report_is_a_miss(tmp_path):
+    (tmp_path / 'key.json').write_bytes(pickle.dumps({'summary': {}}))
+    cache = ReportCache(str(tmp_path), version='1')
+    assert cache.get('key') is None, "reports are only read from json"
+    assert not (tmp_path / 'key.json').exists(), "broken report should be removed"
+
+
+def test_revised_upload_reuses_unchanged_sections(monkeypatch, make_paper, tmp_path):
+    monkeypatch.delenv('URL_TO_JACOW_REFERENCES_CSV', raising=False)
+    make_paper(tmp_path / 'first.docx', left_margin=20)
+    make_paper(tmp_path / 'second.docx', left_margin=25)
+    first = build_report(str(tmp_path / 'first.docx'), 'MOPAB001')
+    expected = build_report(str(tmp_path / 'second.docx'), 'MOPAB001')
+
+    def not_called(doc):
+        raise AssertionError('unchanged section was worked out again')
+
+    monkeypatch.setattr(doc_module, 'parse_all_paragraphs', not_called)
+    revised = build_report(str(tmp_path / 'second.docx'), 'MOPAB001', previous=first)
+    assert revised['summary'] == expected['summary'], "reused sections should match a full run"
+    assert revised['summary']['Margins'] != first['summary']['Margins']
+
+
+def test_sections_come_as_they_are_ready(monkeypatch, make_paper, tmp_path):
+    monkeypatch.delenv('URL_TO_JACOW_REFERENCES_CSV', raising=False)
+    make_paper(tmp_path / 'paper.docx')
+    expected = build_report(str(tmp_path / 'paper.docx'), 'MOPAB001')
+
+    reads = []
+    read_index = reports_module.read_index
+    monkeypatch.setattr(reports_module, 'read_index', lambda reader, body: reads.append(body) or read_index(reader, body))
+    parses = []
+    open_document = DocxReader._open_document
+    monkeypatch.setattr(DocxReader, '_open_document', lambda reader: parses.append(1) or open_document(reader))
+    items = iter_report(str(tmp_path / 'paper.docx'), 'MOPAB001')
+    assert next(items)[0] == 'Styles'
+    assert next(items)[0] == 'Margins'
+    assert reads == [False], "sections that don't need the body come before it is read"
+    assert len(parses) == 1, "the fingerprints and sections should come from one pass"
+
+    rest = list(items)
+    assert reads == [False, True]
+    assert len(parses) == 2
+    assert [name for name, _ in rest[:-1]] == list(expected['summary'])[2:]
+    assert rest[-1] == (None, expected)
+
+
+def test_unrequested_sections_are_not_worked_out(monkeypatch, make_paper, tmp_path):
+    csv = tmp_path / 'references.csv'
+    csv.write_text('paper,title,authors\nMOPAB001,A Title,A. Author\n')
+    monkeypatch.setenv('URL_TO_JACOW_REFERENCES_CSV', 'http://example.org/references.csv')
+    monkeypatch.setenv('PATH_TO_JACOW_REFERENCES_CSV', str(csv))
+    built = []
+    for name, check in list(doc_module.CHECKS.items()):
+        def build(doc, context, name=name, check=check):
+            built.append(name)
+            return check.build(doc, context)
+        monkeypatch.setitem(doc_module.CHECKS, name, check._replace(build=build))
+    spms_checks = []
+    reference_csv_check = doc_module.reference_csv_check
+    monkeypatch.setattr(doc_module, 'reference_csv_check', lambda *args: spms_checks.append(args) or reference_csv_check(*args))
+    make_paper(tmp_path / 'paper.docx')
+
+    report = build_report(str(tmp_path / 'paper.docx'), 'MOPAB001', checks=['Margins', 'SPMS'])
+    assert list(report['summary']) == ['Margins', 'SPMS'], "the sections SPMS needs are not shown"
+    assert sorted(built) == ['Authors', 'Margins', 'SPMS', 'Title'], "only the checks asked for and what they need"
+    assert report['reference_csv_details']['title']['match']
+
+    # only the SPMS row changed, so the SPMS section is worked out before
+    # the body is read, and is then kept rather than compared again
+    report = build_report(str(tmp_path / 'paper.docx'), 'MOPAB001')
+    built.clear()
+    spms_checks.clear()
+    csv.write_text('paper,title,authors\nMOPAB001,A Title,B. Author\n')
+    report = build_report(str(tmp_path / 'paper.docx'), 'MOPAB001', previous=report)
+    assert built == ['SPMS'] and len(spms_checks) == 1
+    assert not report['reference_csv_details']['author']['match']
+
+
+def test_encode_report(monkeypatch, make_paper, tmp_path):
+    monkeypatch.delenv('URL_TO_JACOW_REFERENCES_CSV', raising=False)
+    make_paper(tmp_path / 'paper.docx')
+    report = build_report(str(tmp_path / 'paper.docx'), 'MOPAB001', checks=['Margins', 'Title'])
+
+    encoded = json.loads(dump_report(encode_report(report, 'MOPAB001')))
+    assert list(encoded['sections']) == ['Margins', 'Title']
+    assert set(encoded['sections']['Title']) == {'title', 'ok', 'message', 'anchor', 'details'}
+    assert 'text' not in encoded['sections']['Title']['details'][0], "text is only sent when verbose"
+    assert encoded['ok'] is False
+    assert encoded['metadata']['created'] is not None
+
+    verbose = encode_report(report, 'MOPAB001', verbose=True)
+    assert verbose['sections']['Title']['details'][0]['text'] == 'A Title'
+    assert 'rules' in verbose['sections']['Title']
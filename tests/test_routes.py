@@ -0,0 +1,79 @@
+import io
+import zipfile
+
+import pytest
+
+from jacowvalidator import app, routes
+from jacowvalidator.executor import ValidationPool
+from jacowvalidator.reports import ReportCache
+
+
+@pytest.fixture
+def client(monkeypatch):
+    # validated within the request, with nothing kept between tests
+    monkeypatch.setattr(routes, 'job_queue', None)
+    monkeypatch.setattr(routes, 'validation_pool', ValidationPool(0))
+    monkeypatch.setattr(routes, 'report_cache', ReportCache(version='test'))
+    monkeypatch.delenv('URL_TO_JACOW_REFERENCES_CSV', raising=False)
+    monkeypatch.delenv('PATH_TO_JACOW_CONFERENCES', raising=False)
+    return app.test_client()
+
+
+def test_upload_form_keeps_checks(client, make_paper, tmp_path):
+    page = client.get('/upload?checks=margins').get_data(as_text=True)
+    assert 'name="checks" value="margins"' in page, "the form should send the checks asked for"
+
+    make_paper(tmp_path / 'MOPAB001.docx')
+    # the action the page's script sets once a file is chosen, and then the
+    # documented url
+    for url, fields in [('/upload?filename=MOPAB001.docx', {'checks': 'margins'}), ('/upload?checks=margins', {})]:
+        with open(tmp_path / 'MOPAB001.docx', 'rb') as f:
+            response = client.post(url, data=dict(fields, document=(f, 'MOPAB001.docx')))
+        page = response.get_data(as_text=True)
+        assert response.status_code == 200
+        assert 'name="pagesize"' in page
+        assert 'name="title"' not in page and 'name="styles"' not in page, "only the margins should be checked"
+        assert 'name="checks" value="margins"' in page, "the next upload should check the same"
+
+
+def test_batch_link_needs_job_queue(client, monkeypatch):
+    assert 'id="batch"' not in client.get('/upload').get_data(as_text=True), "/batch is not found without a queue"
+    assert client.get('/batch').status_code == 404
+
+    monkeypatch.setattr(routes, 'job_queue', object())
+    assert 'id="batch"' in client.get('/upload').get_data(as_text=True)
+
+
+def test_upload_without_conference(client, make_paper, monkeypatch, tmp_path):
+    # only the conferences' references, no references csv of its own
+    (tmp_path / 'conferences').mkdir()
+    (tmp_path / 'conferences' / 'IPAC21.csv').write_text('paper,title,authors\nMOPAB001,A TITLE,D. Author\n')
+    monkeypatch.setenv('PATH_TO_JACOW_CONFERENCES', str(tmp_path / 'conferences'))
+
+    make_paper(tmp_path / 'MOPAB001.docx')
+    for fields, chosen in [({}, False), ({'conference': 'IPAC21'}, True)]:
+        with open(tmp_path / 'MOPAB001.docx', 'rb') as f:
+            response = client.post('/upload', data=dict(fields, document=(f, 'MOPAB001.docx')))
+        page = response.get_data(as_text=True)
+        assert response.status_code == 200, "the rest of the report is still shown"
+        assert 'name="spms"' in page
+        assert ('Choose the conference the paper is for' not in page) == chosen
+
+
+def test_batch_upload_limits(client, monkeypatch, tmp_path):
+    monkeypatch.setattr(routes, 'job_queue', object())
+    monkeypatch.setitem(app.config, 'BATCH_DIR', str(tmp_path))
+    monkeypatch.setitem(app.config, 'BATCH_MAX_ENTRIES', 2)
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, 'w') as f:
+        for name in ['MOPAB001.docx', 'MOPAB002.docx', 'MOPAB003.docx']:
+            f.writestr(name, b'')
+
+    response = client.post('/batch', data={'archive': (io.BytesIO(archive.getvalue()), 'papers.zip')})
+    assert 'at most 2 can be checked' in response.get_data(as_text=True)
+    assert not list(tmp_path.iterdir()), "the archive shouldn't be kept"
+
+    monkeypatch.setitem(app.config, 'MAX_CONTENT_LENGTH', 1000)
+    response = client.post('/batch', data={'archive': (io.BytesIO(b'0' * 2000), 'papers.zip')})
+    assert response.status_code == 413
+    assert 'The zip archive is too large' in response.get_data(as_text=True)
@@ -0,0 +1,141 @@
+import os
+
+import pytest
+
+from jacowvalidator import spms
+from jacowvalidator.spms import (
+    PaperNotFoundError, UnknownConferenceError, get_conference_path, get_conferences, get_reference_catalog,
+    get_reference_csv_version, get_shared_catalog, qualify_paper_name, reference_csv_check, resolve_paper_name)
+from jacowvalidator.spms_index import edit_distance, get_spms_index, update_spms_index
+
+REFERENCES = '''paper,title,authors
+THPMK148,HIGH GRADIENT TESTS OF A NOVEL X-BAND CAVITY,"A. Author, B. Author"
+THPMK149,BEAM DYNAMICS IN THE STORAGE RING,C. Author
+MOPAB001,COMMISSIONING OF THE LINAC,D. Author
+'''
+
+
+@pytest.fixture
+def references(tmp_path):
+    path = tmp_path / 'references.csv'
+    path.write_text(REFERENCES)
+    return str(path)
+
+
+def test_lookups(references):
+    index = get_spms_index(references)
+    assert os.path.isfile(os.path.splitext(references)[0] + '.sqlite3')
+    assert index.get('thpmk148')[0] == 'THPMK148'
+    assert index.get('THPMK150') is None
+    assert [paper for paper, _, _ in index.find_by_prefix('THPMK')] == ['THPMK148', 'THPMK149']
+    assert [paper for paper, _, _ in index.find_similar('THPMK184')] == ['THPMK148', 'THPMK149']
+    assert index.search('High-gradient tests of a novel X band cavity')[0][0] == 'THPMK148', "best match first"
+    assert get_spms_index(references) is index, "the database should only be built again when the csv changes"
+
+
+def test_suggest(references):
+    index = get_spms_index(references)
+    assert index.suggest('thpmk148') == ['THPMK148']
+    assert index.suggest('THPMK148_v2') == ['THPMK148']
+    assert index.suggest('MOPAB001_1') == ['MOPAB001']
+    assert index.suggest('paper', 'Commissioning of the Linac') == ['MOPAB001']
+    assert index.suggest('ZZZZZ') == []
+
+
+def test_not_found_suggests_papers(monkeypatch, references):
+    monkeypatch.setenv('PATH_TO_JACOW_REFERENCES_CSV', references)
+    monkeypatch.delenv('SPMS_DEBUG', raising=False)
+    with pytest.raises(PaperNotFoundError) as err:
+        reference_csv_check('THPMK148_v2', 'HIGH GRADIENT TESTS OF A NOVEL X-BAND CAVITY', 'A. Author')
+    assert err.value.suggestions == ['THPMK148']
+
+
+def refresh(path, text):
+    # the new download, with a later modified time
+    stat = os.stat(path)
+    with open(path, 'w') as f:
+        f.write(text)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000000))
+
+
+def test_update_index(references):
+    index = get_spms_index(references)
+    refresh(references, REFERENCES
+            .replace('BEAM DYNAMICS', 'LATTICE DESIGN')
+            .replace('MOPAB001,COMMISSIONING OF THE LINAC,D. Author\n', 'TUPAB002,UNDULATOR TAPERING,E. Author\n'))
+    db_path = os.path.splitext(references)[0] + '.sqlite3'
+    assert update_spms_index(references, db_path) == {'THPMK149', 'MOPAB001', 'TUPAB002'}
+    assert update_spms_index(references, db_path) == set(), "already up to date"
+
+    index = get_spms_index(references)
+    assert index.get('THPMK149')[1] == 'LATTICE DESIGN IN THE STORAGE RING'
+    assert index.get('MOPAB001') is None
+    assert index.suggest('paper', 'Undulator tapering') == ['TUPAB002']
+    assert index.search('lattice design')[0][0] == 'THPMK149'
+    assert index.search('beam dynamics') == []
+    assert [paper for paper, _, _ in index.find_similar('TUPAB02')] == ['TUPAB002']
+
+
+def test_refresh_only_changes_papers_that_changed(monkeypatch, references):
+    monkeypatch.setenv('URL_TO_JACOW_REFERENCES_CSV', 'https://example.org/references.csv')
+    monkeypatch.setenv('PATH_TO_JACOW_REFERENCES_CSV', references)
+    monkeypatch.delenv('PATH_TO_JACOW_CONFERENCES', raising=False)
+    catalog = get_reference_catalog(references)
+    versions = {paper: get_reference_csv_version(paper) for paper in ['THPMK148', 'THPMK149', 'MOPAB002']}
+    refresh(references, REFERENCES.replace('C. Author', '"C. Author, F. Author"'))
+
+    assert get_reference_csv_version('THPMK148') == versions['THPMK148'], "reports for other papers are kept"
+    assert get_reference_csv_version('MOPAB002') == versions['MOPAB002']
+    assert get_reference_csv_version('THPMK149') != versions['THPMK149']
+    refreshed = get_reference_catalog(references)
+    assert refreshed.get('THPMK148') is catalog.get('THPMK148'), "unchanged papers should be reused"
+    assert refreshed.get('THPMK149').authors == 'C. Author, F. Author'
+
+
+def test_edit_distance():
+    assert edit_distance('THPMK148', 'THPMK148') == 0
+    assert edit_distance('THPMK148', 'THPMK184') == 2
+    assert edit_distance('THPMK148', 'THPMK14') == 1
+
+
+def test_conferences(monkeypatch, tmp_path):
+    (tmp_path / 'IPAC21.csv').write_text(REFERENCES)
+    (tmp_path / 'linac22.csv').write_text(REFERENCES.replace('COMMISSIONING', 'DECOMMISSIONING'))
+    monkeypatch.setenv('PATH_TO_JACOW_CONFERENCES', str(tmp_path))
+    monkeypatch.delenv('PATH_TO_JACOW_REFERENCES_CSV', raising=False)
+    monkeypatch.delenv('SPMS_DEBUG', raising=False)
+    assert list(get_conferences()) == ['IPAC21', 'LINAC22']
+    assert resolve_paper_name('ipac21-MOPAB001') == (str(tmp_path / 'IPAC21.csv'), 'MOPAB001')
+    assert resolve_paper_name('MOPAB001_v2') == (None, 'MOPAB001_v2'), "not a conference code"
+
+    result = reference_csv_check(qualify_paper_name('ipac21', 'MOPAB001'), 'COMMISSIONING OF THE LINAC', 'D. Author')
+    assert result['title']['match'] and result['author']['match']
+    result = reference_csv_check('LINAC22_MOPAB001', 'COMMISSIONING OF THE LINAC', 'D. Author')
+    assert not result['title']['match'], "each conference has its own references"
+    assert os.path.isfile(tmp_path / 'linac22.sqlite3'), "conferences are read from their databases"
+
+    with pytest.raises(PaperNotFoundError) as err:
+        reference_csv_check('IPAC21_MOPAB002', 'Commissioning of the linac', 'D. Author')
+    assert err.value.suggestions[0] == 'MOPAB001'
+    with pytest.raises(UnknownConferenceError):
+        get_conference_path('FEL19')
+
+
+def test_shared_catalog_keeps_references(monkeypatch, tmp_path):
+    path = tmp_path / 'IPAC21.csv'
+    path.write_text(REFERENCES)
+    made = []
+    make_reference = spms.make_reference
+    monkeypatch.setattr(spms, 'make_reference', lambda *row: made.append(row[0]) or make_reference(*row))
+    spms.REFERENCE_CACHE.clear()
+
+    catalog = get_shared_catalog(str(path))
+    reference = catalog.get('MOPAB001')
+    assert reference.author_list and catalog.get('MOPAB001') is reference
+    assert made == ['MOPAB001'], "the authors of a paper are worked out once"
+
+    path.write_text(REFERENCES.replace('D. Author', 'E. Author'))
+    os.utime(path, (0, 0))
+    catalog = get_shared_catalog(str(path))
+    assert catalog.get('MOPAB001').authors == 'E. Author', "an edited row is worked out again"
+    assert catalog.get('THPMK149') is not None and made == ['MOPAB001', 'MOPAB001', 'THPMK149']
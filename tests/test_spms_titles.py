@@ -0,0 +1,35 @@
+from jacowvalidator.spms_titles import TitleIndex, diff_spans, normalize_title, similarity
+
+TITLES = {
+    'THPMK148': 'HIGH GRADIENT TESTS OF A NOVEL X-BAND CAVITY',
+    'THPMK149': 'BEAM DYNAMICS IN THE STORAGE RING',
+    'MOPAB001': 'COMMISSIONING OF THE LINAC',
+}
+
+
+def test_similarity():
+    assert normalize_title('High-gradient  tests') == 'HIGH GRADIENT TESTS'
+    assert similarity('High-gradient tests', 'HIGH GRADIENT TESTS') == 1.0, "case and punctuation don't count"
+    assert 0.5 < similarity('BEAM DYNAMICS IN THE STORAGE RINGS', TITLES['THPMK149']) < 1
+    assert similarity('COMMISSIONING OF THE LINAC', TITLES['THPMK148']) < 0.5
+
+
+def test_best_matches():
+    index = TitleIndex(TITLES)
+    paper, score = index.best_match('Beam Dynamics in the Storage-Ring')
+    assert paper == 'THPMK149' and score == 1.0
+    assert index.best_matches('HIGH GRADIENT TESTS OF A X BAND CAVITY')[0][0] == 'THPMK148'
+    assert index.best_match('SOMETHING ELSE ENTIRELY') is None, "titles less than half alike are not a match"
+
+
+def test_best_match_with_typos():
+    index = TitleIndex(TITLES)
+    # the typos make more trigrams that are in no title than are looked up
+    paper, score = index.best_match('HIGH GRADEINT TSETS OF A NOVLE X-BAND CAVITY')
+    assert paper == 'THPMK148' and score < 1
+
+
+def test_diff_spans():
+    docx, spms = diff_spans('BEAM DYNAMICS IN THE STORAGE RING', 'BEAM-DYNAMICS IN THE STORAGE RINGS')
+    assert docx == [('BEAM', False), (' ', True), ('DYNAMICS IN THE STORAGE RING', False)]
+    assert spms == [('BEAM', False), ('-', True), ('DYNAMICS IN THE STORAGE RING', False), ('S', True)]